@@ -0,0 +1,6 @@
+"""Log analysis helpers (modular bolt-on).
+
+Pre-processing applied to log content before it is handed to an AI provider.
+"""
+
+from .templates import TemplateMiner, condense_log  # noqa: F401
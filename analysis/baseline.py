@@ -0,0 +1,209 @@
+"""Statistical gate in front of scheduled LLM analysis.
+
+Each scheduled source keeps a small baseline: exponentially weighted mean and
+variance (EWMA) of its error count, warning count and new-template rate per
+run, plus the set of line templates it has seen (same token masking as
+``templates``). A run's window is the lines stamped after the previous run's
+last line, so an unchanged log has an empty window.
+
+The LLM is only called when the window deviates from the baseline:
+
+  - an error-level template never seen before
+  - errors / warnings / new-template rate above the mean by ``z_threshold``
+    standard deviations (and by at least ``min_delta`` lines / ``new_template_rate``)
+  - the baseline is still warming up, or ``max_skips`` runs in a row were skipped
+
+Otherwise ``local_summary`` describes the window without a model call.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from logaccess.timestamps import line_time
+
+from .templates import ERROR_LEVEL_RE, _mask_token, split_timestamp
+
+WARN_LEVEL_RE = re.compile(r"\bwarn(?:ing)?s?\b", re.IGNORECASE)
+MAX_TEMPLATES = 5000
+METRICS = ('errors', 'warnings', 'new_rate')
+
+
+@dataclass
+class GateConfig:
+    enabled: bool = True
+    warmup_runs: int = 3
+    alpha: float = 0.3
+    z_threshold: float = 3.0
+    min_delta: int = 5
+    new_template_rate: float = 0.3
+    max_skips: int = 24
+
+    def normalised(self) -> 'GateConfig':
+        return GateConfig(
+            enabled=bool(self.enabled),
+            warmup_runs=max(0, int(self.warmup_runs)),
+            alpha=min(1.0, max(0.01, float(self.alpha))),
+            z_threshold=max(0.5, float(self.z_threshold)),
+            min_delta=max(1, int(self.min_delta)),
+            new_template_rate=min(1.0, max(0.0, float(self.new_template_rate))),
+            max_skips=max(0, int(self.max_skips)),
+        )
+
+
+def template_key(line: str) -> str:
+    """Stable id of a line's template: timestamp dropped, variable tokens masked."""
+    _, rest = split_timestamp(line)
+    masked = ' '.join(_mask_token(t) for t in rest.split())
+    return hashlib.sha1(masked.encode('utf-8', 'replace')).hexdigest()[:12]
+
+
+@dataclass
+class WindowStats:
+    lines: int = 0
+    errors: int = 0
+    warnings: int = 0
+    templates: Dict[str, int] = field(default_factory=dict)
+    samples: Dict[str, str] = field(default_factory=dict)       # template -> first line
+    error_templates: List[str] = field(default_factory=list)
+    last_ts: Optional[float] = None
+
+
+def window_stats(log_content: str, after: Optional[float] = None) -> WindowStats:
+    """Counts over the lines stamped after ``after`` (all lines when None).
+
+    Unstamped lines take the time of the line before them; when ``after`` is
+    set, unstamped lines before the first stamp are left out.
+    """
+    stats = WindowStats()
+    current: Optional[float] = None
+    for line in (log_content or '').splitlines():
+        if not line.strip():
+            continue
+        current = line_time(line) or current
+        if after is not None and (current is None or current <= after):
+            continue
+        stats.lines += 1
+        key = template_key(line)
+        stats.templates[key] = stats.templates.get(key, 0) + 1
+        stats.samples.setdefault(key, line)
+        if ERROR_LEVEL_RE.search(line):
+            stats.errors += 1
+            if key not in stats.error_templates:
+                stats.error_templates.append(key)
+        elif WARN_LEVEL_RE.search(line):
+            stats.warnings += 1
+        if current is not None:
+            stats.last_ts = current if stats.last_ts is None else max(stats.last_ts, current)
+    return stats
+
+
+@dataclass
+class Ewma:
+    mean: float = 0.0
+    var: float = 0.0
+    n: int = 0
+
+    def update(self, x: float, alpha: float):
+        if self.n == 0:
+            self.mean, self.var = float(x), 0.0
+        else:
+            d = x - self.mean
+            self.mean += alpha * d
+            self.var = (1 - alpha) * (self.var + alpha * d * d)
+        self.n += 1
+
+    def z(self, x: float) -> float:
+        if self.var <= 0:
+            return math.inf if x > self.mean else 0.0
+        return (x - self.mean) / math.sqrt(self.var)
+
+
+@dataclass
+class Verdict:
+    analyse: bool
+    reasons: List[str]
+    values: Dict[str, float]
+    new_error_samples: List[str] = field(default_factory=list)
+
+    @property
+    def reason(self) -> str:
+        return '; '.join(self.reasons) or 'no deviation from baseline'
+
+
+class Baseline:
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.metrics = {m: Ewma(**(state.get('metrics') or {}).get(m, {})) for m in METRICS}
+        self.known: 'OrderedDict[str, float]' = OrderedDict(state.get('known') or [])
+        self.runs = int(state.get('runs') or 0)
+        self.skips = int(state.get('skips') or 0)
+        self.last_ts: Optional[float] = state.get('last_ts')
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'metrics': {m: asdict(e) for m, e in self.metrics.items()}, 'known': list(self.known.items()),
+                'runs': self.runs, 'skips': self.skips, 'last_ts': self.last_ts}
+
+    def _values(self, stats: WindowStats) -> Dict[str, float]:
+        new = sum(1 for k in stats.templates if k not in self.known)
+        return {'errors': stats.errors, 'warnings': stats.warnings,
+                'new_rate': new / len(stats.templates) if stats.templates else 0.0}
+
+    def assess(self, stats: WindowStats, cfg: GateConfig, force: bool = False) -> Verdict:
+        values = self._values(stats)
+        reasons: List[str] = []
+        if stats.lines == 0:
+            return Verdict(force, ['manual run'] if force else ['no new lines since the last run'], values)
+        if force:
+            reasons.append('manual run')
+        if self.runs < cfg.warmup_runs:
+            reasons.append(f'baseline warming up (run {self.runs + 1} of {cfg.warmup_runs})')
+        new_errors = [k for k in stats.error_templates if k not in self.known]
+        if new_errors:
+            reasons.append(f'{len(new_errors)} previously unseen error template(s)')
+        for metric, floor in (('errors', cfg.min_delta), ('warnings', cfg.min_delta),
+                              ('new_rate', cfg.new_template_rate)):
+            ewma, x = self.metrics[metric], values[metric]
+            if ewma.n and x - ewma.mean >= floor and ewma.z(x) >= cfg.z_threshold:
+                shown = f'{x:.0%} vs {ewma.mean:.0%}' if metric == 'new_rate' else f'{x:g} vs {ewma.mean:.1f}'
+                reasons.append(f'{metric.replace("_", " ")} {shown} baseline')
+        if cfg.max_skips and self.skips >= cfg.max_skips:
+            reasons.append(f'{self.skips} runs skipped in a row')
+        return Verdict(bool(reasons), reasons, values, [stats.samples[k] for k in new_errors[:5]])
+
+    def update(self, stats: WindowStats, verdict: Verdict, cfg: GateConfig):
+        if stats.lines:
+            for metric in METRICS:
+                self.metrics[metric].update(verdict.values[metric], cfg.alpha)
+            now = time.time()
+            for key in stats.templates:
+                self.known.pop(key, None)
+                self.known[key] = now
+            while len(self.known) > MAX_TEMPLATES:
+                self.known.popitem(last=False)
+            self.runs += 1
+        if stats.last_ts is not None:
+            self.last_ts = max(self.last_ts or stats.last_ts, stats.last_ts)
+        self.skips = 0 if verdict.analyse else self.skips + 1
+
+
+def local_summary(stats: WindowStats, baseline: Baseline, verdict: Verdict, top: int = 5) -> str:
+    """Short Discord-ready description of a window that did not need the LLM."""
+    m = baseline.metrics
+    lines = [
+        f'LLM analysis skipped: {verdict.reason}.',
+        f'{stats.lines} new lines: {stats.errors} errors (baseline {m["errors"].mean:.1f}), '
+        f'{stats.warnings} warnings (baseline {m["warnings"].mean:.1f}), {len(stats.templates)} templates.',
+    ]
+    common = sorted(stats.templates.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    if common:
+        lines.append('')
+        lines.append('Most frequent:')
+        lines.extend(f'x{count} {stats.samples[key][:180]}' for key, count in common)
+    return '\n'.join(lines)
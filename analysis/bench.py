@@ -0,0 +1,213 @@
+"""Analysis throughput benchmark against the built-in mock LLM provider.
+
+Starts the mock provider on a free local port, points the app's Ollama,
+OpenRouter, OpenAI and Discord settings at it (using a throwaway SQLite DB),
+replaces the SSH fetch with synthetic logs and then drives
+``_do_analysis_task`` and/or ``/analyse``. Reports runs/minute, p50/p99
+latency and the time spent per stage (fetch, LLM, reduce, Discord).
+
+  python -m analysis.bench --mode both --runs 20 --concurrency 4 \
+      --provider ollama --lines 5000 --latency-ms 300 --tokens-per-sec 150
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+_TEMPLATES = [
+    'sshd[{pid}]: Accepted publickey for deploy from 10.0.{a}.{b} port {port} ssh2',
+    'CRON[{pid}]: (root) CMD (run-parts /etc/cron.hourly)',
+    'systemd[1]: Started Session {n} of user deploy.',
+    'kernel: [{t}.{u}] eth0: link up, 1000Mbps, full-duplex',
+    'nginx[{pid}]: 10.0.{a}.{b} - - "GET /api/items/{n} HTTP/1.1" 200 {port}',
+    'dockerd[{pid}]: time="2026-01-01T00:00:00Z" level=info msg="container {n} healthy"',
+]
+_ERRORS = [
+    'kernel: [{t}.{u}] EXT4-fs error (device sda1): ext4_find_entry:1455: inode #{n}: comm nginx: reading directory lblock 0',
+    'sshd[{pid}]: error: maximum authentication attempts exceeded for root from 10.0.{a}.{b} port {port} ssh2',
+    'postgres[{pid}]: FATAL: could not connect to server: Connection refused',
+]
+
+
+def synthetic_log(lines: int, error_ratio: float = 0.01, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(lines):
+        tpl = rnd.choice(_ERRORS) if rnd.random() < error_ratio else rnd.choice(_TEMPLATES)
+        ts = f"Jan {1 + (i // 86400) % 28:2d} {(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}"
+        out.append(f"{ts} host " + tpl.format(
+            pid=rnd.randint(100, 65000), a=rnd.randint(0, 255), b=rnd.randint(1, 254),
+            port=rnd.randint(1024, 65535), n=rnd.randint(1, 100000),
+            t=rnd.randint(1, 99999), u=rnd.randint(0, 999999),
+        ))
+    return '\n'.join(out) + '\n'
+
+
+def _pct(values: List[float], p: float):
+    if not values:
+        return None
+    vals = sorted(values)
+    return round(vals[min(len(vals) - 1, int(round(p * (len(vals) - 1))))], 1)
+
+
+def _summarise(label: str, values: List[float]) -> str:
+    if not values:
+        return f"  {label:<14} -"
+    return (f"  {label:<14} avg {statistics.mean(values):9.1f} ms   p50 {_pct(values, 0.5):9.1f} ms"
+            f"   p99 {_pct(values, 0.99):9.1f} ms   max {max(values):9.1f} ms")
+
+
+def _start_mock(args):
+    from werkzeug.serving import make_server
+
+    from analysis import mock_provider
+
+    mock_provider.set_config(
+        latency_ms=args.latency_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    server = make_server('127.0.0.1', 0, mock_provider.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline against a mock LLM provider')
+    parser.add_argument('--mode', choices=['task', 'analyse', 'both'], default='both')
+    parser.add_argument('--provider', choices=['ollama', 'openrouter', 'openai'], default='ollama')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--sources', type=int, default=3, help='sources per _do_analysis_task run')
+    parser.add_argument('--lines', type=int, default=2000, help='synthetic lines per source')
+    parser.add_argument('--error-ratio', type=float, default=0.01)
+    parser.add_argument('--fetch-ms', type=float, default=50.0, help='simulated SSH fetch latency')
+    parser.add_argument('--latency-ms', type=int, default=200)
+    parser.add_argument('--tokens-per-sec', type=float, default=200.0)
+    parser.add_argument('--response-tokens', type=int, default=150)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--database-url', default=None, help='defaults to a throwaway SQLite file')
+    args = parser.parse_args(argv)
+
+    server, mock_url = _start_mock(args)
+
+    # Must be set before app.py is imported; a throwaway DB keeps the real settings untouched
+    db_dir = tempfile.mkdtemp(prefix='ailog-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ['AILOG_OPENAI_BASE_URL'] = f"{mock_url}/v1"
+    os.environ['AILOG_OPENROUTER_BASE_URL'] = f"{mock_url}/v1"
+
+    import app as ailog
+    from analysis import clients as ai_http
+
+    webhook_url = f"{mock_url}/api/webhooks/1/bench"
+    with ailog.app.app_context():
+        ailog._setting_set('analysis_provider', args.provider)
+        ailog._setting_set('ollama_url', mock_url)
+        ailog._setting_set('ollama_model', 'mock-llm')
+        ailog._setting_set('openrouter_api_key', 'mock')
+        ailog._setting_set('openrouter_model', 'mock-llm')
+        ailog._setting_set('openai_api_key', 'mock')
+        ailog._setting_set('discord_webhook_url', webhook_url)
+
+    logs = {f"bench{i}.log": synthetic_log(args.lines, args.error_ratio, seed=i) for i in range(args.sources)}
+
+    def fake_execute_command(hostname, command_str, timeout=10, **kwargs):
+        time.sleep(args.fetch_ms / 1000.0)
+        name = next((n for n in logs if n in command_str), None)
+        return subprocess.CompletedProcess(args=command_str, returncode=0, stdout=logs.get(name, ''), stderr='')
+
+    # The benchmark measures the analysis pipeline, not SSH
+    ailog.execute_command = fake_execute_command
+    sources = [{'host': 'local', 'type': 'file', 'name': n} for n in logs]
+
+    stage_lock = threading.Lock()
+    stages: Dict[str, List[float]] = {k: [] for k in ('fetch_ms', 'llm_ms', 'reduce_ms', 'discord_ms', 'total_ms')}
+    chunk_ms: List[float] = []
+
+    def on_source(stats):
+        with stage_lock:
+            for k in stages:
+                if stats.get(k) is not None:
+                    stages[k].append(float(stats[k]))
+            chunk_ms.extend(float(x) for x in (stats.get('llm_chunk_ms') or []) if x is not None)
+
+    def run_task(_):
+        t0 = time.perf_counter()
+        with ailog.app.app_context():
+            ailog._do_analysis_task(emit=lambda p: None, sources=sources, on_source=on_source)
+        return (time.perf_counter() - t0) * 1000.0
+
+    client = ailog.app.test_client()
+    analyse_body = {
+        'log_content': logs[next(iter(logs))],
+        'log_name': 'bench0.log',
+        'provider': args.provider,
+        'api_key': 'mock',
+    }
+
+    def run_analyse(_):
+        t0 = time.perf_counter()
+        r = client.post('/analyse', json=analyse_body)
+        if r.status_code != 200:
+            raise RuntimeError(f"/analyse returned {r.status_code}: {r.get_data(as_text=True)[:200]}")
+        return (time.perf_counter() - t0) * 1000.0
+
+    def bench(name, fn):
+        errors = 0
+        latencies: List[float] = []
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as ex:
+            futures = [ex.submit(fn, i) for i in range(args.runs)]
+            for f in futures:
+                try:
+                    latencies.append(f.result())
+                except Exception as e:
+                    errors += 1
+                    print(f"  run failed: {e}", file=sys.stderr)
+        wall = time.perf_counter() - t0
+        print(f"\n{name}: {len(latencies)} ok / {errors} failed in {wall:.1f}s "
+              f"-> {len(latencies) / wall * 60:.1f} runs/min (concurrency {args.concurrency})")
+        print(_summarise('latency', latencies))
+
+    print(f"Mock provider at {mock_url} (provider={args.provider}, latency={args.latency_ms}ms, "
+          f"{args.tokens_per_sec} tok/s, error_rate={args.error_rate})")
+
+    if args.mode in ('task', 'both'):
+        bench(f"_do_analysis_task ({args.sources} sources x {args.lines} lines)", run_task)
+        print('  per source stage times:')
+        for k, vals in stages.items():
+            print(_summarise(k.replace('_ms', ''), vals))
+        print(_summarise('llm/chunk', chunk_ms))
+
+    if args.mode in ('analyse', 'both'):
+        bench(f"/analyse ({args.lines} lines)", run_analyse)
+
+    print('\nprovider calls:')
+    snap = ai_http.metrics_snapshot()
+    for label, m in sorted(snap['calls'].items()):
+        print(f"  {label:<26} n={m['count']:<5} err={m['errors']:<3} avg={m['avg_ms']} p50={m['p50_ms']} p95={m['p95_ms']} max={m['max_ms']}")
+    sched = snap.get('scheduler') or {}
+    for key, d in sorted((sched.get('keys') or {}).items()):
+        print(f"  queue {key:<20} calls={d['calls']} retries={d['retries']} avg_queued={d['avg_queued_ms']}ms max_queued={d['max_queued_ms']}ms")
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
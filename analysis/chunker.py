@@ -0,0 +1,205 @@
+"""Token-aware, line-boundary chunking of log text for LLM analysis.
+
+Token counts are approximated without a tokenizer dependency: words count
+roughly one token per four letters, digit runs one token per three digits
+and each punctuation mark one token, which tracks BPE tokenizers closely
+enough for budgeting. Per-model context windows are looked up once per
+(provider, model) and cached.
+
+Chunks always hold whole lines (a single over-long line is the only thing
+ever split). Error lines plus a few lines of context form blocks that are
+kept in one chunk whenever the block fits the budget.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional, Pattern
+
+from .templates import ERROR_LEVEL_RE
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+# (substring of model name, context window in tokens); first match wins
+_MODEL_CONTEXT = [
+    ('gpt-3.5-turbo', 16385),
+    ('gpt-4o', 128000),
+    ('gpt-4-turbo', 128000),
+    ('gpt-4.1', 1000000),
+    ('gpt-4-32k', 32768),
+    ('gpt-4', 8192),
+    ('o1', 128000),
+    ('o3', 200000),
+    ('claude', 200000),
+    ('gemini', 1000000),
+    ('llama-3.1', 128000),
+    ('llama3.1', 128000),
+    ('llama-3.2', 128000),
+    ('llama3.2', 128000),
+    ('llama3', 8192),
+    ('llama-3', 8192),
+    ('llama2', 4096),
+    ('mixtral', 32768),
+    ('mistral', 32768),
+    ('qwen', 32768),
+    ('deepseek', 64000),
+    ('phi3', 4096),
+    ('gemma', 8192),
+]
+
+_DEFAULT_CONTEXT = {'openai': 16385, 'openrouter': 8192, 'ollama': 8192}
+
+
+@dataclass(frozen=True)
+class ModelTokenConfig:
+    context_tokens: int
+    reserve_tokens: int  # prompt template + room for the completion
+
+    @property
+    def input_budget(self) -> int:
+        return max(512, self.context_tokens - self.reserve_tokens)
+
+
+@lru_cache(maxsize=128)
+def get_model_token_config(provider: str, model: Optional[str] = None,
+                           max_input_tokens: Optional[int] = None) -> ModelTokenConfig:
+    """Context window and reserved tokens for a provider/model pair (cached).
+
+    max_input_tokens caps the usable budget so very large windows do not turn
+    into one enormous, slow request.
+    """
+    name = (model or '').lower()
+    ctx = None
+    for key, tokens in _MODEL_CONTEXT:
+        if key in name:
+            ctx = tokens
+            break
+    if ctx is None:
+        ctx = _DEFAULT_CONTEXT.get((provider or '').lower(), 8192)
+    reserve = min(4096, max(1024, ctx // 4))
+    if max_input_tokens and ctx - reserve > max_input_tokens:
+        ctx = max_input_tokens + reserve
+    return ModelTokenConfig(context_tokens=ctx, reserve_tokens=reserve)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count of text."""
+    if not text:
+        return 0
+    n = 0
+    for tok in _TOKEN_RE.findall(text):
+        if tok[0].isalpha():
+            n += math.ceil(len(tok) / 4)
+        else:
+            n += 1
+    return n + text.count('\n')
+
+
+@dataclass
+class ChunkPlan:
+    chunks: List[str]
+    token_estimates: List[int]
+    budget_tokens: int
+    total_tokens: int = 0
+    error_blocks: int = 0
+    notes: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (f"{len(self.chunks)} chunk(s), ~{self.total_tokens} tokens total, "
+                f"budget {self.budget_tokens} tokens/chunk, {self.error_blocks} error block(s)")
+
+
+def _blocks(lines: List[str], error_re: Pattern, context: int):
+    """Yield (lines, is_error_block) groups; errors within 2*context lines merge."""
+    flags = [bool(error_re.search(ln)) for ln in lines]
+    keep = [False] * len(lines)
+    for i, f in enumerate(flags):
+        if f:
+            for j in range(max(0, i - context), min(len(lines), i + context + 1)):
+                keep[j] = True
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and keep[j] == keep[i]:
+            j += 1
+        yield lines[i:j], keep[i]
+        i = j
+
+
+def _split_long_line(line: str, budget: int) -> List[str]:
+    # Roughly 3 chars/token keeps pieces under budget for dense log text
+    step = max(1, budget * 3)
+    return [line[k:k + step] for k in range(0, len(line), step)]
+
+
+def chunk_log(text: str, budget_tokens: int, error_re: Pattern = ERROR_LEVEL_RE,
+              error_context: int = 3) -> ChunkPlan:
+    """Pack whole lines into chunks of at most budget_tokens (approx.)."""
+    budget = max(64, int(budget_tokens))
+    lines = (text or '').splitlines()
+    chunks: List[str] = []
+    estimates: List[int] = []
+    cur: List[str] = []
+    cur_tokens = 0
+    error_blocks = 0
+
+    def _flush():
+        nonlocal cur, cur_tokens
+        if cur:
+            chunks.append('\n'.join(cur))
+            estimates.append(cur_tokens)
+        cur, cur_tokens = [], 0
+
+    def _add_line(ln: str, t: int):
+        nonlocal cur_tokens
+        if t > budget:
+            _flush()
+            for piece in _split_long_line(ln, budget):
+                chunks.append(piece)
+                estimates.append(estimate_tokens(piece))
+            return
+        if cur_tokens + t > budget:
+            _flush()
+        cur.append(ln)
+        cur_tokens += t
+
+    for block, is_error in _blocks(lines, error_re, error_context):
+        toks = [estimate_tokens(ln) for ln in block]
+        block_tokens = sum(toks)
+        if is_error:
+            error_blocks += 1
+            # Start a fresh chunk rather than splitting an error region that would fit whole
+            if block_tokens <= budget and cur_tokens + block_tokens > budget:
+                _flush()
+        for ln, t in zip(block, toks):
+            _add_line(ln, t)
+    _flush()
+
+    return ChunkPlan(chunks=chunks, token_estimates=estimates, budget_tokens=budget,
+                     total_tokens=sum(estimates), error_blocks=error_blocks)
+
+
+def plan_chunks(text: str, provider: str, model: Optional[str] = None,
+                max_input_tokens: Optional[int] = None) -> ChunkPlan:
+    """Chunk text for the given provider/model's input budget."""
+    cfg = get_model_token_config(provider, model, max_input_tokens)
+    return chunk_log(text, cfg.input_budget)
+
+
+def tail_within_budget(text: str, budget_tokens: int) -> str:
+    """Keep the most recent whole lines of text that fit in budget_tokens."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for ln in reversed(text.splitlines()):
+        t = estimate_tokens(ln)
+        if used + t > budget_tokens:
+            break
+        kept.append(ln)
+        used += t
+    kept.reverse()
+    return '\n'.join(kept)
@@ -0,0 +1,302 @@
+"""Shared HTTP/SDK clients for AI providers and Discord.
+
+One keep-alive ``requests.Session`` is kept per base URL (scheme://host:port)
+and one OpenAI-compatible SDK client per (provider, api_key), so repeated
+calls reuse TCP/TLS connections. Every call is timed into a small in-memory
+latency registry exposed via ``metrics_snapshot()``.
+
+Pool sizes and default timeouts come from the environment and can be
+overridden at runtime with ``configure()``:
+
+  AILOG_HTTP_POOL_CONNECTIONS  pools kept per session (default 4)
+  AILOG_HTTP_POOL_MAXSIZE      connections per pool (default 10)
+  AILOG_HTTP_CONNECT_TIMEOUT   seconds (default 10)
+  AILOG_HTTP_READ_TIMEOUT      seconds for non-streaming calls (default 60)
+  AILOG_HTTP_STREAM_TIMEOUT    seconds between streamed chunks (default 300)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import RetryableError, parse_retry_after, scheduler
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+_settings: Dict[str, Any] = {
+    'pool_connections': _env_int('AILOG_HTTP_POOL_CONNECTIONS', 4),
+    'pool_maxsize': _env_int('AILOG_HTTP_POOL_MAXSIZE', 10),
+    'connect_timeout': _env_float('AILOG_HTTP_CONNECT_TIMEOUT', 10.0),
+    'read_timeout': _env_float('AILOG_HTTP_READ_TIMEOUT', 60.0),
+    'stream_timeout': _env_float('AILOG_HTTP_STREAM_TIMEOUT', 300.0),
+}
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_sdk_clients: Dict[Tuple[str, str, str], Any] = {}
+
+
+def configure(**kwargs) -> Dict[str, Any]:
+    """Update pool sizes/timeouts. Pool changes apply to sessions created afterwards."""
+    with _lock:
+        for k, v in kwargs.items():
+            if k in _settings and v is not None:
+                _settings[k] = type(_settings[k])(v)
+        pool_changed = any(k in ('pool_connections', 'pool_maxsize') for k in kwargs)
+        if pool_changed:
+            for s in _sessions.values():
+                s.close()
+            _sessions.clear()
+        return dict(_settings)
+
+
+def default_timeout() -> Tuple[float, float]:
+    return (_settings['connect_timeout'], _settings['read_timeout'])
+
+
+def stream_timeout() -> Tuple[float, float]:
+    return (_settings['connect_timeout'], _settings['stream_timeout'])
+
+
+def _base_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the pooled session for url's scheme://host:port."""
+    base = _base_url(url)
+    with _lock:
+        s = _sessions.get(base)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=_settings['pool_connections'],
+                pool_maxsize=_settings['pool_maxsize'],
+            )
+            s.mount('http://', adapter)
+            s.mount('https://', adapter)
+            _sessions[base] = s
+        return s
+
+
+# --- Latency metrics ---
+
+class LatencyMetrics:
+    """Per-label call counts, error counts and a window of recent latencies."""
+
+    def __init__(self, window: int = 500):
+        self._window = window
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, label: str, elapsed_ms: float, ok: bool = True, status: Optional[int] = None):
+        with self._lock:
+            d = self._data.get(label)
+            if d is None:
+                d = {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                     'last_status': None, 'recent': deque(maxlen=self._window)}
+                self._data[label] = d
+            d['count'] += 1
+            if not ok:
+                d['errors'] += 1
+            d['total_ms'] += elapsed_ms
+            d['max_ms'] = max(d['max_ms'], elapsed_ms)
+            d['last_status'] = status
+            d['recent'].append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        with self._lock:
+            for label, d in self._data.items():
+                recent = sorted(d['recent'])
+
+                def _pct(p):
+                    if not recent:
+                        return None
+                    return round(recent[min(len(recent) - 1, int(p * len(recent)))], 1)
+
+                out[label] = {
+                    'count': d['count'],
+                    'errors': d['errors'],
+                    'avg_ms': round(d['total_ms'] / d['count'], 1) if d['count'] else None,
+                    'p50_ms': _pct(0.50),
+                    'p95_ms': _pct(0.95),
+                    'max_ms': round(d['max_ms'], 1),
+                    'last_status': d['last_status'],
+                }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+metrics = LatencyMetrics()
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    with _lock:
+        pools = sorted(_sessions.keys())
+        sdk = len(_sdk_clients)
+    return {'calls': metrics.snapshot(), 'sessions': pools, 'sdk_clients': sdk, 'settings': dict(_settings),
+            'scheduler': scheduler.snapshot()}
+
+
+@contextmanager
+def timed(label: str):
+    """Record the latency of the enclosed block under label (errors are counted when it raises)."""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except Exception:
+        ok = False
+        raise
+    finally:
+        metrics.record(label, (time.perf_counter() - start) * 1000.0, ok=ok)
+
+
+# --- HTTP helpers (drop-in for requests.get/post) ---
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def _retry_after_from(resp: requests.Response) -> Optional[float]:
+    ra = parse_retry_after(resp.headers.get('Retry-After'))
+    if ra is None and resp.status_code == 429:
+        # Discord puts the delay in the JSON body as well
+        try:
+            body = resp.json()
+            ra = parse_retry_after(str(body.get('retry_after'))) if isinstance(body, dict) else None
+        except Exception:
+            ra = None
+    return ra
+
+
+def _send(method: str, url: str, label: str, **kwargs) -> requests.Response:
+    start = time.perf_counter()
+    try:
+        resp = get_session(url).request(method, url, **kwargs)
+    except Exception:
+        metrics.record(label, (time.perf_counter() - start) * 1000.0, ok=False)
+        raise
+    metrics.record(label, (time.perf_counter() - start) * 1000.0,
+                   ok=resp.status_code < 400, status=resp.status_code)
+    return resp
+
+
+def request(method: str, url: str, metric: Optional[str] = None, rate_key: Optional[str] = None,
+            retries: Optional[int] = None, **kwargs) -> requests.Response:
+    """Issue a request on the pooled session for url.
+
+    Latency is recorded under ``metric`` (defaults to the host). For streamed
+    responses this is time-to-headers; use ``timed`` around the consumer for totals.
+    With ``rate_key`` the call goes through the shared request scheduler: it is
+    rate limited and 429/5xx/connection failures are retried with backoff.
+    After the last retry the final response is returned as-is.
+    """
+    kwargs.setdefault('timeout', default_timeout())
+    label = metric or urlsplit(url).netloc
+    if not rate_key:
+        return _send(method, url, label, **kwargs)
+
+    def _attempt():
+        try:
+            resp = _send(method, url, label, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise RetryableError(f'{type(e).__name__}: {e}') from e
+        if resp.status_code in RETRYABLE_STATUS:
+            retry_after = _retry_after_from(resp)
+            if kwargs.get('stream'):
+                resp.close()
+                # a closed streamed body cannot be handed back to the caller
+                raise RetryableError(f'HTTP {resp.status_code} from {label}', retry_after=retry_after)
+            raise RetryableError(f'HTTP {resp.status_code} from {label}', retry_after=retry_after, result=resp)
+        return resp
+
+    try:
+        return scheduler.call(rate_key, _attempt, max_retries=retries)
+    except RetryableError as e:
+        if isinstance(e.__cause__, requests.exceptions.RequestException):
+            raise e.__cause__
+        raise requests.exceptions.HTTPError(str(e))
+
+
+def call_sdk(rate_key: str, fn, retries: Optional[int] = None):
+    """Run an SDK call (e.g. OpenAI) through the scheduler, retrying 429/5xx and connection errors."""
+    def _attempt():
+        try:
+            return fn()
+        except Exception as e:
+            status = getattr(e, 'status_code', None)
+            conn_err = type(e).__name__ in ('APIConnectionError', 'APITimeoutError')
+            if status in RETRYABLE_STATUS or conn_err:
+                resp = getattr(e, 'response', None)
+                retry_after = parse_retry_after(resp.headers.get('retry-after')) if resp is not None else None
+                raise RetryableError(f'{type(e).__name__}: {e}', retry_after=retry_after) from e
+            raise
+
+    try:
+        return scheduler.call(rate_key, _attempt, max_retries=retries)
+    except RetryableError as e:
+        if e.__cause__ is not None:
+            raise e.__cause__
+        raise
+
+
+def get(url: str, metric: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('GET', url, metric=metric, **kwargs)
+
+
+def post(url: str, metric: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('POST', url, metric=metric, **kwargs)
+
+
+# --- SDK clients ---
+
+def get_openai_client(api_key: str, provider: str = 'openai', base_url: Optional[str] = None):
+    """Return a cached openai.OpenAI client for (provider, api_key, base_url)."""
+    key = (provider, api_key or '', base_url or '')
+    with _lock:
+        client = _sdk_clients.get(key)
+        if client is not None:
+            return client
+    import openai  # imported lazily; only needed for the OpenAI path
+
+    # Retries are handled by the request scheduler (see call_sdk)
+    kwargs: Dict[str, Any] = {'api_key': api_key, 'timeout': _settings['read_timeout'], 'max_retries': 0}
+    if base_url:
+        kwargs['base_url'] = base_url
+    client = openai.OpenAI(**kwargs)
+    with _lock:
+        return _sdk_clients.setdefault(key, client)
+
+
+def drop_clients(provider: Optional[str] = None):
+    """Forget cached SDK clients (e.g. after an API key change)."""
+    with _lock:
+        for k in [k for k in _sdk_clients if provider is None or k[0] == provider]:
+            _sdk_clients.pop(k, None)
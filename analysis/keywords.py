@@ -0,0 +1,64 @@
+"""Compiled alert-keyword matching.
+
+All keywords are folded into one case-insensitive alternation so a text is
+scanned once regardless of how many keywords are configured. The compiled
+matcher is cached on the keyword tuple and only rebuilt when the list changes.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """Case-insensitive substring matcher for a fixed keyword list."""
+
+    def __init__(self, keywords: Iterable[str]):
+        keywords = list(keywords or [])
+        self._source = tuple(str(k).strip() for k in keywords)
+        cleaned = []
+        for k in keywords:
+            s = str(k).strip()
+            if s and s.lower() not in (c.lower() for c in cleaned):
+                cleaned.append(s)
+        self.keywords: Tuple[str, ...] = tuple(cleaned)
+        if cleaned:
+            # Longest first so overlapping keywords report the most specific hit
+            alts = sorted((re.escape(k) for k in cleaned), key=len, reverse=True)
+            self._re: Optional[re.Pattern] = re.compile('|'.join(alts), re.IGNORECASE)
+        else:
+            self._re = None
+
+    def matches(self, text: str) -> bool:
+        return bool(text) and self._re is not None and self._re.search(text) is not None
+
+    def find_all(self, text: str) -> List[str]:
+        """Distinct keywords found in text, in order of first appearance (lower-cased)."""
+        if not text or self._re is None:
+            return []
+        seen = []
+        for m in self._re.finditer(text):
+            k = m.group(0).lower()
+            if k not in seen:
+                seen.append(k)
+        return seen
+
+
+_lock = threading.Lock()
+_cached: Optional[KeywordMatcher] = None
+
+
+def get_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """Return a matcher for keywords, reusing the previous one if the list is unchanged."""
+    global _cached
+    key = tuple(str(k).strip() for k in (keywords or []))
+    m = _cached
+    if m is not None and m._source == key:
+        return m
+    with _lock:
+        if _cached is not None and _cached._source == key:
+            return _cached
+        _cached = KeywordMatcher(key)
+        return _cached
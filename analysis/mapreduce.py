@@ -0,0 +1,127 @@
+"""Hierarchical map-reduce summarisation for logs that span several chunks.
+
+Map: every chunk is analysed independently, up to ``map_workers`` at a time.
+Reduce: partial analyses are merged ``reduce_fan_in`` at a time into a new,
+smaller list; this repeats until one report is left or ``max_depth`` reduce
+levels have run. The final report is capped at ``max_report_chars``.
+
+Wider fan-out finishes sooner but issues more concurrent provider calls; a
+larger fan-in means fewer reduce calls with longer prompts.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+
+@dataclass
+class MapReduceConfig:
+    map_workers: int = 4
+    reduce_fan_in: int = 4
+    max_depth: int = 3
+    max_report_chars: int = 6000
+
+    def normalised(self) -> 'MapReduceConfig':
+        return MapReduceConfig(
+            map_workers=max(1, int(self.map_workers)),
+            reduce_fan_in=max(2, int(self.reduce_fan_in)),
+            max_depth=max(0, int(self.max_depth)),
+            max_report_chars=max(500, int(self.max_report_chars)),
+        )
+
+
+REDUCE_SYSTEM_PROMPT = 'You are a helpful assistant that consolidates log analysis reports.'
+
+
+def build_reduce_prompt(partials: Sequence[str], subject: str, max_chars: int) -> str:
+    """Prompt asking the model to merge partial reports into one bounded report."""
+    body = '\n\n'.join(f'--- PARTIAL REPORT {i} ---\n{p.strip()}' for i, p in enumerate(partials, start=1))
+    return (
+        f'The following are {len(partials)} partial analyses of consecutive sections of {subject}. '
+        'Merge them into a single report: deduplicate repeated findings, keep concrete error messages, '
+        'counts and timestamps, order issues by severity, and finish with troubleshooting tips. '
+        f'Keep the merged report under {max_chars} characters.\n\n{body}'
+    )
+
+
+def _clip(text: str, limit: int) -> str:
+    text = (text or '').strip()
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + '\n[--- report truncated ---]'
+
+
+def map_reduce_analyse(
+    chunks: Sequence[str],
+    analyse_chunk: Callable[[int, str], str],
+    reduce_group: Callable[[List[str], int], str],
+    config: Optional[MapReduceConfig] = None,
+    emit: Optional[Callable[[str], None]] = None,
+    errors: Optional[List[str]] = None,
+) -> str:
+    """Analyse chunks in parallel and merge the results into one report.
+
+    analyse_chunk(index, chunk) -> partial analysis (index is 1-based).
+    reduce_group(partials, level) -> merged analysis for one group.
+    emit(message) receives progress lines.
+    A failing chunk is left out of the report and its error appended to
+    errors; if the only chunk or every chunk fails, the first error is raised.
+    """
+    cfg = (config or MapReduceConfig()).normalised()
+
+    def _say(msg: str):
+        if emit:
+            try:
+                emit(msg)
+            except Exception:
+                pass
+
+    total = len(chunks)
+    if total == 0:
+        return ''
+
+    if total == 1:
+        return _clip(analyse_chunk(1, chunks[0]), cfg.max_report_chars)
+
+    def _map_one(idx_chunk):
+        idx, chunk = idx_chunk
+        try:
+            out = analyse_chunk(idx, chunk)
+            _say(f'✅ Completed part {idx}/{total}.')
+            return out, None
+        except Exception as e:
+            _say(f'Part {idx}/{total} failed: {e}')
+            return None, e
+
+    _say(f'Map: analysing {total} parts with up to {cfg.map_workers} in parallel...')
+    with ThreadPoolExecutor(max_workers=min(cfg.map_workers, total)) as ex:
+        results = list(ex.map(_map_one, enumerate(chunks, start=1)))
+
+    failed = [(idx, e) for idx, (_, e) in enumerate(results, start=1) if e is not None]
+    if len(failed) == total:
+        raise failed[0][1]
+    if errors is not None:
+        errors.extend(f'part {idx}/{total} could not be analysed: {e}' for idx, e in failed)
+    partials = [out for out, e in results if e is None]
+
+    level = 0
+    while len(partials) > 1 and level < cfg.max_depth:
+        level += 1
+        groups = [partials[i:i + cfg.reduce_fan_in] for i in range(0, len(partials), cfg.reduce_fan_in)]
+        _say(f'Reduce level {level}: merging {len(partials)} partial reports into {len(groups)}...')
+
+        def _reduce_one(group):
+            if len(group) == 1:
+                return group[0]
+            try:
+                return reduce_group(list(group), level)
+            except Exception as e:
+                _say(f'Reduce step failed ({e}); keeping partial reports as-is.')
+                return '\n\n'.join(group)
+
+        with ThreadPoolExecutor(max_workers=min(cfg.map_workers, len(groups))) as ex:
+            partials = list(ex.map(_reduce_one, groups))
+
+    return _clip('\n\n'.join(partials), cfg.max_report_chars)
@@ -0,0 +1,203 @@
+"""Local mock LLM provider for load testing the analysis pipeline.
+
+Speaks enough of the Ollama API (/api/generate, /api/tags), the
+OpenAI-compatible chat API (/v1/chat/completions, /v1/models) and the Discord
+webhook API (/api/webhooks/<id>/<token>) for the app to run end-to-end with
+no external services. Behaviour is tunable at runtime via /config:
+
+  latency_ms        time to first token
+  tokens_per_sec    generation rate (0 = instant)
+  response_tokens   length of each reply
+  error_rate        fraction of requests answered with error_status
+  error_status      HTTP status for injected errors (e.g. 429, 500)
+  alert_rate        fraction of replies that contain the word "error"
+
+Mounted by app.py under /mock-llm when AILOG_MOCK_LLM=1, or run standalone:
+
+  python -m analysis.mock_provider --port 11435
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator
+
+from flask import Blueprint, Flask, Response, jsonify, request, stream_with_context
+
+mock_llm_bp = Blueprint('mock_llm', __name__)
+
+_config_lock = threading.Lock()
+_config: Dict[str, Any] = {
+    'latency_ms': 200,
+    'tokens_per_sec': 200.0,
+    'response_tokens': 150,
+    'error_rate': 0.0,
+    'error_status': 500,
+    'alert_rate': 0.3,
+}
+_stats: Dict[str, int] = {'requests': 0, 'errors_injected': 0, 'webhooks': 0}
+
+_WORDS = (
+    'The log shows routine service activity with periodic restarts and normal authentication '
+    'traffic. Summary: no sustained failures were observed. Troubleshooting tips: check disk '
+    'usage, review recent package upgrades and confirm time synchronisation across hosts.'
+).split()
+
+
+def get_config() -> Dict[str, Any]:
+    with _config_lock:
+        return dict(_config)
+
+
+def set_config(**kwargs) -> Dict[str, Any]:
+    with _config_lock:
+        for k, v in kwargs.items():
+            if k in _config and v is not None:
+                _config[k] = type(_config[k])(v)
+        return dict(_config)
+
+
+def _count(key: str):
+    with _config_lock:
+        _stats[key] = _stats.get(key, 0) + 1
+
+
+def _maybe_error(cfg: Dict[str, Any]):
+    if cfg['error_rate'] > 0 and random.random() < cfg['error_rate']:
+        _count('errors_injected')
+        resp = jsonify({'error': {'message': 'mock provider injected error'}})
+        resp.status_code = int(cfg['error_status'])
+        if resp.status_code == 429:
+            resp.headers['Retry-After'] = '1'
+        return resp
+    return None
+
+
+def _tokens(cfg: Dict[str, Any]) -> Iterator[str]:
+    """Yield reply tokens at the configured rate after the configured latency."""
+    time.sleep(max(0, cfg['latency_ms']) / 1000.0)
+    words = []
+    if random.random() < cfg['alert_rate']:
+        words += ['Critical', 'error:', 'disk', 'I/O', 'failures', 'detected.']
+    while len(words) < cfg['response_tokens']:
+        words += _WORDS
+    words = words[:max(1, int(cfg['response_tokens']))]
+    delay = 1.0 / cfg['tokens_per_sec'] if cfg['tokens_per_sec'] > 0 else 0.0
+    for i, w in enumerate(words):
+        if delay:
+            time.sleep(delay)
+        yield w if i == 0 else ' ' + w
+
+
+@mock_llm_bp.route('/config', methods=['GET', 'POST'])
+def mock_config():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            cfg = set_config(**data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid mock config: {e}'}), 400
+        return jsonify(cfg)
+    with _config_lock:
+        stats = dict(_stats)
+    return jsonify({**get_config(), 'stats': stats})
+
+
+# --- Ollama ---
+
+@mock_llm_bp.route('/api/tags', methods=['GET'])
+def mock_ollama_tags():
+    return jsonify({'models': [{'name': 'mock-llm:latest', 'size': 0}]})
+
+
+@mock_llm_bp.route('/api/generate', methods=['POST'])
+def mock_ollama_generate():
+    _count('requests')
+    cfg = get_config()
+    err = _maybe_error(cfg)
+    if err is not None:
+        return err
+    data = request.get_json(silent=True) or {}
+    model = data.get('model') or 'mock-llm:latest'
+
+    if not data.get('stream', True):
+        return jsonify({'model': model, 'response': ''.join(_tokens(cfg)), 'done': True})
+
+    def generate():
+        for piece in _tokens(cfg):
+            yield json.dumps({'model': model, 'response': piece, 'done': False}) + '\n'
+        yield json.dumps({'model': model, 'response': '', 'done': True}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# --- OpenAI-compatible ---
+
+@mock_llm_bp.route('/v1/models', methods=['GET'])
+def mock_openai_models():
+    return jsonify({'object': 'list', 'data': [{'id': 'mock-llm', 'object': 'model'}]})
+
+
+@mock_llm_bp.route('/v1/chat/completions', methods=['POST'])
+def mock_openai_chat():
+    _count('requests')
+    cfg = get_config()
+    err = _maybe_error(cfg)
+    if err is not None:
+        return err
+    data = request.get_json(silent=True) or {}
+    model = data.get('model') or 'mock-llm'
+    cid = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+    created = int(time.time())
+
+    if not data.get('stream'):
+        text = ''.join(_tokens(cfg))
+        return jsonify({
+            'id': cid, 'object': 'chat.completion', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': int(cfg['response_tokens']), 'total_tokens': int(cfg['response_tokens'])},
+        })
+
+    def generate():
+        for piece in _tokens(cfg):
+            chunk = {'id': cid, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                     'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {'id': cid, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+
+# --- Discord webhook ---
+
+@mock_llm_bp.route('/api/webhooks/<webhook_id>/<token>', methods=['POST'])
+def mock_discord_webhook(webhook_id, token):
+    _count('webhooks')
+    return ('', 204)
+
+
+def create_app() -> Flask:
+    """Standalone app serving the mock at the root path."""
+    standalone = Flask(__name__)
+    standalone.register_blueprint(mock_llm_bp)
+    return standalone
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mock Ollama/OpenAI-compatible LLM provider')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    for key, val in get_config().items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(val), default=val)
+    args = parser.parse_args()
+    set_config(**{k: getattr(args, k) for k in get_config()})
+    create_app().run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,218 @@
+"""Central scheduler for outbound provider and webhook calls.
+
+Each call names a key (``provider:openrouter``, ``discord:<webhook id>``...).
+A token bucket per key limits the request rate, a global semaphore bounds how
+many calls are in flight at once, and retryable failures (429/5xx, connection
+errors) are retried with jittered exponential backoff that honours
+``Retry-After`` when the server sends one.
+
+Per-key counters (waiting, in flight, retries, time spent queued) are exposed
+through ``RequestScheduler.snapshot()`` so it is visible where analysis time
+goes.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+class RetryableError(Exception):
+    """Raised by a call to request a retry; retry_after is in seconds when known."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, result: Any = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.result = result
+
+
+@dataclass
+class Limit:
+    rate: float   # tokens per second
+    burst: int    # bucket capacity
+
+
+# Conservative defaults; Discord allows roughly 30 messages/minute per webhook
+DEFAULT_LIMITS: Dict[str, Limit] = {
+    'provider:openai': Limit(rate=3.0, burst=5),
+    'provider:openrouter': Limit(rate=2.0, burst=4),
+    'provider:ollama': Limit(rate=4.0, burst=4),
+    'discord': Limit(rate=0.5, burst=5),
+}
+FALLBACK_LIMIT = Limit(rate=5.0, burst=5)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def block_for(self, seconds: float):
+        """Hold off every caller of this bucket (used when the server says Retry-After)."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + max(0.0, seconds))
+
+
+class RequestScheduler:
+    def __init__(self, max_in_flight: int = 8, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._limits: Dict[str, Limit] = dict(DEFAULT_LIMITS)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def set_limit(self, key: str, rate: float, burst: int):
+        with self._lock:
+            self._limits[key] = Limit(rate=rate, burst=burst)
+            self._buckets.pop(key, None)
+
+    def _limit_for(self, key: str) -> Limit:
+        if key in self._limits:
+            return self._limits[key]
+        family = key.split(':', 1)[0]
+        return self._limits.get(family, FALLBACK_LIMIT)
+
+    def _bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                lim = self._limit_for(key)
+                b = TokenBucket(lim.rate, lim.burst)
+                self._buckets[key] = b
+            return b
+
+    def _stat(self, key: str, field: str, delta: float):
+        with self._lock:
+            d = self._stats.setdefault(key, {
+                'waiting': 0, 'in_flight': 0, 'calls': 0, 'retries': 0,
+                'rate_limited': 0, 'failures': 0, 'queued_ms': 0.0, 'max_queued_ms': 0.0,
+            })
+            if field == 'max_queued_ms':
+                d[field] = max(d[field], delta)
+            else:
+                d[field] += delta
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(self.max_delay, float(retry_after)))
+        return delay
+
+    def call(self, key: str, fn: Callable[[], Any], max_retries: Optional[int] = None) -> Any:
+        """Run fn under key's rate limit and the global in-flight budget.
+
+        fn raises RetryableError to ask for another attempt; once retries are
+        exhausted the error's ``result`` is returned if set, otherwise it is raised.
+        """
+        retries = self.max_retries if max_retries is None else max(0, int(max_retries))
+        bucket = self._bucket(key)
+        attempt = 0
+        while True:
+            queued_at = time.monotonic()
+            self._stat(key, 'waiting', 1)
+            try:
+                wait = bucket.reserve()
+                if wait > 0:
+                    time.sleep(wait)
+                self._in_flight.acquire()
+            finally:
+                self._stat(key, 'waiting', -1)
+            queued_ms = (time.monotonic() - queued_at) * 1000.0
+            self._stat(key, 'queued_ms', queued_ms)
+            self._stat(key, 'max_queued_ms', queued_ms)
+            self._stat(key, 'calls', 1)
+            self._stat(key, 'in_flight', 1)
+            try:
+                return fn()
+            except RetryableError as e:
+                if e.retry_after is not None:
+                    self._stat(key, 'rate_limited', 1)
+                if attempt >= retries:
+                    self._stat(key, 'failures', 1)
+                    if e.result is not None:
+                        return e.result
+                    raise
+                delay = self.backoff(attempt, e.retry_after)
+                if e.retry_after is not None:
+                    bucket.block_for(delay)
+                print(f"{key}: {e}; retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            except Exception:
+                self._stat(key, 'failures', 1)
+                raise
+            finally:
+                self._stat(key, 'in_flight', -1)
+                self._in_flight.release()
+            self._stat(key, 'retries', 1)
+            attempt += 1
+            time.sleep(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = {k: dict(v) for k, v in self._stats.items()}
+            for k, d in keys.items():
+                d['avg_queued_ms'] = round(d['queued_ms'] / d['calls'], 1) if d['calls'] else None
+                d['queued_ms'] = round(d['queued_ms'], 1)
+                d['max_queued_ms'] = round(d['max_queued_ms'], 1)
+            limits = {k: {'rate': v.rate, 'burst': v.burst} for k, v in self._limits.items()}
+        return {
+            'max_in_flight': self.max_in_flight,
+            'queue_depth': sum(int(d['waiting']) for d in keys.values()),
+            'in_flight': sum(int(d['in_flight']) for d in keys.values()),
+            'keys': keys,
+            'limits': limits,
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds form only)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+scheduler = RequestScheduler(
+    max_in_flight=_env_int('AILOG_AI_MAX_IN_FLIGHT', 8),
+    max_retries=_env_int('AILOG_AI_MAX_RETRIES', 4),
+)
+
+
+def discord_rate_key(webhook_url: str) -> str:
+    """Scheduler key for a Discord webhook (one bucket per webhook id)."""
+    u = webhook_url or ''
+    if '/api/webhooks/' in u:
+        return 'discord:' + u.split('/api/webhooks/', 1)[1].split('/')[0]
+    return 'discord:' + u
@@ -0,0 +1,206 @@
+"""Drain-style log template mining used to condense logs before LLM analysis.
+
+Lines are tokenised, variable-looking tokens (numbers, IPs, hex ids, UUIDs)
+are masked and lines are grouped into templates via a fixed-depth prefix
+tree (token count -> leading tokens -> clusters), as in the Drain algorithm.
+Repeated lines collapse into one template row with a count, first/last
+timestamp and a few samples; error-level and rare lines are kept verbatim.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+WILDCARD = '<*>'
+
+CONDENSED_MARKER = '[--- Condensed log:'
+
+_TS_PREFIX_RE = re.compile(
+    r"^(?:"
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+[ 0-3]?\d\s+\d{2}:\d{2}:\d{2}"
+    r")\s*"
+)
+
+_MASKS = [
+    re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"),
+    re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?$"),
+    re.compile(r"^(?:0x)?[0-9a-fA-F]{6,}$"),
+    re.compile(r"^[-+]?\d+(?:[.:,]\d+)*[a-zA-Z%]{0,3}$"),
+]
+
+_TOKEN_DIGITS_RE = re.compile(r"\d+")
+
+ERROR_LEVEL_RE = re.compile(
+    r"\b(?:error|err|fail(?:ed|ure)?|fatal|crit(?:ical)?|panic|emerg|alert|exception|traceback|"
+    r"denied|refused|segfault|oom|killed|timed?\s?out|unable)\b",
+    re.IGNORECASE,
+)
+
+
+def split_timestamp(line: str) -> Tuple[Optional[str], str]:
+    """Return (timestamp, rest) when the line starts with an ISO or syslog timestamp."""
+    m = _TS_PREFIX_RE.match(line)
+    if not m:
+        return None, line
+    return m.group(0).strip(), line[m.end():]
+
+
+def _mask_token(tok: str) -> str:
+    for rx in _MASKS:
+        if rx.match(tok):
+            return WILDCARD
+    # e.g. "sshd[1234]:" -> "sshd[<*>]:"
+    if any(c.isdigit() for c in tok) and len(tok) > 1:
+        return _TOKEN_DIGITS_RE.sub(WILDCARD, tok)
+    return tok
+
+
+@dataclass
+class LogCluster:
+    template: List[str]
+    count: int = 0
+    first_ts: Optional[str] = None
+    last_ts: Optional[str] = None
+    samples: List[str] = field(default_factory=list)
+    line_numbers: List[int] = field(default_factory=list)
+
+    def template_str(self) -> str:
+        return ' '.join(self.template)
+
+
+class TemplateMiner:
+    """Minimal Drain implementation.
+
+    depth: number of leading tokens used to route a line in the prefix tree.
+    sim_threshold: fraction of positionally equal tokens needed to join a cluster.
+    max_children: fan-out per tree node before routing falls back to a wildcard child.
+    """
+
+    def __init__(self, depth: int = 3, sim_threshold: float = 0.5, max_children: int = 100,
+                 max_samples: int = 2, keep_line_numbers: int = 3):
+        self.depth = max(1, int(depth))
+        self.sim_threshold = float(sim_threshold)
+        self.max_children = max(1, int(max_children))
+        self.max_samples = max(0, int(max_samples))
+        self.keep_line_numbers = max(0, int(keep_line_numbers))
+        self._root: Dict[int, dict] = {}
+        self.clusters: List[LogCluster] = []
+
+    def _leaf(self, tokens: List[str]) -> List[LogCluster]:
+        node = self._root.setdefault(len(tokens), {})
+        for tok in tokens[:self.depth]:
+            key = WILDCARD if any(c.isdigit() for c in tok) else tok
+            if key not in node:
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                node = node.setdefault(key, {})
+            else:
+                node = node[key]
+        return node.setdefault('_clusters', [])
+
+    def _similarity(self, template: List[str], tokens: List[str]) -> float:
+        same = 0
+        for a, b in zip(template, tokens):
+            if a == b or a == WILDCARD:
+                same += 1
+        return same / max(len(tokens), 1)
+
+    def add(self, line: str, lineno: int = 0) -> LogCluster:
+        ts, rest = split_timestamp(line)
+        tokens = [_mask_token(t) for t in rest.split()] or ['']
+        leaf = self._leaf(tokens)
+
+        best, best_sim = None, -1.0
+        for cl in leaf:
+            sim = self._similarity(cl.template, tokens)
+            if sim > best_sim:
+                best, best_sim = cl, sim
+
+        if best is None or best_sim < self.sim_threshold:
+            best = LogCluster(template=list(tokens))
+            leaf.append(best)
+            self.clusters.append(best)
+        else:
+            best.template = [a if a == b else WILDCARD for a, b in zip(best.template, tokens)]
+
+        best.count += 1
+        if ts:
+            if best.first_ts is None:
+                best.first_ts = ts
+            best.last_ts = ts
+        if len(best.samples) < self.max_samples:
+            best.samples.append(line)
+        if len(best.line_numbers) < self.keep_line_numbers:
+            best.line_numbers.append(lineno)
+        return best
+
+
+def condense_log(log_content: str, rare_threshold: int = 2, min_lines: int = 50,
+                 max_verbatim: int = 400, max_errors_per_template: int = 5,
+                 sim_threshold: float = 0.5) -> str:
+    """Collapse repeated lines of a log into templates.
+
+    Error-level lines and lines belonging to templates seen at most
+    ``rare_threshold`` times are kept verbatim in original order; every other
+    template is emitted once with its count, first/last timestamp and a sample.
+    Error lines of a frequent template are capped at ``max_errors_per_template``
+    verbatim copies since the template row already carries the count.
+    Returns the input unchanged when it is short, already condensed, or when
+    condensing would not make it smaller.
+    """
+    if not log_content or log_content.startswith(CONDENSED_MARKER):
+        return log_content
+
+    lines = [ln for ln in log_content.splitlines() if ln.strip()]
+    if len(lines) < min_lines:
+        return log_content
+
+    miner = TemplateMiner(sim_threshold=sim_threshold)
+    assigned: List[Tuple[str, LogCluster]] = []
+    for n, ln in enumerate(lines):
+        assigned.append((ln, miner.add(ln, n)))
+
+    verbatim: List[str] = []
+    dropped_verbatim = 0
+    errors_seen: Dict[int, int] = {}
+    for ln, cl in assigned:
+        keep = cl.count <= rare_threshold
+        if not keep and ERROR_LEVEL_RE.search(ln):
+            seen = errors_seen.get(id(cl), 0)
+            keep = seen < max_errors_per_template
+            errors_seen[id(cl)] = seen + 1
+        if keep:
+            if len(verbatim) < max_verbatim:
+                verbatim.append(ln)
+            else:
+                dropped_verbatim += 1
+
+    frequent = [cl for cl in miner.clusters if cl.count > rare_threshold]
+    frequent.sort(key=lambda c: c.count, reverse=True)
+
+    out = [
+        f"{CONDENSED_MARKER} {len(lines)} lines -> {len(miner.clusters)} templates, "
+        f"{len(verbatim)} verbatim lines ---]",
+    ]
+    if frequent:
+        out.append('## Repeated templates (count | first .. last | template)')
+        for cl in frequent:
+            span = ''
+            if cl.first_ts:
+                span = cl.first_ts if cl.first_ts == cl.last_ts else f"{cl.first_ts} .. {cl.last_ts}"
+            out.append(f"x{cl.count} | {span or '-'} | {cl.template_str()}")
+            if cl.samples:
+                out.append(f"    e.g. {cl.samples[0]}")
+    if verbatim:
+        out.append('## Error-level and rare lines (verbatim, original order)')
+        out.extend(verbatim)
+        if dropped_verbatim:
+            out.append(f"[--- {dropped_verbatim} further verbatim lines omitted ---]")
+
+    condensed = '\n'.join(out)
+    if len(condensed) >= len(log_content):
+        return log_content
+    return condensed
@@ -6,7 +6,6 @@ import paramiko
 import shlex
 import os
 import datetime
-import openai
 import requests
 import json
 import re
@@ -14,19 +13,26 @@ import sqlite3
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
 import threading
-import queue
 import uuid
+from dataclasses import asdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from functools import lru_cache
 import ast
 import tempfile
-from sqlalchemy import text as sql_text
+from sqlalchemy import text as sql_text, func as sa_func, case as sa_case
 from sqlalchemy.exc import IntegrityError
 import shutil
-from database import db, Host, SystemInfo, Service, HostLog, SSHKey, Group, Tag, AppSetting, Schedule, ScheduleHost, ScheduleSource, SuricataSensor, SuricataIngestState, SuricataAlertBucket, SuricataFastAlertBucket, SuricataStatsCounterBucket, Monitor, MonitorCheck, HostDockerInventory
-from wizard_helpers import test_ssh_connection, collect_system_info, collect_services, execute_remote_command
+from database import db, Host, SystemInfo, Service, HostLog, SSHKey, Group, Tag, AppSetting, Schedule, ScheduleHost, ScheduleSource, ScheduleRun, ScheduleRunSource, SuricataSensor, SuricataIngestState, SuricataAlertBucket, SuricataFastAlertBucket, SuricataStatsCounterBucket, Monitor, MonitorCheck, HostDockerInventory, HostSourceInventory, SourceBaseline
+from wizard_helpers import test_ssh_connection, collect_system_info_and_services, execute_remote_command, ssh_command_args
 from utils.sshkey_crypto import encrypt_str, decrypt_str, is_configured as sshkey_crypto_configured, generate_master_key, SSHKeyCryptoError, compute_key_checksum, verify_key_checksum, normalize_ssh_key_text
+from analysis import condense_log
+from analysis.keywords import get_matcher as get_keyword_matcher
+from analysis.chunker import estimate_tokens, get_model_token_config, plan_chunks, tail_within_budget
+from analysis import clients as ai_http
+from analysis.ratelimit import discord_rate_key
+from analysis.mapreduce import MapReduceConfig, map_reduce_analyse, build_reduce_prompt, REDUCE_SYSTEM_PROMPT
+from analysis.baseline import Baseline, GateConfig, local_summary, window_stats
 
 # --- INITIALIZATION ---
 app = Flask(__name__, instance_path=None)
@@ -34,8 +40,27 @@ sock = Sock(app)
 
 # Monitoring subsystem (modular bolt-on)
 from monitoring import monitoring_bp
+from logaccess import read_file_page, read_journal_page
+from logaccess.paging import clamp_lines as clamp_page_lines, parse_cursor as parse_page_cursor
+from logaccess.live import TailHub, follow_command, spawn_follower
+from logaccess import transfer as ssh_transfer
+from logaccess.journal import JournalQuery, query_records
+from logaccess.mirror import LogMirror
+from logaccess.search_index import LogIndex
+from logaccess.gzindex import GzIndexCache, StaleArchive, build_index as build_gz_index
+from logaccess.timeindex import TimeIndexCache
+from logaccess.units import JournalUnitCache
+from logaccess.scan import stream_scan
+from logaccess.helper import HelperClient, HelperError
+from logaccess.histogram import HistogramCache, count_file, count_journal, count_mirror
+from logaccess.timestamps import line_datetime, parse_time
 app.register_blueprint(monitoring_bp)
 
+# Mock LLM provider for benchmarking (opt-in; see analysis/mock_provider.py)
+if os.getenv('AILOG_MOCK_LLM', '').strip().lower() in ('1', 'true', 'yes', 'on'):
+    from analysis.mock_provider import mock_llm_bp
+    app.register_blueprint(mock_llm_bp, url_prefix='/mock-llm')
+
 # --- DATABASE CONFIGURATION ---
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:////home/david/code/ailog/ailog.db')
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
@@ -160,90 +185,228 @@ with app.app_context():
 
 scheduler = BackgroundScheduler(daemon=True)
 
-# --- MULTI-SCHEDULE RUN QUEUE (serial execution) ---
-# Single worker thread processes schedule runs one-at-a-time.
-schedule_run_queue: queue.Queue = queue.Queue()
-_schedule_worker_started = False
+# --- MULTI-SCHEDULE RUN QUEUE (worker pool) ---
+# A small pool of workers drains a priority queue of schedule runs. Manual
+# runs (Run Now) are dispatched before scheduled ones, a schedule never runs
+# twice at once, and two runs that touch the same host never overlap.
+SCHEDULE_WORKERS = max(1, int(os.getenv('AILOG_SCHEDULE_WORKERS', '3') or 3))
+
+# Live tail: how often followed lines are batched into a frame, and how many
+# frames a slow viewer may fall behind before its oldest frames are dropped.
+LIVE_TAIL_FLUSH_MS = max(50, int(os.getenv('AILOG_LIVE_TAIL_FLUSH_MS', '300') or 300))
+LIVE_TAIL_MAX_FRAMES = max(1, int(os.getenv('AILOG_LIVE_TAIL_MAX_FRAMES', '200') or 200))
+# Seconds a host's journal unit list is served without a background refresh
+JOURNAL_UNITS_TTL = max(10, int(os.getenv('AILOG_JOURNAL_UNITS_TTL', '300') or 300))
+# Units grepped as text when the host's journalctl has no -g (search fallback)
+JOURNAL_GREP_FALLBACK_UNITS = max(1, int(os.getenv('AILOG_JOURNAL_GREP_FALLBACK_UNITS', '10') or 10))
+# Source scans: hosts scanned at once, and seconds each host gets before it is reported as timed out
+SOURCE_SCAN_WORKERS = max(1, int(os.getenv('AILOG_SOURCE_SCAN_WORKERS', '8') or 8))
+SOURCE_SCAN_HOST_TIMEOUT = max(5, int(os.getenv('AILOG_SOURCE_SCAN_HOST_TIMEOUT', '60') or 60))
+SCHEDULE_PRIORITY_MANUAL = 0
+SCHEDULE_PRIORITY_SCHEDULED = 10
+
+_schedule_workers_started = False
+_schedule_workers_lock = threading.Lock()
 
 # Schedule run status (in-memory): schedule_id -> dict
 schedule_status_map = {}
 
 
-def _enqueue_schedule_run(schedule_id: int, reason: str = 'scheduled', emit=None):
-    schedule_run_queue.put({'schedule_id': schedule_id, 'reason': reason, 'emit': emit, 'enqueued_at': datetime.datetime.now(datetime.timezone.utc).isoformat()})
+def _utcnow_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
 
 
-def _ensure_schedule_worker():
-    global _schedule_worker_started
-    if _schedule_worker_started:
-        return
+class _ScheduleRunQueue:
+    """Pending schedule runs ordered by (priority, enqueue order) with per-host exclusion."""
 
-    def worker_loop():
-        while True:
-            item = schedule_run_queue.get()
-            try:
-                sid = int(item.get('schedule_id'))
-                reason = item.get('reason') or 'scheduled'
-                emit = item.get('emit')
-
-                # track status
-                schedule_status_map[sid] = {
-                    'state': 'running',
-                    'reason': reason,
-                    'queued_at': item.get('enqueued_at'),
-                    'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                    'finished_at': None,
-                    'error': None,
-                }
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = []        # list of run items
+        self._running = {}        # schedule_id -> item
+        self._busy_hosts = set()
+        self._seq = 0
+
+    def put(self, schedule_id, reason, emit, priority, hosts):
+        with self._cond:
+            for item in self._pending:
+                if item['schedule_id'] != schedule_id:
+                    continue
+                # Coalesce with the pending run; a manual request upgrades its priority
+                if emit:
+                    item['emits'].append(emit)
+                if priority < item['priority']:
+                    item['priority'] = priority
+                    item['reason'] = reason
+                item['hosts'] = hosts
+                self._cond.notify_all()
+                return item
+            self._seq += 1
+            item = {
+                'schedule_id': schedule_id,
+                'reason': reason,
+                'priority': priority,
+                'seq': self._seq,
+                'hosts': hosts,
+                'emits': [emit] if emit else [],
+                'enqueued_at': _utcnow_iso(),
+                'enqueued_mono': time.monotonic(),
+            }
+            self._pending.append(item)
+            self._cond.notify_all()
+            return item
+
+    def take(self):
+        """Block until a run can start without conflicting with running ones."""
+        with self._cond:
+            while True:
+                for item in sorted(self._pending, key=lambda i: (i['priority'], i['seq'])):
+                    if item['schedule_id'] in self._running:
+                        continue
+                    if self._busy_hosts & item['hosts']:
+                        continue
+                    self._pending.remove(item)
+                    self._running[item['schedule_id']] = item
+                    self._busy_hosts |= item['hosts']
+                    return item
+                self._cond.wait()
+
+    def done(self, item):
+        with self._cond:
+            self._running.pop(item['schedule_id'], None)
+            self._busy_hosts -= item['hosts']
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            pending = sorted(self._pending, key=lambda i: (i['priority'], i['seq']))
+            return {
+                'workers': SCHEDULE_WORKERS,
+                'pending': [{'schedule_id': i['schedule_id'], 'reason': i['reason'], 'priority': i['priority'],
+                             'hosts': sorted(i['hosts']), 'enqueued_at': i['enqueued_at']} for i in pending],
+                'running': sorted(self._running.keys()),
+                'busy_hosts': sorted(self._busy_hosts),
+            }
 
-                def _emit(payload):
+
+schedule_run_queue = _ScheduleRunQueue()
+
+
+def _schedule_hosts(schedule_id: int):
+    """Hosts touched by a schedule's sources (needs an app context)."""
+    rows = ScheduleSource.query.filter_by(schedule_id=schedule_id).all()
+    return {str(r.host_id or 'local') for r in rows} or {'local'}
+
+
+def _enqueue_schedule_run(schedule_id: int, reason: str = 'scheduled', emit=None):
+    priority = SCHEDULE_PRIORITY_MANUAL if reason == 'manual' else SCHEDULE_PRIORITY_SCHEDULED
+    try:
+        if has_app_context():
+            hosts = _schedule_hosts(schedule_id)
+        else:
+            with app.app_context():
+                hosts = _schedule_hosts(schedule_id)
+    except Exception:
+        hosts = {'local'}
+    item = schedule_run_queue.put(int(schedule_id), reason, emit, priority, hosts)
+    prev = schedule_status_map.get(int(schedule_id)) or {}
+    if prev.get('state') != 'running':
+        schedule_status_map[int(schedule_id)] = {
+            'state': 'queued',
+            'reason': item['reason'],
+            'queued_at': item['enqueued_at'],
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+        }
+    return item
+
+
+def _schedule_worker_loop():
+    while True:
+        item = schedule_run_queue.take()
+        sid = item['schedule_id']
+        reason = item.get('reason') or 'scheduled'
+        emits = list(item.get('emits') or [])
+        try:
+            schedule_status_map[sid] = {
+                'state': 'running',
+                'reason': reason,
+                'queued_at': item.get('enqueued_at'),
+                'started_at': _utcnow_iso(),
+                'finished_at': None,
+                'error': None,
+                'queue_wait_seconds': round(time.monotonic() - item['enqueued_mono'], 3),
+                'hosts': sorted(item['hosts']),
+            }
+
+            def _emit(payload):
+                for fn in emits:
                     try:
-                        if emit:
-                            emit(payload)
+                        fn(payload)
                     except Exception:
                         pass
 
-                # Load schedule and run inside app context
-                with app.app_context():
-                    sched = Schedule.query.get(sid)
-                    if not sched or not sched.enabled:
-                        schedule_status_map[sid].update({
-                            'state': 'skipped',
-                            'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                            'error': 'Schedule not found or disabled',
-                        })
-                        _emit({'status': 'log', 'message': 'Skipped: schedule not found or disabled.'})
-                    else:
-                        _emit({'status': 'progress', 'message': f'Running schedule: {sched.name}', 'progress': 0})
-                        _run_schedule(sched, emit=_emit)
-                        schedule_status_map[sid].update({
-                            'state': 'idle',
-                            'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                        })
-            except Exception as e:
+            # Load schedule and run inside app context
+            with app.app_context():
+                sched = Schedule.query.get(sid)
+                if not sched or not sched.enabled:
+                    schedule_status_map[sid].update({
+                        'state': 'skipped',
+                        'finished_at': _utcnow_iso(),
+                        'error': 'Schedule not found or disabled',
+                    })
+                    _emit({'status': 'log', 'message': 'Skipped: schedule not found or disabled.'})
+                    _emit({'status': 'complete', 'message': 'Skipped.', 'progress': 100})
+                else:
+                    _emit({'status': 'progress', 'message': f'Running schedule: {sched.name}', 'progress': 0})
+                    _run_schedule(sched, emit=_emit, run_meta={
+                        'reason': reason,
+                        'queued_at': datetime.datetime.fromisoformat(item['enqueued_at']).replace(tzinfo=None),
+                        'queue_wait_ms': int(schedule_status_map[sid]['queue_wait_seconds'] * 1000),
+                    })
+                    schedule_status_map[sid].update({
+                        'state': 'idle',
+                        'finished_at': _utcnow_iso(),
+                    })
+        except Exception as e:
+            schedule_status_map[sid] = {
+                'state': 'error',
+                'reason': reason,
+                'queued_at': item.get('enqueued_at'),
+                'started_at': schedule_status_map.get(sid, {}).get('started_at'),
+                'finished_at': _utcnow_iso(),
+                'error': str(e),
+            }
+            for fn in emits:
                 try:
-                    sid = int(item.get('schedule_id'))
-                    schedule_status_map[sid] = {
-                        'state': 'error',
-                        'reason': item.get('reason') or 'scheduled',
-                        'queued_at': item.get('enqueued_at'),
-                        'started_at': schedule_status_map.get(sid, {}).get('started_at'),
-                        'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                        'error': str(e),
-                    }
+                    fn({'status': 'error', 'message': f'Schedule run failed: {e}'})
                 except Exception:
                     pass
-            finally:
-                schedule_run_queue.task_done()
+        finally:
+            schedule_run_queue.done(item)
 
-    t = threading.Thread(target=worker_loop, daemon=True)
-    t.start()
-    _schedule_worker_started = True
+
+def _ensure_schedule_worker():
+    """Start the schedule worker pool once."""
+    global _schedule_workers_started
+    with _schedule_workers_lock:
+        if _schedule_workers_started:
+            return
+        for n in range(SCHEDULE_WORKERS):
+            t = threading.Thread(target=_schedule_worker_loop, name=f'schedule-worker-{n + 1}', daemon=True)
+            t.start()
+        _schedule_workers_started = True
 
 
 # --- CONFIGURATION ---
 LOG_DIRECTORY = '/var/log'
 MAX_CHAR_COUNT = 40000 
+# Provider API bases; overridable to point at a proxy or the built-in mock provider
+OPENAI_BASE_URL_OVERRIDE = (os.getenv('AILOG_OPENAI_BASE_URL') or '').rstrip('/') or None
+OPENAI_API_BASE = OPENAI_BASE_URL_OVERRIDE or 'https://api.openai.com/v1'
+OPENROUTER_API_BASE = (os.getenv('AILOG_OPENROUTER_BASE_URL') or 'https://openrouter.ai/api/v1').rstrip('/')
+# Upper bound on input tokens per LLM request, even for models with larger context windows
+MAX_INPUT_TOKENS = 24000
 DISCORD_ALERT_KEYWORDS = ['error', 'issue', 'failed', 'warning', 'critical', 'exception', 'denied', 'unable']
 
 # AI Search (prompt + keywords) - defaults; can be overridden per DB settings
@@ -266,6 +429,11 @@ def set_suricata_prompt(prompt: str):
     _setting_set('suricata.prompt', (prompt or DEFAULT_SURICATA_PROMPT).strip())
 
 
+def get_alert_matcher():
+    """Compiled matcher for the current alert keywords (rebuilt only when they change)."""
+    return get_keyword_matcher(get_ai_alert_keywords())
+
+
 def get_ai_alert_keywords():
     kws = _setting_get('ai.alert_keywords', DEFAULT_ALERT_KEYWORDS)
     if not isinstance(kws, list):
@@ -278,21 +446,76 @@ def get_ai_alert_keywords():
     return out
 
 
+
+def get_map_reduce_config():
+    """Map-reduce tunables for multi-chunk analysis (DB-backed, see /ai/search-config)."""
+    d = MapReduceConfig()
+    raw = _setting_get('ai.map_reduce', {}) or {}
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        return MapReduceConfig(
+            map_workers=raw.get('map_workers', d.map_workers),
+            reduce_fan_in=raw.get('reduce_fan_in', d.reduce_fan_in),
+            max_depth=raw.get('max_depth', d.max_depth),
+            max_report_chars=raw.get('max_report_chars', d.max_report_chars),
+        ).normalised()
+    except (TypeError, ValueError):
+        return d
+
+def get_anomaly_gate_config():
+    """Baseline gate in front of scheduled LLM analysis (DB-backed, see /ai/search-config)."""
+    d = GateConfig()
+    raw = _setting_get('ai.anomaly_gate', {}) or {}
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        return GateConfig(**{k: raw.get(k, getattr(d, k)) for k in asdict(d)}).normalised()
+    except (TypeError, ValueError):
+        return d
+
 CONFIG_FILE = 'scheduler_config.json'
 HOSTS_FILE = 'hosts.json'
 
 
 # --- DB-BACKED APP SETTINGS ---
 
+# Write-through cache of raw AppSetting.value_json (None = row missing).
+# _setting_set updates it; the TTL bounds staleness when another process
+# (e.g. a second gunicorn worker) writes the same key.
+SETTINGS_CACHE_TTL = 30
+_settings_cache = {}
+_settings_cache_lock = threading.Lock()
+
+
+def _settings_cache_clear():
+    """Drop all cached settings (after restores or bulk writes that bypass _setting_set)."""
+    with _settings_cache_lock:
+        _settings_cache.clear()
+
+
+def _setting_decode(raw, default):
+    if raw is None:
+        return default
+    try:
+        return json.loads(raw)
+    except Exception:
+        return raw
+
+
 def _setting_get(key, default=None):
+    now = time.monotonic()
+    with _settings_cache_lock:
+        hit = _settings_cache.get(key)
+    if hit is not None and hit[1] > now:
+        return _setting_decode(hit[0], default)
+
     def _do():
         row = AppSetting.query.get(key)
-        if not row or row.value_json is None:
-            return default
-        try:
-            return json.loads(row.value_json)
-        except Exception:
-            return row.value_json
+        raw = row.value_json if row else None
+        with _settings_cache_lock:
+            _settings_cache[key] = (raw, now + SETTINGS_CACHE_TTL)
+        return _setting_decode(raw, default)
 
     if has_app_context():
         return _do()
@@ -325,6 +548,8 @@ def _setting_set(key, value):
             db.session.add(row)
         row.value_json = json.dumps(value)
         db.session.commit()
+        with _settings_cache_lock:
+            _settings_cache[key] = (row.value_json, time.monotonic() + SETTINGS_CACHE_TTL)
 
     if has_app_context():
         return _do()
@@ -332,9 +557,16 @@ def _setting_set(key, value):
         return _do()
 
 
+_scheduler_config_migrated = False
+
+
 def _migrate_scheduler_config_file_to_db():
     # One-time migration from scheduler_config.json into DB settings.
+    global _scheduler_config_migrated
+    if _scheduler_config_migrated:
+        return
     if not os.path.exists(CONFIG_FILE):
+        _scheduler_config_migrated = True
         return
     try:
         with open(CONFIG_FILE, 'r') as f:
@@ -365,6 +597,8 @@ def _migrate_scheduler_config_file_to_db():
 
     if changed:
         db.session.commit()
+        _settings_cache_clear()
+    _scheduler_config_migrated = True
 
 # --- HELPER FUNCTIONS for HOSTS ---
 def load_hosts():
@@ -396,6 +630,90 @@ def get_ssh_prefix_args(user, ip, identity_file=None):
 
 # -----------------------------
 # --- SEARCH FUNCTIONALITY ---
+# --- SEARCH INDEX ---
+# Local FTS5 index fed from mirror syncs and analysis fetches (logaccess.search_index).
+
+SEARCH_INDEX_PATH = os.getenv('AILOG_SEARCH_INDEX') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_index.db')
+SEARCH_INDEX_DAYS = max(1, int(os.getenv('AILOG_SEARCH_INDEX_DAYS') or 14))
+log_index = LogIndex(SEARCH_INDEX_PATH)
+
+def _index_feed(fn, *args):
+    """Feed the search index; failures are logged and never break the caller."""
+    if not log_index.available:
+        return 0
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"[WARN] Search index update failed: {e}")
+        return 0
+
+def _search_index_prune_job():
+    try:
+        removed = log_index.prune(SEARCH_INDEX_DAYS)
+        if removed:
+            print(f"[INFO] Search index pruned {removed} lines older than {SEARCH_INDEX_DAYS} days")
+    except Exception as e:
+        print(f"[WARN] Search index prune failed: {e}")
+
+def _search_index_response(data, query):
+    """Ranked, paginated /search results from the local index."""
+    scope = data.get('scope', 'all')
+    kinds = sources = None
+    if scope != 'all' and ':' in scope:
+        kind, name = scope.split(':', 1)
+        kinds, sources = [kind], [name]
+    if data.get('sources'):
+        sources = list(data['sources'])
+    try:
+        per_page = int(data.get('per_page') or 50)
+        page = max(1, int(data.get('page') or 1))
+        since, until = parse_time(data.get('since')), parse_time(data.get('until'))
+        found = log_index.search(query, hosts=data.get('host_filter') or None, sources=sources, kinds=kinds,
+                                 since=since, until=until, limit=per_page, offset=(page - 1) * per_page,
+                                 order='time' if data.get('order') == 'time' else 'rank')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    names = {'local': 'Localhost'}
+    names.update({h_id: h.get('friendly_name', h_id) for h_id, h in load_hosts().items()})
+    results = [{
+        'host_id': r['host'],
+        'host_name': names.get(r['host'], r['host']),
+        'log_name': r['source'],
+        'log_type': r['kind'],
+        'line_number': None,
+        'content': r['text'],
+        'timestamp': datetime.datetime.fromtimestamp(r['ts']).isoformat(timespec='seconds'),
+        'score': r['score'],
+    } for r in found['results']]
+    return jsonify({
+        'results': results,
+        'total_matches': found['total'],
+        'page': page,
+        'per_page': found['limit'],
+        'has_more': found['has_more'],
+        'took_ms': found['took_ms'],
+        'failed_hosts': [],
+        'query': query,
+        'scope': scope,
+        'mode': 'index',
+    })
+
+@app.route('/search/index/status', methods=['GET'])
+def search_index_status():
+    return jsonify({**log_index.stats(), 'retention_days': SEARCH_INDEX_DAYS})
+
+@app.route('/search/index/clear', methods=['POST'])
+def search_index_clear():
+    """Empty the index, or only one host's lines with {"host": id}."""
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        removed = log_index.clear(data.get('host') or None)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'status': 'cleared', 'removed': removed})
+
 @app.route('/search', methods=['POST'])
 def search_logs():
     """Search for keywords/phrases across logs"""
@@ -407,6 +725,9 @@ def search_logs():
     
     if not query:
         return jsonify({'error': 'Search query is required'}), 400
+
+    if data.get('mode') == 'index':
+        return _search_index_response(data, query)
     
     search_results = []
     failed_hosts = []
@@ -445,6 +766,14 @@ def search_logs():
         'scope': search_scope
     })
 
+def _search_pattern(query, case_sensitive):
+    """Compile a search query like grep would use it, falling back to a literal match."""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    try:
+        return re.compile(query, flags)
+    except re.error:
+        return re.compile(re.escape(query), flags)
+
 def search_host_logs(host_id, host_name, query, search_scope, case_sensitive):
     """Search for query in logs on a specific host"""
     results = []
@@ -452,77 +781,164 @@ def search_host_logs(host_id, host_name, query, search_scope, case_sensitive):
     # Get available log sources from the host
     try:
         # List log files
-        cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
-        res_ls = execute_command(host_id, cmd_ls, timeout=10)
-        filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
+        listed = _helper_log_files(host_id)
+        if listed is not None:
+            filenames = [name for name, _, _ in listed]
+        else:
+            cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
+            res_ls = execute_command(host_id, cmd_ls, timeout=10)
+            filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
         
         # Search in log files
+        remote_files = []
         for filename in filenames:
             if search_scope != 'all' and search_scope != f"file:{filename}":
                 continue
                 
-            try:
-                # Use grep to search within the file
-                grep_flags = "-i" if not case_sensitive else ""
-                if filename.endswith('.gz'):
-                    search_cmd = f"sudo zcat {shlex.quote(os.path.join(LOG_DIRECTORY, filename))} 2>/dev/null | grep {grep_flags} -n {shlex.quote(query)} | head -20"
-                else:
-                    search_cmd = f"sudo grep {grep_flags} -n {shlex.quote(query)} {shlex.quote(os.path.join(LOG_DIRECTORY, filename))} | head -20"
+            mirrored = mirror_fresh(host_id, 'file', filename)
+            if mirrored is not None:
+                for line_num, content in mirrored.grep(_search_pattern(query, case_sensitive), limit=20):
+                    results.append({
+                        'host_id': host_id,
+                        'host_name': host_name,
+                        'log_name': filename,
+                        'log_type': 'file',
+                        'line_number': str(line_num),
+                        'content': content.strip(),
+                        'timestamp': None
+                    })
+                continue
+            remote_files.append(filename)
+
+        # With the helper every file is grepped in one round trip, in parallel on the host
+        grep_pattern = _search_pattern(query, case_sensitive).pattern
+        responses = helper_batch(host_id, [
+            {'op': 'grep', 'path': os.path.join(LOG_DIRECTORY, filename), 'pattern': grep_pattern,
+             'ignore_case': not case_sensitive, 'max_matches': 20}
+            for filename in remote_files
+        ], timeout=30) if remote_files else []
+        if responses is not None:
+            for filename, response in zip(remote_files, responses):
+                if not response.ok:
+                    continue  # Skip files we can't read
+                for line_num, content in response.result['matches']:
+                    results.append({
+                        'host_id': host_id,
+                        'host_name': host_name,
+                        'log_name': filename,
+                        'log_type': 'file',
+                        'line_number': str(line_num),
+                        'content': content.strip(),
+                        'timestamp': None
+                    })
+        else:
+            for filename in remote_files:
+                try:
+                    # Use grep to search within the file
+                    grep_flags = "-i" if not case_sensitive else ""
+                    if filename.endswith('.gz'):
+                        search_cmd = f"sudo zcat {shlex.quote(os.path.join(LOG_DIRECTORY, filename))} 2>/dev/null | grep {grep_flags} -n {shlex.quote(query)} | head -20"
+                    else:
+                        search_cmd = f"sudo grep {grep_flags} -n {shlex.quote(query)} {shlex.quote(os.path.join(LOG_DIRECTORY, filename))} | head -20"
                 
-                result = execute_command(host_id, search_cmd, timeout=15)
+                    result = execute_command(host_id, search_cmd, timeout=15, compress=True, label='search')
                 
-                if result.stdout.strip():
-                    lines = result.stdout.strip().split('\n')
-                    for line in lines:
-                        if ':' in line:
+                    if result.stdout.strip():
+                        lines = result.stdout.strip().split('\n')
+                        for line in lines:
+                            if ':' in line:
+                                line_num, content = line.split(':', 1)
+                                results.append({
+                                    'host_id': host_id,
+                                    'host_name': host_name,
+                                    'log_name': filename,
+                                    'log_type': 'file',
+                                    'line_number': line_num,
+                                    'content': content.strip(),
+                                    'timestamp': None  # Could extract from log line if needed
+                                })
+                except Exception as e:
+                    # Skip files we can't read
+                    continue
+        
+        # Search in journal services if scope allows
+        if search_scope == 'all' or search_scope.startswith('journal:'):
+            try:
+                if search_scope == 'all':
+                    units, _ = journal_unit_cache.get(host_id)
+                else:
+                    units = [search_scope.split(':', 1)[1]]
+                pattern = _search_pattern(query, case_sensitive)
+                remote_units = []
+                for unit in units:
+                    mirrored = mirror_fresh(host_id, 'journal', unit)
+                    if mirrored is None:
+                        remote_units.append(unit)
+                        continue
+                    for line_num, content in mirrored.grep(pattern, limit=10):
+                        results.append({
+                            'host_id': host_id,
+                            'host_name': host_name,
+                            'log_name': unit,
+                            'log_type': 'journal',
+                            'line_number': str(line_num),
+                            'content': content.strip(),
+                            'timestamp': None
+                        })
+
+                try:
+                    # One remote match (journalctl -g) across every unit not served from the mirror
+                    mirrored_units = set(units) - set(remote_units)
+                    jq = JournalQuery(unit=units[0] if search_scope != 'all' else None, grep=query,
+                                      case_sensitive=case_sensitive)
+                    records = query_records(_log_runner(host_id, label='search'), jq, lines=200, timeout=20)
+                    per_unit = {}
+                    for rec in records:
+                        unit = rec.unit or rec.ident or 'journal'
+                        if unit in mirrored_units or per_unit.get(unit, 0) >= 10:
+                            continue
+                        per_unit[unit] = per_unit.get(unit, 0) + 1
+                        results.append({
+                            'host_id': host_id,
+                            'host_name': host_name,
+                            'log_name': unit,
+                            'log_type': 'journal',
+                            'line_number': str(per_unit[unit]),
+                            'content': rec.format_line(),
+                            'timestamp': datetime.datetime.fromtimestamp(rec.ts).isoformat() if rec.ts else None
+                        })
+                    remote_units = []
+                except Exception:
+                    pass  # journalctl without -g support; fall back to grepping text per unit
+
+                # Text grep of the last 100 entries per unit, at most JOURNAL_GREP_FALLBACK_UNITS units in one command
+                remote_units = remote_units[:JOURNAL_GREP_FALLBACK_UNITS]
+                if remote_units:
+                    grep_flags = "-i" if not case_sensitive else ""
+                    journal_search_cmd = '; '.join(
+                        f"echo {shlex.quote('@@unit ' + unit)}; sudo journalctl -u {shlex.quote(unit)} -n 100 --no-pager "
+                        f"| grep {grep_flags} -n -- {shlex.quote(query)} | head -10"
+                        for unit in remote_units)
+                    try:
+                        result = execute_command(host_id, journal_search_cmd, timeout=30, compress=True, label='search')
+                    except Exception:
+                        result = None
+                    unit = None
+                    for line in (result.stdout.splitlines() if result else []):
+                        if line.startswith('@@unit '):
+                            unit = line[len('@@unit '):]
+                        elif unit and ':' in line:
                             line_num, content = line.split(':', 1)
                             results.append({
                                 'host_id': host_id,
                                 'host_name': host_name,
-                                'log_name': filename,
-                                'log_type': 'file',
+                                'log_name': unit,
+                                'log_type': 'journal',
                                 'line_number': line_num,
                                 'content': content.strip(),
-                                'timestamp': None  # Could extract from log line if needed
+                                'timestamp': None
                             })
-            except Exception as e:
-                # Skip files we can't read
-                continue
-        
-        # Search in journal services if scope allows
-        if search_scope == 'all' or search_scope.startswith('journal:'):
-            try:
-                cmd_journal = "sudo journalctl --field _SYSTEMD_UNIT | sort | uniq | head -10"
-                res_journal = execute_command(host_id, cmd_journal, timeout=10)
-                journal_units = [unit for unit in res_journal.stdout.strip().split('\n') if unit]
-                
-                for unit in journal_units:
-                    if search_scope != 'all' and search_scope != f"journal:{unit}":
-                        continue
-                        
-                    try:
-                        # Search in journal for this unit
-                        grep_flags = "-i" if not case_sensitive else ""
-                        journal_search_cmd = f"sudo journalctl -u {shlex.quote(unit)} -n 100 --no-pager | grep {grep_flags} -n {shlex.quote(query)} | head -10"
-                        result = execute_command(host_id, journal_search_cmd, timeout=15)
-                        
-                        if result.stdout.strip():
-                            lines = result.stdout.strip().split('\n')
-                            for line in lines:
-                                if ':' in line:
-                                    line_num, content = line.split(':', 1)
-                                    results.append({
-                                        'host_id': host_id,
-                                        'host_name': host_name,
-                                        'log_name': unit,
-                                        'log_type': 'journal',
-                                        'line_number': line_num,
-                                        'content': content.strip(),
-                                        'timestamp': None
-                                    })
-                    except Exception as e:
-                        continue
-                        
+
             except Exception as e:
                 # Skip journal search if it fails
                 pass
@@ -533,14 +949,8 @@ def search_host_logs(host_id, host_name, query, search_scope, case_sensitive):
     return results
 
 # --- CORE LOGIC (Refactored for Remote Execution) ---
-def execute_command(hostname, command_str, timeout=10):
-    """Execute a command either locally or against a remote host.
-
-    hostname can be:
-      - 'local' to run on this machine
-      - a config host ID from load_hosts()
-      - a database-backed host ID like 'db-<id>' created by the wizard
-    """
+def _command_args(hostname, command_str):
+    """Return (args, shell) to run command_str on hostname (see execute_command)."""
     ssh_prefix_args = []
     if hostname != 'local':
         # First try config-based hosts
@@ -578,9 +988,46 @@ def execute_command(hostname, command_str, timeout=10):
     cmd_list = ssh_prefix_args + [command_str] if ssh_prefix_args else [command_str]
     # Use shell=False for remote commands for security, shell=True for local for simplicity with sudo
     shell_mode = not bool(ssh_prefix_args)
+    return cmd_list, shell_mode
+
+def execute_command(hostname, command_str, timeout=10, errors=None, compress=False, label=None):
+    """Execute a command either locally or against a remote host.
+
+    errors is passed to the output decoder (e.g. 'surrogateescape' to keep
+    undecodable bytes round-trippable). compress=True marks bulk output that
+    may be sent compressed when AILOG_SSH_COMPRESSION is enabled (remote hosts
+    only); label names the call in the transfer stats.
+
+    hostname can be:
+      - 'local' to run on this machine
+      - a config host ID from load_hosts()
+      - a database-backed host ID like 'db-<id>' created by the wizard
+    """
+    if compress and hostname != 'local' and ssh_transfer.default_mode() != 'off':
+        try:
+            result = ssh_transfer.run_compressed(lambda c: _command_args(hostname, c), command_str, timeout=timeout,
+                                                 errors=errors, label=label or 'ssh')
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, result.args, output=result.stdout, stderr=result.stderr)
+            return result
+        except subprocess.CalledProcessError as e:
+            stderr = (e.stderr or '').strip()
+            print(f"[DEBUG] SSH command failed with return code {e.returncode}", flush=True)
+            print(f"[DEBUG] STDERR: {stderr[:2000]}", flush=True)
+            raise RuntimeError(f"SSH command failed (rc={e.returncode}): {stderr or '<no stderr>'}")
+
+    cmd_list, shell_mode = _command_args(hostname, command_str)
     print(f"[DEBUG] Executing command: {cmd_list}")
     try:
-        result = subprocess.run(cmd_list, shell=shell_mode, capture_output=True, text=True, check=True, timeout=timeout)
+        if errors == 'surrogateescape':
+            # Exact bytes: decode here, since text mode would also translate \r and \r\n
+            result = subprocess.run(cmd_list, shell=shell_mode, capture_output=True, timeout=timeout)
+            result.stdout = result.stdout.decode('utf-8', errors)
+            result.stderr = result.stderr.decode('utf-8', 'replace')
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, result.args, output=result.stdout, stderr=result.stderr)
+            return result
+        result = subprocess.run(cmd_list, shell=shell_mode, capture_output=True, text=True, check=True, timeout=timeout, errors=errors)
         return result
     except subprocess.CalledProcessError as e:
         # Ensure we log and propagate stderr/stdout for actionable SSH failures (e.g. Permission denied).
@@ -592,6 +1039,61 @@ def execute_command(hostname, command_str, timeout=10):
         # Raise an error that includes stderr so the UI can surface the real SSH reason.
         raise RuntimeError(f"SSH command failed (rc={e.returncode}): {stderr or '<no stderr>'}")
 
+# --- REMOTE HELPER ---
+# Optional helper agent (logaccess/remote_helper.py) pushed to hosts over SSH.
+# Listing, stats, greps and reads go to it as one batch instead of one SSH
+# round trip each. AILOG_REMOTE_HELPER: off (default) | oneshot | session.
+REMOTE_HELPER_MODE = (os.getenv('AILOG_REMOTE_HELPER', 'off') or 'off').strip().lower()
+REMOTE_HELPER_WORKERS = max(1, int(os.getenv('AILOG_REMOTE_HELPER_WORKERS', '4') or 4))
+REMOTE_HELPER_IDLE = max(10, int(os.getenv('AILOG_REMOTE_HELPER_IDLE', '300') or 300))
+remote_helper = HelperClient(_command_args, mode=REMOTE_HELPER_MODE, workers=REMOTE_HELPER_WORKERS,
+                             idle_seconds=REMOTE_HELPER_IDLE)
+atexit.register(remote_helper.close)
+
+def helper_batch(hostname, requests, timeout=30):
+    """Helper responses for [{'op': ..., **args}], or None when the caller should use plain commands."""
+    if not remote_helper.available(hostname):
+        return None
+    try:
+        return remote_helper.batch(hostname, requests, timeout=timeout)
+    except HelperError as e:
+        print(f"[WARN] Remote helper on '{hostname}' failed, using plain commands: {e}")
+        return None
+
+def _helper_log_files(hostname):
+    """[(filename, size, mtime)] for the files in LOG_DIRECTORY in one helper call, or None."""
+    responses = helper_batch(hostname, [{'op': 'list', 'path': LOG_DIRECTORY}], timeout=15)
+    if not responses or not responses[0].ok:
+        return None
+    return [(e['name'], e['size'], e['mtime']) for e in responses[0].result['entries'] if e.get('type') == 'file']
+
+def _log_file_sources(host_id, host_name, listed):
+    """Source entries for non-empty files; the 10 most recently modified when there are more than 10 files."""
+    files = [f for f in listed if f[1] > 0]
+    if len(listed) > 10:
+        files = sorted(files, key=lambda f: f[2], reverse=True)[:10]
+    return [{
+        'name': filename,
+        'type': 'file',
+        'host': host_id,
+        'host_name': host_name,
+        'size_bytes': size_bytes,
+        'size_formatted': format_bytes(size_bytes),
+        'modified_epoch': mod_time_epoch,
+        'modified_formatted': format_relative_time(mod_time_epoch)
+    } for filename, size_bytes, mod_time_epoch in files]
+
+@app.route('/helper/status', methods=['GET'])
+def remote_helper_status():
+    return jsonify(remote_helper.snapshot())
+
+@app.route('/helper/restart', methods=['POST'])
+def remote_helper_restart():
+    """Close helper sessions (all, or {"host_id": ...}) and forget hosts marked unavailable."""
+    data = request.get_json(silent=True) or {}
+    remote_helper.close(data.get('host_id') or None)
+    return jsonify({'message': 'Helper sessions closed', 'host': data.get('host_id') or 'all'})
+
 def get_log_sources_from_host_stream(hostname='local'):
     def generate_event(data):
         return f"data: {json.dumps(data)}\n\n"
@@ -616,9 +1118,7 @@ def get_log_sources_from_host_stream(hostname='local'):
                 continue
         yield generate_event({'status': 'progress', 'message': 'Fetching journald services...', 'progress': 95})
         try:
-            cmd_journal = "sudo journalctl --field _SYSTEMD_UNIT | sort | uniq"
-            res_journal = execute_command(hostname, cmd_journal)
-            journal_units = [unit for unit in res_journal.stdout.strip().split('\n') if unit]
+            journal_units, _ = journal_unit_cache.get(hostname)
             for unit in journal_units:
                 source_data = {'type': 'journal', 'name': unit, 'size_bytes': 0, 'size_formatted': 'N/A','modified_epoch': 0, 'modified_formatted': 'Journald Service'}
                 yield generate_event({'status': 'source', 'data': source_data})
@@ -657,29 +1157,11 @@ def extract_log_time_range(log_content):
     if not lines:
         return None, None
 
-    iso_re = re.compile(r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?)")
-    syslog_re = re.compile(r"^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+([ 0-3]?\d)\s+(\d{2}:\d{2}:\d{2})")
     now = datetime.datetime.now(datetime.timezone.utc)
 
     def _parse(line):
-        mt = iso_re.search(line)
-        if mt:
-            s = mt.group(1).replace(' ', 'T')
-            try:
-                if s.endswith('Z'):
-                    s = s[:-1] + '+00:00'
-                return datetime.datetime.fromisoformat(s).astimezone(datetime.timezone.utc)
-            except Exception:
-                pass
-        ms = syslog_re.match(line)
-        if ms:
-            try:
-                mon, day, hms = ms.group(1), int(ms.group(2)), ms.group(3)
-                dt = datetime.datetime.strptime(f"{now.year} {mon} {day:02d} {hms}", "%Y %b %d %H:%M:%S")
-                return dt.replace(tzinfo=datetime.timezone.utc)
-            except Exception:
-                pass
-        return None
+        dt = line_datetime(line, now, tz=datetime.timezone.utc)
+        return dt.astimezone(datetime.timezone.utc) if dt is not None else None
 
     start_dt, end_dt = None, None
     for ln in lines[:200]:
@@ -744,7 +1226,7 @@ def _send_discord_embed(webhook_url, title, description, color=3447003):
         ]
     }
     try:
-        requests.post(webhook_url, data=json.dumps(discord_payload), headers=headers, timeout=10)
+        ai_http.post(webhook_url, metric='discord.webhook', rate_key=discord_rate_key(webhook_url), data=json.dumps(discord_payload), headers=headers, timeout=10)
     except requests.exceptions.RequestException as e:
         print(f"Error sending Discord notification: {e}")
 
@@ -786,9 +1268,18 @@ def get_local_sources():
 def get_remote_sources(hostname):
     return Response(stream_with_context(get_log_sources_from_host_stream(hostname)), mimetype='text/event-stream')
 
-# Cache for host sources to avoid repeated queries
-_host_sources_cache = {}
-_cache_timeout = 60  # Cache for 60 seconds
+# Journal units per host (logaccess.units): served from cache, refreshed in the background
+journal_unit_cache = JournalUnitCache(lambda host: _log_runner(host, label='journal units'), context=app.app_context,
+                                      ttl=JOURNAL_UNITS_TTL)
+
+@app.route('/sources/journal-units/<host_id>')
+def get_journal_units(host_id):
+    """Full journal unit list for a host with freshness metadata; ?refresh=1 rescans now."""
+    try:
+        units, meta = journal_unit_cache.get(host_id, force=request.args.get('refresh') in ('1', 'true'))
+    except Exception as e:
+        return jsonify({'error': f"Could not list journal units on '{host_id}': {e}"}), 500
+    return jsonify({'host': host_id, 'units': units, **meta})
 
 def fetch_sources_from_host(host_id, host_name, failed_hosts):
     """Fetch log sources from a single host with proper error handling"""
@@ -796,65 +1287,67 @@ def fetch_sources_from_host(host_id, host_name, failed_hosts):
     print(f"Fetching logs from host '{host_id}' ({host_name})")
     
     try:
-        # Use shorter timeout for bulk operations
-        cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
-        res_ls = execute_command(host_id, cmd_ls, timeout=8)
-        filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
-
-        # Process files but limit to avoid timeout - sort by modification time and get recent ones
-        if len(filenames) > 10:
-            # Get file stats for sorting by modification time
-            file_stats = []
-            for filename in filenames[:20]:  # Check first 20 files quickly
-                try:
-                    cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
-                    res_stat = execute_command(host_id, cmd_stat, timeout=3)  # Very short timeout
-                    size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
-                    if size_bytes > 0:
-                        file_stats.append((filename, size_bytes, mod_time_epoch))
-                except Exception:
-                    continue
-            
-            # Sort by modification time (newest first) and take top 10
-            file_stats.sort(key=lambda x: x[2], reverse=True)
-            for filename, size_bytes, mod_time_epoch in file_stats[:10]:
-                host_sources.append({
-                    'name': filename,
-                    'type': 'file',
-                    'host': host_id,
-                    'host_name': host_name,
-                    'size_bytes': size_bytes,
-                    'size_formatted': format_bytes(size_bytes),
-                    'modified_epoch': mod_time_epoch,
-                    'modified_formatted': format_relative_time(mod_time_epoch)
-                })
+        listed = _helper_log_files(host_id)
+        if listed is not None:
+            host_sources.extend(_log_file_sources(host_id, host_name, listed))
         else:
-            # Process all files if there are few
-            for filename in filenames:
-                try:
-                    cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
-                    res_stat = execute_command(host_id, cmd_stat, timeout=5)
-                    size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
-                    if size_bytes > 0:
-                        host_sources.append({
-                            'name': filename,
-                            'type': 'file',
-                            'host': host_id,
-                            'host_name': host_name,
-                            'size_bytes': size_bytes,
-                            'size_formatted': format_bytes(size_bytes),
-                            'modified_epoch': mod_time_epoch,
-                            'modified_formatted': format_relative_time(mod_time_epoch)
-                        })
-                except Exception as e:
-                    print(f"Could not stat file '{filename}' on '{host_id}': {e}")
-                    continue
+            # Use shorter timeout for bulk operations
+            cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
+            res_ls = execute_command(host_id, cmd_ls, timeout=8)
+            filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
+
+            # Process files but limit to avoid timeout - sort by modification time and get recent ones
+            if len(filenames) > 10:
+                # Get file stats for sorting by modification time
+                file_stats = []
+                for filename in filenames[:20]:  # Check first 20 files quickly
+                    try:
+                        cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
+                        res_stat = execute_command(host_id, cmd_stat, timeout=3)  # Very short timeout
+                        size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
+                        if size_bytes > 0:
+                            file_stats.append((filename, size_bytes, mod_time_epoch))
+                    except Exception:
+                        continue
+            
+                # Sort by modification time (newest first) and take top 10
+                file_stats.sort(key=lambda x: x[2], reverse=True)
+                for filename, size_bytes, mod_time_epoch in file_stats[:10]:
+                    host_sources.append({
+                        'name': filename,
+                        'type': 'file',
+                        'host': host_id,
+                        'host_name': host_name,
+                        'size_bytes': size_bytes,
+                        'size_formatted': format_bytes(size_bytes),
+                        'modified_epoch': mod_time_epoch,
+                        'modified_formatted': format_relative_time(mod_time_epoch)
+                    })
+            else:
+                # Process all files if there are few
+                for filename in filenames:
+                    try:
+                        cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
+                        res_stat = execute_command(host_id, cmd_stat, timeout=5)
+                        size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
+                        if size_bytes > 0:
+                            host_sources.append({
+                                'name': filename,
+                                'type': 'file',
+                                'host': host_id,
+                                'host_name': host_name,
+                                'size_bytes': size_bytes,
+                                'size_formatted': format_bytes(size_bytes),
+                                'modified_epoch': mod_time_epoch,
+                                'modified_formatted': format_relative_time(mod_time_epoch)
+                            })
+                    except Exception as e:
+                        print(f"Could not stat file '{filename}' on '{host_id}': {e}")
+                        continue
 
         # Get journald services with timeout
         try:
-            cmd_journal = "sudo journalctl --field _SYSTEMD_UNIT | sort | uniq | head -15"  # Limit results
-            res_journal = execute_command(host_id, cmd_journal, timeout=8)
-            journal_units = [unit for unit in res_journal.stdout.strip().split('\n') if unit]
+            journal_units, _ = journal_unit_cache.get(host_id)
             for unit in journal_units:
                 host_sources.append({
                     'name': unit,
@@ -884,143 +1377,124 @@ def fetch_sources_from_host(host_id, host_name, failed_hosts):
 
     return host_sources
 
-@app.route('/sources/clear-cache', methods=['POST'])
-def clear_sources_cache():
-    """Clear the host sources cache"""
-    global _host_sources_cache
-    _host_sources_cache.clear()
-    return jsonify({'message': 'Cache cleared successfully'})
+# --- SOURCE INVENTORY CACHE ---
+# Each host's scanned sources are kept in the database (HostSourceInventory), so
+# every worker shares them. Responses are served from it straight away: within
+# SOURCES_CACHE_TTL as is, after that while a background rescan runs. Hosts never
+# scanned, or not for SOURCES_CACHE_MAX_STALE, are scanned before responding.
 
-@app.route('/sources/all', methods=['POST'])
-def get_all_host_sources():
-    """Get a simplified list of log sources from all configured hosts for selection purposes"""
-    current_time = time.time()
-    
-    # Check cache first
-    cache_key = 'all_sources'
-    if cache_key in _host_sources_cache:
-        cached_data, timestamp = _host_sources_cache[cache_key]
-        if current_time - timestamp < _cache_timeout:
-            print("Returning cached host sources")
-            return jsonify(cached_data)
-    
-    all_sources = []
-    failed_hosts = []
-    hosts = load_hosts()
-    all_hostnames = [('local', 'Localhost')] + [(host_id, host_data['friendly_name']) for host_id, host_data in hosts.items()]
-    
-    # Add DB-hosted devices from wizard
-    try:
-        db_hosts = Host.query.all()
-        for h in db_hosts:
-            db_host_id = f"db-{h.id}"
-            host_name = h.friendly_name or h.hostname or h.ip_address
-            all_hostnames.append((db_host_id, host_name))
-    except Exception as e:
-        print(f"[ERROR] Failed to add DB hosts to sources list: {e}")
+SOURCES_CACHE_TTL = max(10, int(os.getenv('AILOG_SOURCES_TTL', '300') or 300))
+SOURCES_CACHE_MAX_STALE = max(SOURCES_CACHE_TTL, int(os.getenv('AILOG_SOURCES_MAX_STALE', '86400') or 86400))
+SOURCES_REFRESH_CLAIM_SECONDS = 120   # a claimed rescan older than this is assumed dead
 
-    # Use ThreadPoolExecutor with timeout for concurrent processing
-    with ThreadPoolExecutor(max_workers=3) as executor:  # Reduced workers to avoid overwhelming
-        future_to_host = {executor.submit(fetch_sources_from_host, host_id, host_name, failed_hosts): (host_id, host_name) 
-                         for host_id, host_name in all_hostnames}
-        
-        # Wait for completion with overall timeout and proper error handling
-        try:
-            for future in as_completed(future_to_host, timeout=25):  # Reduced timeout
-                host_id, host_name = future_to_host[future]
-                try:
-                    host_sources = future.result(timeout=3)  # Shorter individual timeout
-                    all_sources.extend(host_sources)
-                except Exception as exc:
-                    print(f"Host {host_name} generated an exception: {exc}")
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': str(exc)})
-        except Exception as timeout_exc:
-            print(f"Overall timeout or error in all sources: {timeout_exc}")
-            # Handle any remaining unfinished futures
-            for future, (host_id, host_name) in future_to_host.items():
-                if not future.done():
-                    print(f"Marking {host_name} as failed due to timeout")
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': 'Connection timed out'})
-                    future.cancel()
+def _inventory_meta(row):
+    age = row.age_seconds() if row is not None else None
+    return {
+        'fetched_at': row.fetched_at.isoformat() if row is not None and row.fetched_at else None,
+        'age_seconds': round(age, 1) if age is not None else None,
+        'stale': age is None or age >= SOURCES_CACHE_TTL,
+        'refreshing': bool(row is not None and row.refresh_started_at),
+        'error': row.error if row is not None else None,
+    }
 
-    print(f"Total sources collected: {len(all_sources)} from {len(all_hostnames) - len(failed_hosts)} hosts")
-    if failed_hosts:
-        print(f"Failed hosts: {failed_hosts}")
+def _inventory_save(host_id, host_name, sources=None, error=None):
+    """Store a scan result; a failed scan keeps the previous sources and records the error."""
+    row = HostSourceInventory.query.get(host_id) or HostSourceInventory(host_key=host_id)
+    row.host_name = host_name
+    if error is None:
+        row.sources_json = json.dumps(sources or [])
+        row.fetched_at = datetime.datetime.utcnow()
+    row.error = error
+    row.refresh_started_at = None
+    db.session.add(row)
+    db.session.commit()
+    return row
 
-    response_data = {
-        'sources': all_sources,
-        'failed_hosts': failed_hosts,
-        'total_hosts': len(all_hostnames),
-        'successful_hosts': len(all_hostnames) - len(failed_hosts)
-    }
-    
-    # Cache the result
-    _host_sources_cache[cache_key] = (response_data, current_time)
-    
-    return jsonify(response_data)
+def _inventory_claim(host_id, host_name):
+    """Mark host as being rescanned; False when another worker already is."""
+    now = datetime.datetime.utcnow()
+    if HostSourceInventory.query.get(host_id) is None:
+        db.session.add(HostSourceInventory(host_key=host_id, host_name=host_name, sources_json='[]'))
+        db.session.commit()
+    cutoff = now - datetime.timedelta(seconds=SOURCES_REFRESH_CLAIM_SECONDS)
+    claimed = HostSourceInventory.query.filter(
+        HostSourceInventory.host_key == host_id,
+        db.or_(HostSourceInventory.refresh_started_at.is_(None), HostSourceInventory.refresh_started_at < cutoff),
+    ).update({'refresh_started_at': now}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
 
-@app.route('/sources/table', methods=['POST'])
-def get_log_table_view():
-    """Get logs organized in a table format: log names as rows, hosts as columns"""
-    current_time = time.time()
-    
-    # Check cache first
-    cache_key = 'table_view'
-    if cache_key in _host_sources_cache:
-        cached_data, timestamp = _host_sources_cache[cache_key]
-        if current_time - timestamp < _cache_timeout:
-            print("Returning cached table view")
-            return jsonify(cached_data)
-    
-    all_sources = []
-    failed_hosts = []
-    hosts = load_hosts()
-    all_hostnames = [('local', 'Localhost')] + [(host_id, host_data['friendly_name']) for host_id, host_data in hosts.items()]
-    
-    # Add DB-hosted devices from wizard
-    try:
-        db_hosts = Host.query.all()
-        for h in db_hosts:
-            db_host_id = f"db-{h.id}"
-            host_name = h.friendly_name or h.hostname or h.ip_address
-            all_hostnames.append((db_host_id, host_name))
-    except Exception as e:
-        print(f"[ERROR] Failed to add DB hosts to sources list: {e}")
+def _scan_host_sources(host_id, host_name):
+    """(sources, error) from a fresh scan of one host."""
+    with app.app_context():
+        failed = []
+        sources = fetch_sources_from_host(host_id, host_name, failed)
+        return sources, (failed[0]['error'] if failed else None)
 
-    # Use ThreadPoolExecutor with timeout for concurrent processing
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        future_to_host = {executor.submit(fetch_sources_from_host, host_id, host_name, failed_hosts): (host_id, host_name) 
-                         for host_id, host_name in all_hostnames}
-        
-        # Wait for completion with overall timeout and proper error handling
-        try:
-            for future in as_completed(future_to_host, timeout=30):
-                host_id, host_name = future_to_host[future]
-                try:
-                    host_sources = future.result(timeout=5)
-                    all_sources.extend(host_sources)
-                except Exception as exc:
-                    print(f"Host {host_name} generated an exception: {exc}")
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': str(exc)})
-        except Exception as timeout_exc:
-            print(f"Overall timeout or error in table view: {timeout_exc}")
-            # Handle any remaining unfinished futures
-            for future, (host_id, host_name) in future_to_host.items():
-                if not future.done():
-                    print(f"Marking {host_name} as failed due to timeout")
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': 'Connection timed out'})
-                    future.cancel()
-
-    # Create log-to-hosts mapping
+def _inventory_refresh_async(host_id, host_name):
+    if not _inventory_claim(host_id, host_name):
+        return
+
+    def _run():
+        with app.app_context():
+            try:
+                sources, error = _scan_host_sources(host_id, host_name)
+                _inventory_save(host_id, host_name, sources, error)
+            except Exception as e:
+                print(f"[WARN] Background source rescan failed for {host_id}: {e}")
+                _inventory_save(host_id, host_name, error=str(e))
+
+    threading.Thread(target=_run, name=f"sources-{host_id}", daemon=True).start()
+
+def get_host_inventory(hostnames, force=False, timeout=30):
+    """(sources, failed_hosts, freshness) for [(host_id, host_name)], scanning only what is missing or expired."""
+    ids = [h for h, _ in hostnames]
+    rows = {r.host_key: r for r in HostSourceInventory.query.filter(HostSourceInventory.host_key.in_(ids)).all()} if ids else {}
+    to_scan = []
+    for host_id, host_name in hostnames:
+        row = rows.get(host_id)
+        age = row.age_seconds() if row is not None else None
+        if force or age is None or age >= SOURCES_CACHE_MAX_STALE:
+            to_scan.append((host_id, host_name))
+        elif age >= SOURCES_CACHE_TTL:
+            _inventory_refresh_async(host_id, host_name)
+
+    if to_scan:
+        with ThreadPoolExecutor(max_workers=min(SOURCE_SCAN_WORKERS, len(to_scan))) as executor:
+            futures = {executor.submit(_scan_host_sources, h, n): (h, n) for h, n in to_scan}
+            try:
+                for future in as_completed(futures, timeout=timeout):
+                    host_id, host_name = futures[future]
+                    try:
+                        sources, error = future.result()
+                    except Exception as exc:
+                        sources, error = None, str(exc)
+                    rows[host_id] = _inventory_save(host_id, host_name, sources, error)
+            except Exception as timeout_exc:
+                print(f"Overall timeout scanning host sources: {timeout_exc}")
+                for future, (host_id, host_name) in futures.items():
+                    if not future.done():
+                        future.cancel()
+                        rows[host_id] = _inventory_save(host_id, host_name, error='Connection timed out')
+
+    all_sources, failed_hosts, freshness = [], [], {}
+    for host_id, host_name in hostnames:
+        row = rows.get(host_id)
+        freshness[host_id] = _inventory_meta(row)
+        if row is None or row.fetched_at is None:
+            failed_hosts.append({'host_id': host_id, 'host_name': host_name,
+                                 'error': (row.error if row is not None else None) or 'Not scanned yet'})
+            continue
+        for source in row.sources():
+            source['host_name'] = host_name
+            all_sources.append(source)
+    return all_sources, failed_hosts, freshness
+
+def _build_log_table(all_hostnames, all_sources, failed_hosts):
+    """Table payload: log names as rows, hosts as columns."""
     log_matrix = {}
-    host_list = []
-    
-    # Build host list
-    for host_id, host_name in all_hostnames:
-        if not any(f['host_id'] == host_id for f in failed_hosts):
-            host_list.append({'host_id': host_id, 'host_name': host_name})
-    
-    # Build log matrix
+    failed_ids = {f['host_id'] for f in failed_hosts}
+    host_list = [{'host_id': h, 'host_name': n} for h, n in all_hostnames if h not in failed_ids]
     for source in all_sources:
         log_key = f"{source['name']}|{source['type']}"
         if log_key not in log_matrix:
@@ -1031,8 +1505,6 @@ def get_log_table_view():
                 'size_info': source.get('size_formatted', 'N/A'),
                 'modified_info': source.get('modified_formatted', 'N/A')
             }
-        
-        # Add host information for this log
         log_matrix[log_key]['hosts'][source['host']] = {
             'host_id': source['host'],
             'host_name': source['host_name'],
@@ -1041,207 +1513,235 @@ def get_log_table_view():
             'modified_epoch': source.get('modified_epoch', 0),
             'modified_formatted': source.get('modified_formatted', 'N/A')
         }
-    
-    # Convert to list format for frontend
-    logs_table = list(log_matrix.values())
-    
-    # Sort logs by name
-    logs_table.sort(key=lambda x: x['name'].lower())
-    
-    response_data = {
+    logs_table = sorted(log_matrix.values(), key=lambda x: x['name'].lower())
+    return {
         'logs': logs_table,
         'hosts': host_list,
         'failed_hosts': failed_hosts,
         'total_hosts': len(all_hostnames),
         'successful_hosts': len(host_list)
     }
-    
-    # Cache the result
-    _host_sources_cache[cache_key] = (response_data, current_time)
-    
+
+def _scan_error_message(error):
+    lowered = error.lower()
+    if 'timeout' in lowered or 'timed out' in lowered:
+        return 'Connection timed out'
+    if 'connection refused' in lowered:
+        return 'Connection refused'
+    if 'no route to host' in lowered:
+        return 'No route to host'
+    return error
+
+def _source_scan_stream(all_hostnames, concurrency=None):
+    """SSE events for a concurrent source scan of [(host_id, host_name)], ending with the table."""
+    def generate_event(data):
+        return f"data: {json.dumps(data)}\n\n"
+
+    concurrency = concurrency or SOURCE_SCAN_WORKERS
+    total_hosts = len(all_hostnames)
+    yield generate_event({'status': 'progress', 'message': f'Found {total_hosts} hosts to scan', 'progress': 10})
+    print(f"Starting streaming table scan for {total_hosts} hosts ({concurrency} at a time): {all_hostnames}")
+
+    def scan(host_id, host_name, emit):
+        emit({'status': 'progress', 'message': f'Connecting to {host_name}...'})
+        return fetch_sources_from_host_detailed(host_id, host_name, emit, 10)
+
+    all_sources = []
+    failed_hosts = []
+    for event in stream_scan(all_hostnames, scan, concurrency=concurrency, host_deadline=SOURCE_SCAN_HOST_TIMEOUT,
+                             context=app.app_context):
+        if event is None:
+            yield ': keepalive\n\n'
+        elif event['status'] == 'progress':
+            yield generate_event(event)
+        elif event['status'] == 'host':
+            host_id, host_name = event['host_id'], event['host_name']
+            if event['ok']:
+                host_sources = event['result']
+                all_sources.extend(host_sources)
+                _inventory_save(host_id, host_name, host_sources)
+                message = f'✅ {host_name}: Found {len(host_sources)} log sources'
+                partial = {'sources': host_sources}
+            else:
+                error_msg = _scan_error_message(event['error'])
+                print(f"Error fetching from {host_name}: {event['error']}")
+                _inventory_save(host_id, host_name, error=error_msg)
+                message = f'❌ {host_name}: {error_msg}'
+                partial = {'error': error_msg}
+            yield generate_event({'status': 'progress', 'message': message, 'progress': event['progress']})
+            # Partial result as soon as the host is done, so the table can fill in before the slowest host
+            yield generate_event({'status': 'host', 'host_id': host_id, 'host_name': host_name, 'ms': event['ms'],
+                                  'done': event['done'], 'total': event['total'], **partial})
+        else:
+            failed_hosts = [{**f, 'error': _scan_error_message(f['error'])} for f in event['failed']]
+
+    print(f"Completed host scanning. Collected {len(all_sources)} sources total, {len(failed_hosts)} hosts failed")
+    yield generate_event({'status': 'progress', 'message': 'Building log matrix...', 'progress': 90})
+    response_data = _build_log_table(all_hostnames, all_sources, failed_hosts)
+    print(f"Final response data: {len(response_data['logs'])} logs, {response_data['successful_hosts']}/{response_data['total_hosts']} hosts successful")
+    yield generate_event({'status': 'complete', 'data': response_data, 'progress': 100})
+
+def _scan_concurrency_arg():
+    try:
+        return max(1, min(32, int(request.args.get('concurrency') or SOURCE_SCAN_WORKERS)))
+    except ValueError:
+        return SOURCE_SCAN_WORKERS
+
+@app.route('/sources/clear-cache', methods=['POST'])
+def clear_sources_cache():
+    """Clear cached host sources: all hosts, or only {"host_id": ...} / {"hosts": [...]}."""
+    data = request.get_json(silent=True) or {}
+    hosts = data.get('hosts') or ([data['host_id']] if data.get('host_id') else None)
+    query = HostSourceInventory.query
+    if hosts:
+        query = query.filter(HostSourceInventory.host_key.in_(hosts))
+        for host_id in hosts:
+            journal_unit_cache.invalidate(host_id)
+    else:
+        journal_unit_cache.invalidate()
+    removed = query.delete(synchronize_session=False)
+    db.session.commit()
+    return jsonify({'message': 'Cache cleared successfully', 'hosts': hosts or 'all', 'removed': removed})
+
+@app.route('/sources/cache-status', methods=['GET'])
+def sources_cache_status():
+    rows = HostSourceInventory.query.all()
+    return jsonify({'ttl_seconds': SOURCES_CACHE_TTL, 'max_stale_seconds': SOURCES_CACHE_MAX_STALE,
+                    'hosts': [r.to_dict() for r in rows]})
+
+@app.route('/sources/all', methods=['POST'])
+def get_all_host_sources():
+    """Get a simplified list of log sources from all configured hosts for selection purposes"""
+    data = request.get_json(silent=True) or {}
+    all_hostnames = _get_all_host_choices()
+    all_sources, failed_hosts, freshness = get_host_inventory(all_hostnames, force=bool(data.get('refresh')), timeout=25)
+
+    print(f"Total sources collected: {len(all_sources)} from {len(all_hostnames) - len(failed_hosts)} hosts")
+    if failed_hosts:
+        print(f"Failed hosts: {failed_hosts}")
+
+    return jsonify({
+        'sources': all_sources,
+        'failed_hosts': failed_hosts,
+        'total_hosts': len(all_hostnames),
+        'successful_hosts': len(all_hostnames) - len(failed_hosts),
+        'freshness': freshness,
+    })
+
+@app.route('/sources/table', methods=['GET', 'POST'])
+def get_log_table_view():
+    """Get logs organized in a table format: log names as rows, hosts as columns"""
+    data = request.get_json(silent=True) or {}
+    refresh = bool(data.get('refresh')) or request.args.get('refresh') in ('1', 'true')
+    all_hostnames = _get_all_host_choices()
+    all_sources, failed_hosts, freshness = get_host_inventory(all_hostnames, force=refresh, timeout=30)
+    response_data = _build_log_table(all_hostnames, all_sources, failed_hosts)
+    response_data['freshness'] = freshness
     return jsonify(response_data)
 
 @app.route('/sources/table/stream')
 def get_log_table_view_stream():
     """Get logs organized in a table format with streaming progress updates"""
+    concurrency = _scan_concurrency_arg()
+
     def generate_table_events():
         def generate_event(data):
             return f"data: {json.dumps(data)}\n\n"
         
         try:
             yield generate_event({'status': 'progress', 'message': 'Initializing host scan...', 'progress': 5})
-            
-            all_sources = []
-            failed_hosts = []
             hosts = load_hosts()
             all_hostnames = [('local', 'Localhost')] + [(host_id, host_data['friendly_name']) for host_id, host_data in hosts.items()]
-            total_hosts = len(all_hostnames)
-            
-            yield generate_event({'status': 'progress', 'message': f'Found {total_hosts} hosts to scan', 'progress': 10})
-            
-            print(f"Starting streaming table scan for {total_hosts} hosts: {all_hostnames}")
-            
-            # Process hosts sequentially for better progress tracking
-            for i, (host_id, host_name) in enumerate(all_hostnames):
-                host_progress = 10 + int((i / total_hosts) * 80)
-                yield generate_event({'status': 'progress', 'message': f'Connecting to {host_name}...', 'progress': host_progress})
-                print(f"Processing host {i+1}/{total_hosts}: {host_name} ({host_id})")
-                
-                try:
-                    # Fetch sources from this host with detailed logging
-                    host_sources = fetch_sources_from_host_detailed(host_id, host_name, generate_event, host_progress)
-                    all_sources.extend(host_sources)
-                    print(f"Successfully fetched {len(host_sources)} sources from {host_name}")
-                    yield generate_event({'status': 'progress', 'message': f'✅ {host_name}: Found {len(host_sources)} log sources', 'progress': host_progress + int(80/total_hosts)})
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"Error fetching from {host_name}: {error_msg}")
-                    if 'timeout' in error_msg.lower():
-                        error_msg = "Connection timed out"
-                    elif 'connection refused' in error_msg.lower():
-                        error_msg = "Connection refused"
-                    elif 'no route to host' in error_msg.lower():
-                        error_msg = "No route to host"
-                        
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': error_msg})
-                    yield generate_event({'status': 'progress', 'message': f'❌ {host_name}: {error_msg}', 'progress': host_progress + int(80/total_hosts)})
-            
-            print(f"Completed host scanning. Collected {len(all_sources)} sources total, {len(failed_hosts)} hosts failed")
-            yield generate_event({'status': 'progress', 'message': 'Building log matrix...', 'progress': 90})
-            
-            # Create log-to-hosts mapping
-            log_matrix = {}
-            host_list = []
-            
-            # Build host list
-            for host_id, host_name in all_hostnames:
-                if not any(f['host_id'] == host_id for f in failed_hosts):
-                    host_list.append({'host_id': host_id, 'host_name': host_name})
-            
-            # Build log matrix
-            for source in all_sources:
-                log_key = f"{source['name']}|{source['type']}"
-                if log_key not in log_matrix:
-                    log_matrix[log_key] = {
-                        'name': source['name'],
-                        'type': source['type'],
-                        'hosts': {},
-                        'size_info': source.get('size_formatted', 'N/A'),
-                        'modified_info': source.get('modified_formatted', 'N/A')
-                    }
-                
-                # Add host information for this log
-                log_matrix[log_key]['hosts'][source['host']] = {
-                    'host_id': source['host'],
-                    'host_name': source['host_name'],
-                    'size_bytes': source.get('size_bytes', 0),
-                    'size_formatted': source.get('size_formatted', 'N/A'),
-                    'modified_epoch': source.get('modified_epoch', 0),
-                    'modified_formatted': source.get('modified_formatted', 'N/A')
-                }
-            
-            # Convert to list format for frontend
-            logs_table = list(log_matrix.values())
-            
-            # Sort logs by name
-            logs_table.sort(key=lambda x: x['name'].lower())
-            
-            response_data = {
-                'logs': logs_table,
-                'hosts': host_list,
-                'failed_hosts': failed_hosts,
-                'total_hosts': len(all_hostnames),
-                'successful_hosts': len(host_list)
-            }
-            
-            print(f"Final response data: {len(response_data['logs'])} logs, {response_data['successful_hosts']}/{response_data['total_hosts']} hosts successful")
-            yield generate_event({'status': 'complete', 'data': response_data, 'progress': 100})
-            
+            yield from _source_scan_stream(all_hostnames, concurrency)
         except Exception as e:
             print(f"Critical error in streaming table view: {str(e)}")
             import traceback
             traceback.print_exc()
             yield generate_event({'status': 'error', 'message': str(e)})
     
-    return Response(stream_with_context(generate_table_events()), mimetype='text/event-stream')
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate_table_events()), mimetype='text/event-stream', headers=headers)
 
 def fetch_sources_from_host_detailed(host_id, host_name, progress_callback, base_progress):
     """Fetch log sources from a single host with detailed progress reporting"""
     host_sources = []
     
     try:
-        # Use shorter timeout for bulk operations
-        progress_callback({'status': 'progress', 'message': f'📂 {host_name}: Listing log directory...', 'progress': base_progress})
-        cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
-        res_ls = execute_command(host_id, cmd_ls, timeout=8)
-        filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
+        listed = _helper_log_files(host_id)
+        if listed is not None:
+            progress_callback({'status': 'progress', 'message': f'📂 {host_name}: Listed {len(listed)} log files via helper', 'progress': base_progress})
+            host_sources.extend(_log_file_sources(host_id, host_name, listed))
+        else:
+            # Use shorter timeout for bulk operations
+            progress_callback({'status': 'progress', 'message': f'📂 {host_name}: Listing log directory...', 'progress': base_progress})
+            cmd_ls = f"sudo ls -p {shlex.quote(LOG_DIRECTORY)}"
+            res_ls = execute_command(host_id, cmd_ls, timeout=8)
+            filenames = [entry for entry in res_ls.stdout.strip().split('\n') if not entry.endswith('/') and entry]
         
-        progress_callback({'status': 'progress', 'message': f'📋 {host_name}: Found {len(filenames)} potential log files', 'progress': base_progress})
-
-        # Process files but limit to avoid timeout - sort by modification time and get recent ones
-        if len(filenames) > 10:
-            progress_callback({'status': 'progress', 'message': f'🔍 {host_name}: Checking file stats for recent files...', 'progress': base_progress})
-            # Get file stats for sorting by modification time
-            file_stats = []
-            for i, filename in enumerate(filenames[:20]):  # Check first 20 files quickly
-                if i % 5 == 0:  # Update progress every 5 files
-                    progress_callback({'status': 'progress', 'message': f'📊 {host_name}: Checking {filename}...', 'progress': base_progress})
-                try:
-                    cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
-                    res_stat = execute_command(host_id, cmd_stat, timeout=3)  # Very short timeout
-                    size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
-                    if size_bytes > 0:
-                        file_stats.append((filename, size_bytes, mod_time_epoch))
-                except Exception:
-                    continue
+            progress_callback({'status': 'progress', 'message': f'📋 {host_name}: Found {len(filenames)} potential log files', 'progress': base_progress})
+
+            # Process files but limit to avoid timeout - sort by modification time and get recent ones
+            if len(filenames) > 10:
+                progress_callback({'status': 'progress', 'message': f'🔍 {host_name}: Checking file stats for recent files...', 'progress': base_progress})
+                # Get file stats for sorting by modification time
+                file_stats = []
+                for i, filename in enumerate(filenames[:20]):  # Check first 20 files quickly
+                    if i % 5 == 0:  # Update progress every 5 files
+                        progress_callback({'status': 'progress', 'message': f'📊 {host_name}: Checking {filename}...', 'progress': base_progress})
+                    try:
+                        cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
+                        res_stat = execute_command(host_id, cmd_stat, timeout=3)  # Very short timeout
+                        size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
+                        if size_bytes > 0:
+                            file_stats.append((filename, size_bytes, mod_time_epoch))
+                    except Exception:
+                        continue
             
-            # Sort by modification time (newest first) and take top 10
-            file_stats.sort(key=lambda x: x[2], reverse=True)
-            progress_callback({'status': 'progress', 'message': f'📝 {host_name}: Processing {len(file_stats[:10])} most recent log files...', 'progress': base_progress})
+                # Sort by modification time (newest first) and take top 10
+                file_stats.sort(key=lambda x: x[2], reverse=True)
+                progress_callback({'status': 'progress', 'message': f'📝 {host_name}: Processing {len(file_stats[:10])} most recent log files...', 'progress': base_progress})
             
-            for filename, size_bytes, mod_time_epoch in file_stats[:10]:
-                host_sources.append({
-                    'name': filename,
-                    'type': 'file',
-                    'host': host_id,
-                    'host_name': host_name,
-                    'size_bytes': size_bytes,
-                    'size_formatted': format_bytes(size_bytes),
-                    'modified_epoch': mod_time_epoch,
-                    'modified_formatted': format_relative_time(mod_time_epoch)
-                })
-        else:
-            # Process all files if there are few
-            progress_callback({'status': 'progress', 'message': f'📝 {host_name}: Processing all {len(filenames)} log files...', 'progress': base_progress})
-            for i, filename in enumerate(filenames):
-                if i % 3 == 0:  # Update progress every 3 files
-                    progress_callback({'status': 'progress', 'message': f'📄 {host_name}: Processing {filename}...', 'progress': base_progress})
-                try:
-                    cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
-                    res_stat = execute_command(host_id, cmd_stat, timeout=5)
-                    size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
-                    if size_bytes > 0:
-                        host_sources.append({
-                            'name': filename,
-                            'type': 'file',
-                            'host': host_id,
-                            'host_name': host_name,
-                            'size_bytes': size_bytes,
-                            'size_formatted': format_bytes(size_bytes),
-                            'modified_epoch': mod_time_epoch,
-                            'modified_formatted': format_relative_time(mod_time_epoch)
-                        })
-                except Exception as e:
-                    continue
+                for filename, size_bytes, mod_time_epoch in file_stats[:10]:
+                    host_sources.append({
+                        'name': filename,
+                        'type': 'file',
+                        'host': host_id,
+                        'host_name': host_name,
+                        'size_bytes': size_bytes,
+                        'size_formatted': format_bytes(size_bytes),
+                        'modified_epoch': mod_time_epoch,
+                        'modified_formatted': format_relative_time(mod_time_epoch)
+                    })
+            else:
+                # Process all files if there are few
+                progress_callback({'status': 'progress', 'message': f'📝 {host_name}: Processing all {len(filenames)} log files...', 'progress': base_progress})
+                for i, filename in enumerate(filenames):
+                    if i % 3 == 0:  # Update progress every 3 files
+                        progress_callback({'status': 'progress', 'message': f'📄 {host_name}: Processing {filename}...', 'progress': base_progress})
+                    try:
+                        cmd_stat = f"sudo stat -c '%s %Y' {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
+                        res_stat = execute_command(host_id, cmd_stat, timeout=5)
+                        size_bytes, mod_time_epoch = map(int, res_stat.stdout.strip().split())
+                        if size_bytes > 0:
+                            host_sources.append({
+                                'name': filename,
+                                'type': 'file',
+                                'host': host_id,
+                                'host_name': host_name,
+                                'size_bytes': size_bytes,
+                                'size_formatted': format_bytes(size_bytes),
+                                'modified_epoch': mod_time_epoch,
+                                'modified_formatted': format_relative_time(mod_time_epoch)
+                            })
+                    except Exception as e:
+                        continue
 
         # Get journald services with timeout
         progress_callback({'status': 'progress', 'message': f'🔧 {host_name}: Fetching systemd journal services...', 'progress': base_progress})
         try:
-            cmd_journal = "sudo journalctl --field _SYSTEMD_UNIT | sort | uniq | head -15"  # Limit results
-            res_journal = execute_command(host_id, cmd_journal, timeout=8)
-            journal_units = [unit for unit in res_journal.stdout.strip().split('\n') if unit]
-            
-            progress_callback({'status': 'progress', 'message': f'📋 {host_name}: Found {len(journal_units)} journal services', 'progress': base_progress})
+            journal_units, units_meta = journal_unit_cache.get(host_id)
+            cached = f" (cached {int(units_meta['age_seconds'])}s ago)" if units_meta['age_seconds'] else ''
+            progress_callback({'status': 'progress', 'message': f'📋 {host_name}: Found {len(journal_units)} journal services{cached}', 'progress': base_progress})
             
             for unit in journal_units:
                 host_sources.append({
@@ -1258,45 +1758,440 @@ def fetch_sources_from_host_detailed(host_id, host_name, progress_callback, base
             progress_callback({'status': 'progress', 'message': f'⚠️ {host_name}: Could not fetch journal services: {str(e)}', 'progress': base_progress})
 
     except Exception as e:
-        progress_callback({'status': 'progress', 'message': f'❌ {host_name}: Connection failed: {str(e)}', 'progress': base_progress})
-        raise e
+        progress_callback({'status': 'progress', 'message': f'❌ {host_name}: Connection failed: {str(e)}', 'progress': base_progress})
+        raise e
+
+    return host_sources
+
+def _log_runner(hostname, label='log page', compress=True):
+    """Command runner for the logaccess readers; bytes are decoded losslessly so offsets stay exact."""
+    return lambda command_str, timeout=30: execute_command(hostname, command_str, timeout=timeout, errors='surrogateescape',
+                                                           compress=compress, label=label)
+
+# Access-point indexes for .gz archives, built in the background on first read
+gz_indexes = GzIndexCache()
+
+def _gz_index(hostname, path):
+    """The archive's index if built; otherwise start building it and return None."""
+    idx = gz_indexes.lookup(hostname, path)
+    if idx is None:
+        def _build():
+            with app.app_context():
+                # Already compressed, so never recompress in transit
+                return build_gz_index(_log_runner(hostname, label='gz index', compress=False), hostname, path)
+        gz_indexes.ensure(hostname, path, _build)
+    return idx
+
+def _read_log_page(hostname, filename, cursor=None, direction='before', lines=None, offset=None):
+    """A page of a log file; archives are read from their access-point index once it exists."""
+    path = os.path.join(LOG_DIRECTORY, filename)
+    if filename.endswith('.gz') and offset is None:
+        idx = _gz_index(hostname, path)
+        if idx is not None:
+            kind, value = parse_page_cursor(cursor)
+            if kind not in (None, 'l'):
+                raise ValueError('Archives are paged by line cursor')
+            try:
+                return idx.page(_log_runner(hostname, compress=False), int(value) if value else None,
+                                direction if value else 'before', clamp_page_lines(lines))
+            except StaleArchive:
+                gz_indexes.drop(hostname, path)
+    return read_file_page(_log_runner(hostname), path, cursor=cursor, direction=direction, lines=lines, offset=offset)
+
+def _page_direction():
+    return 'after' if request.args.get('direction') == 'after' else 'before'
+
+def _page_response(page, mirrored=None):
+    """Page payload; keeps the original content/will_be_truncated keys for existing callers."""
+    data = page.to_dict()
+    data['will_be_truncated'] = len(data['content']) > MAX_CHAR_COUNT
+    data['source'] = 'mirror' if mirrored is not None else 'remote'
+    if mirrored is not None:
+        data['mirror_age_seconds'] = round(mirrored.age() or 0, 1)
+    return data
+
+# Paged reads: ?cursor=<prev/next cursor>&direction=before|after&lines=N (&offset=<byte> for files).
+# Without a cursor the last N lines are returned, as before. Journal units also take the
+# server-side filters of /journal/records (since, until, priority, match, grep).
+# Sparse (byte offset, timestamp) samples per file for since/until reads
+log_time_indexes = TimeIndexCache()
+
+def _log_time_window(hostname, filename, since, until, lines):
+    """Page of the lines stamped within [since, until], from the mirror when fresh."""
+    n = clamp_page_lines(lines)
+    if filename.endswith('.gz'):
+        path = os.path.join(LOG_DIRECTORY, filename)
+        idx = _gz_index(hostname, path)
+        if idx is None:
+            raise ValueError('The archive is being indexed for time-window reads; try again shortly')
+        try:
+            page = idx.window_page(_log_runner(hostname, label='log window', compress=False), since, until, n)
+        except StaleArchive:
+            gz_indexes.drop(hostname, path)
+            raise ValueError('The archive changed since it was indexed; try again shortly')
+        data = _page_response(page)
+        data['window'] = {'since': since, 'until': until}
+        return data
+    mirrored = mirror_fresh(hostname, 'file', filename)
+    if mirrored is not None:
+        page = mirrored.time_window(since, until, n)
+    else:
+        index = log_time_indexes.get(hostname, os.path.join(LOG_DIRECTORY, filename))
+        page = index.window_page(_log_runner(hostname, label='log window'), since, until, lines=n)
+    data = _page_response(page, mirrored)
+    data['window'] = {'since': since, 'until': until}
+    return data
+
+@app.route('/log/<path:filename>')
+def get_log_content(filename):
+    hostname = request.args.get('host', 'local')
+    
+    # Debug: show which SSH key is being used for DB hosts
+    if hostname != 'local' and hostname.startswith('db-'):
+        try:
+            host_id = int(hostname.split('-', 1)[1])
+            host_obj = Host.query.get(host_id)
+            if host_obj:
+                ssh_key_id = host_obj.ssh_key_id
+                identity_path = _materialize_ssh_key_path(ssh_key_id)
+                print(f"[DEBUG /log] Using SSH key_id={ssh_key_id} for DB host {hostname}")
+        except Exception as e:
+            print(f"[DEBUG /log] Error resolving DB host SSH key: {e}")
+    else:
+        print(f"[DEBUG /log] Using local/config host: {hostname}")
+    
+    try:
+        offset = request.args.get('offset', type=int)
+        cursor = request.args.get('cursor') or None
+        since, until = parse_time(request.args.get('since')), parse_time(request.args.get('until'))
+        if since is not None or until is not None:
+            return jsonify(_log_time_window(hostname, filename, since, until, request.args.get('lines')))
+        mirrored = mirror_fresh(hostname, 'file', filename) if not cursor and offset is None else None
+        if mirrored is not None:
+            return jsonify(_page_response(mirrored.tail_page(clamp_page_lines(request.args.get('lines'))), mirrored))
+        page = _read_log_page(hostname, filename, cursor=cursor, direction=_page_direction(),
+                              lines=request.args.get('lines'), offset=offset)
+        return jsonify(_page_response(page))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e: 
+        return jsonify({'error': f"Could not read log file '{filename}' on '{hostname}': {e}"}), 500
+
+@app.route('/journal/<path:unit>')
+def get_journal_content(unit):
+    hostname = request.args.get('host', 'local')
+    try:
+        query = JournalQuery.from_args(request.args)
+        cursor = request.args.get('cursor') or None
+        mirrored = mirror_fresh(hostname, 'journal', unit) if not cursor and not query.is_filtered() else None
+        if mirrored is not None:
+            return jsonify(_page_response(mirrored.tail_page(clamp_page_lines(request.args.get('lines'))), mirrored))
+        page = read_journal_page(_log_runner(hostname), unit, cursor=cursor,
+                                 direction=_page_direction(), lines=request.args.get('lines'), query=query)
+        return jsonify(_page_response(page))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e: 
+        return jsonify({'error': f"Could not read journal for unit '{unit}' on '{hostname}': {e}"}), 500
+
+live_tail_hub = TailHub(flush_interval=LIVE_TAIL_FLUSH_MS / 1000.0, max_frames=LIVE_TAIL_MAX_FRAMES)
+
+@app.route('/live/<kind>/<path:name>')
+def live_tail_stream(kind, name):
+    """SSE stream of new lines for a file or journal unit.
+
+    Viewers of the same (host, source) share one remote tail -F / journalctl -f.
+    """
+    hostname = request.args.get('host', 'local')
+    if kind not in ('file', 'journal'):
+        return jsonify({'error': f"Unknown source type '{kind}'"}), 400
+    if kind == 'file' and name.endswith('.gz'):
+        return jsonify({'error': 'Archived logs cannot be followed'}), 400
+    target = os.path.join(LOG_DIRECTORY, name) if kind == 'file' else name
+    try:
+        args, shell = _command_args(hostname, follow_command(kind, target))
+        sub = live_tail_hub.subscribe((hostname, kind, target), lambda: spawn_follower(args, shell))
+    except Exception as e:
+        return jsonify({'error': f"Could not follow '{name}' on '{hostname}': {e}"}), 500
+
+    def generate():
+        try:
+            yield f"data: {json.dumps({'status': 'subscribed', 'host': hostname, 'kind': kind, 'name': name})}\n\n"
+            while True:
+                frame = sub.get(timeout=15)
+                if frame is None:
+                    yield ': keepalive\n\n'
+                    continue
+                if frame.get('closed'):
+                    yield f"data: {json.dumps({'status': 'closed', 'error': frame.get('error')})}\n\n"
+                    break
+                yield f"data: {json.dumps({'status': 'lines', **frame})}\n\n"
+        finally:
+            sub.close()
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/journal/records')
+def get_journal_records():
+    """Structured journal query with filters applied on the remote host.
+
+    ?unit=&since=-1h&until=&priority=err&match=FIELD=value (repeatable)&grep=&lines=500
+    Returns compact records (see logaccess.journal.JournalRecord.to_dict), oldest first.
+    """
+    hostname = request.args.get('host', 'local')
+    try:
+        query = JournalQuery.from_args(request.args, unit=request.args.get('unit') or None)
+        lines = max(1, min(5000, request.args.get('lines', 500, type=int) or 500))
+        records = query_records(_log_runner(hostname, label='journal query'), query, lines=lines)
+        return jsonify({'records': [r.to_dict() for r in records], 'count': len(records),
+                        'host': hostname, 'unit': query.unit})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f"Could not query journal on '{hostname}': {e}"}), 500
+
+@app.route('/live/status')
+def live_tail_status():
+    return jsonify({'streams': live_tail_hub.snapshot()})
+
+# --- LOCAL LOG MIRROR ---
+# Optional: selected files/journal units are synced into local segments
+# (logaccess.mirror) and the viewer, search and analysis read them while fresh.
+
+MIRROR_DIR = os.getenv('AILOG_MIRROR_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mirror')
+log_mirror = LogMirror(MIRROR_DIR)
+
+MIRROR_DEFAULTS = {
+    'enabled': False,
+    'interval_seconds': 60,
+    'max_age_seconds': 180,     # older mirrors are ignored and reads go to the host
+    'segment_mb': 8,
+    'max_mb_per_source': 256,
+    'sources': [],              # [{host, type: file|journal, name}]
+}
+
+def get_mirror_config():
+    raw = _setting_get('mirror.config', {}) or {}
+    cfg = dict(MIRROR_DEFAULTS)
+    if isinstance(raw, dict):
+        cfg.update({k: raw[k] for k in MIRROR_DEFAULTS if k in raw})
+    for k in ('interval_seconds', 'max_age_seconds', 'segment_mb', 'max_mb_per_source'):
+        try:
+            cfg[k] = max(1, int(cfg[k]))
+        except (TypeError, ValueError):
+            cfg[k] = MIRROR_DEFAULTS[k]
+    cfg['enabled'] = bool(cfg['enabled'])
+    sources = []
+    for src in cfg.get('sources') or []:
+        if not isinstance(src, dict):
+            continue
+        host, kind, name = str(src.get('host') or 'local'), src.get('type'), str(src.get('name') or '')
+        # Archives never change, so there is nothing to mirror incrementally
+        if kind in ('file', 'journal') and name and not (kind == 'file' and name.endswith('.gz')):
+            sources.append({'host': host, 'type': kind, 'name': name})
+    cfg['sources'] = sources
+    return cfg
+
+def _mirror_source(host, kind, name, cfg):
+    return log_mirror.source(host, kind, name, segment_bytes=cfg['segment_mb'] * 1024 * 1024,
+                             max_bytes=cfg['max_mb_per_source'] * 1024 * 1024)
+
+def mirror_fresh(host, kind, name):
+    """The mirrored source when mirroring is on, the source is selected and recently synced; else None."""
+    cfg = get_mirror_config()
+    if not cfg['enabled']:
+        return None
+    if not any(s['host'] == host and s['type'] == kind and s['name'] == name for s in cfg['sources']):
+        return None
+    src = log_mirror.existing(host, kind, name)
+    return src if src is not None and src.is_fresh(cfg['max_age_seconds']) else None
+
+def mirror_sync_all(force=False):
+    """Sync every selected source; hosts run in parallel, sources of one host in turn."""
+    cfg = get_mirror_config()
+    if not (cfg['enabled'] or force) or not cfg['sources']:
+        return []
+    by_host = {}
+    for src in cfg['sources']:
+        by_host.setdefault(src['host'], []).append(src)
+
+    def _sync_host(host, sources):
+        out = []
+        with app.app_context():
+            runner = _log_runner(host, label='mirror')
+            for src in sources:
+                t0 = time.perf_counter()
+                mirrored = _mirror_source(host, src['type'], src['name'], cfg)
+                try:
+                    path = os.path.join(LOG_DIRECTORY, src['name']) if src['type'] == 'file' else None
+                    added = mirrored.sync(runner, path=path)
+                    _index_feed(log_index.ingest_mirror, mirrored)
+                    out.append({**src, 'ok': True, 'bytes': added, 'ms': int((time.perf_counter() - t0) * 1000)})
+                except Exception as e:
+                    print(f"[WARN] Mirror sync failed for {src['type']}:{src['name']} on {host}: {e}")
+                    out.append({**src, 'ok': False, 'error': str(e)[:200]})
+        return out
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(8, len(by_host))) as ex:
+        for f in as_completed([ex.submit(_sync_host, h, srcs) for h, srcs in by_host.items()]):
+            results.extend(f.result())
+    return results
+
+def _mirror_sync_job():
+    try:
+        mirror_sync_all()
+    except Exception as e:
+        print(f"[WARN] Log mirror sync job failed: {e}")
+
+def _schedule_mirror_job(cfg=None):
+    """Add, reschedule or remove the periodic mirror sync job to match the config."""
+    cfg = cfg or get_mirror_config()
+    if cfg['enabled'] and cfg['sources']:
+        scheduler.add_job(_mirror_sync_job, trigger='interval', seconds=cfg['interval_seconds'], id='log_mirror_sync',
+                          replace_existing=True, max_instances=1, coalesce=True)
+    elif scheduler.get_job('log_mirror_sync'):
+        scheduler.remove_job('log_mirror_sync')
+
+@app.route('/mirror/config', methods=['GET', 'POST'])
+def mirror_config():
+    if request.method == 'GET':
+        return jsonify(get_mirror_config())
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        current = _setting_get('mirror.config', {}) or {}
+        if not isinstance(current, dict):
+            current = {}
+        current.update({k: data[k] for k in MIRROR_DEFAULTS if k in data})
+        _setting_set('mirror.config', current)
+        cfg = get_mirror_config()
+        _schedule_mirror_job(cfg)
+        return jsonify(cfg)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-    return host_sources
+@app.route('/mirror/status', methods=['GET'])
+def mirror_status():
+    cfg = get_mirror_config()
+    out = []
+    for src in cfg['sources']:
+        st = _mirror_source(src['host'], src['type'], src['name'], cfg).status()
+        st['fresh'] = mirror_fresh(src['host'], src['type'], src['name']) is not None
+        out.append(st)
+    return jsonify({'enabled': cfg['enabled'], 'directory': MIRROR_DIR, 'sources': out})
+
+@app.route('/mirror/sync', methods=['POST'])
+def mirror_sync_now():
+    """Sync all selected sources now (also when the periodic job is disabled)."""
+    try:
+        return jsonify({'results': mirror_sync_all(force=True)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/log/<path:filename>')
-def get_log_content(filename):
+@app.route('/mirror/clear', methods=['POST'])
+def mirror_clear():
+    """Delete the mirrored data of one source (host, type, name)."""
+    data = request.get_json(force=True, silent=True) or {}
+    if data.get('type') not in ('file', 'journal') or not data.get('name'):
+        return jsonify({'error': 'type (file|journal) and name are required'}), 400
+    host, kind, name = str(data.get('host') or 'local'), data['type'], str(data['name'])
+    log_mirror.source(host, kind, name).clear()
+    # Logical offsets restart at 0, so the index must read the refilled mirror from the start
+    _index_feed(log_index.reset_feed, host, kind, name)
+    return jsonify({'status': 'cleared'})
+
+@app.route('/log-index/status')
+def log_index_status():
+    """Time-window samples and .gz access-point indexes currently held."""
+    return jsonify({'time_indexes': log_time_indexes.snapshot(), 'archive_indexes': gz_indexes.snapshot()})
+
+# --- LOG VOLUME HISTOGRAMS ---
+# Per-minute line counts by severity (logaccess.histogram), counted on the host or
+# over a fresh mirror. Finished minutes are cached per source, so a sliding
+# window only counts the minutes added since the last request.
+log_histograms = HistogramCache()
+
+def _histogram_counter(hostname, kind, source):
+    """count(lo, hi) for one source: over the mirror when it is fresh and reaches back to lo, else on the host."""
+    def count(lo, hi):
+        if source:
+            mirrored = mirror_fresh(hostname, kind, source)
+            first = mirrored.first_time() if mirrored is not None else None
+            if first is not None and first <= lo:
+                return count_mirror(mirrored, lo, hi)
+        run = _log_runner(hostname, label='histogram')
+        if kind == 'journal':
+            return count_journal(run, source or None, lo, hi)
+        path = os.path.join(LOG_DIRECTORY, source)
+        byte_range = None
+        if not source.endswith('.gz'):
+            try:
+                byte_range = log_time_indexes.get(hostname, path).refresh(run).byte_range(lo, hi)
+            except Exception as e:
+                print(f"[WARN] No time index for {path} on {hostname}, counting the whole file: {e}")
+        return count_file(run, path, lo, hi, byte_range)
+    return count
+
+def log_histogram(hostname, kind, source, since, until):
+    """Per-minute severity counts for a source over [since, until); a journal without source is the whole journal."""
+    hist, meta = log_histograms.get((hostname, kind, source or ''), since, until,
+                                    _histogram_counter(hostname, kind, source))
+    return {'host': hostname, 'kind': kind, 'source': source or None, **hist.to_dict(), **meta}
+
+def _histogram_args():
+    kind = request.args.get('kind', 'journal')
+    source = (request.args.get('source') or '').strip()
+    if kind not in ('file', 'journal'):
+        raise ValueError(f"Unknown source type '{kind}'")
+    if kind == 'file' and not source:
+        raise ValueError('source is required for files')
+    now = time.time()
+    since = parse_time(request.args.get('since') or '-1h', now)
+    until = parse_time(request.args.get('until'), now) or now
+    return kind, source, since, until
+
+@app.route('/histogram')
+def get_log_histogram():
+    """Per-minute line counts by severity: ?host=&kind=file|journal&source=&since=-1h&until="""
     hostname = request.args.get('host', 'local')
-    
-    # Debug: show which SSH key is being used for DB hosts
-    if hostname != 'local' and hostname.startswith('db-'):
-        try:
-            host_id = int(hostname.split('-', 1)[1])
-            host_obj = Host.query.get(host_id)
-            if host_obj:
-                ssh_key_id = host_obj.ssh_key_id
-                identity_path = _materialize_ssh_key_path(ssh_key_id)
-                print(f"[DEBUG /log] Using SSH key_id={ssh_key_id} for DB host {hostname}")
-        except Exception as e:
-            print(f"[DEBUG /log] Error resolving DB host SSH key: {e}")
-    else:
-        print(f"[DEBUG /log] Using local/config host: {hostname}")
-    
     try:
-        command_str = f"sudo zcat {shlex.quote(os.path.join(LOG_DIRECTORY, filename))} 2>/dev/null | tail -n 500" if filename.endswith('.gz') else f"sudo tail -n 500 {shlex.quote(os.path.join(LOG_DIRECTORY, filename))}"
-        result = execute_command(hostname, command_str)
-        return jsonify({'content': result.stdout, 'will_be_truncated': len(result.stdout) > MAX_CHAR_COUNT})
-    except Exception as e: 
-        return jsonify({'error': f"Could not read log file '{filename}' on '{hostname}': {e}"}), 500
+        kind, source, since, until = _histogram_args()
+        return jsonify(log_histogram(hostname, kind, source, since, until))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f"Could not count '{source or 'journal'}' on '{hostname}': {e}"}), 500
 
-@app.route('/journal/<path:unit>')
-def get_journal_content(unit):
-    hostname = request.args.get('host', 'local')
+@app.route('/histogram/hosts')
+def get_host_histograms():
+    """The same histogram for every host (default: the whole journal over the last hour), hosts counted in parallel."""
     try:
-        command_str = f"sudo journalctl -u {shlex.quote(unit)} -n 500 --no-pager"
-        result = execute_command(hostname, command_str)
-        return jsonify({'content': result.stdout, 'will_be_truncated': len(result.stdout) > MAX_CHAR_COUNT})
-    except Exception as e: 
-        return jsonify({'error': f"Could not read journal for unit '{unit}' on '{hostname}': {e}"}), 500
+        kind, source, since, until = _histogram_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    hosts = _get_all_host_choices()
+
+    def one(host_id, host_name):
+        with app.app_context():
+            try:
+                return {'host_id': host_id, 'host_name': host_name,
+                        'histogram': log_histogram(host_id, kind, source, since, until)}
+            except Exception as e:
+                return {'host_id': host_id, 'host_name': host_name, 'error': str(e)[:300]}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SOURCE_SCAN_WORKERS, len(hosts)))) as executor:
+        results = list(executor.map(lambda h: one(*h), hosts))
+    return jsonify({'kind': kind, 'source': source or None, 'hosts': results})
+
+@app.route('/histogram/status')
+def log_histogram_status():
+    return jsonify({'sources': log_histograms.snapshot()})
+
+@app.route('/ssh/transfer-stats')
+def ssh_transfer_stats():
+    """Raw vs on-wire bytes for compressed SSH transfers (AILOG_SSH_COMPRESSION)."""
+    return jsonify(ssh_transfer.stats.snapshot())
 
 # --- HOST MANAGEMENT ROUTES ---
 @app.route('/hosts', methods=['GET'])
@@ -1423,7 +2318,7 @@ def test_ollama():
     
     try:
         # Test connectivity by fetching models list
-        response = requests.get(f'{ollama_url}/api/tags', timeout=5)
+        response = ai_http.get(f'{ollama_url}/api/tags', metric='ollama.tags', timeout=5)
         response.raise_for_status()
         models = response.json().get('models', [])
         return jsonify({'success': True, 'message': f'Connection successful! Found {len(models)} model(s).', 'models': models})
@@ -1464,7 +2359,7 @@ def get_ollama_models():
     ollama_url = ollama_url.rstrip('/')
     
     try:
-        response = requests.get(f'{ollama_url}/api/tags', timeout=10)
+        response = ai_http.get(f'{ollama_url}/api/tags', metric='ollama.tags', timeout=10)
         response.raise_for_status()
         models = response.json().get('models', [])
         model_names = [m.get('name', 'unknown') for m in models]
@@ -1472,6 +2367,11 @@ def get_ollama_models():
     except Exception as e:
         return jsonify({'error': f'Failed to fetch models: {str(e)}'}), 500
 
+@app.route('/ai/metrics', methods=['GET'])
+def ai_metrics():
+    """Per-call latency metrics and pool state for AI provider/Discord HTTP clients"""
+    return jsonify(ai_http.metrics_snapshot())
+
 @app.route('/ai/config', methods=['GET'])
 def get_ai_config():
     """Get current AI provider configuration"""
@@ -1524,8 +2424,9 @@ def test_saved_openai_key():
         if not api_key:
             return jsonify({'success': False, 'error': 'No saved OpenAI API key configured.'}), 400
 
-        resp = requests.get(
-            'https://api.openai.com/v1/models',
+        resp = ai_http.get(
+            f'{OPENAI_API_BASE}/models',
+            metric='openai.models',
             headers={'Authorization': f'Bearer {api_key}'},
             timeout=10,
         )
@@ -1553,8 +2454,22 @@ def ai_search_config():
         if isinstance(keywords, list):
             cleaned = [str(k).strip() for k in keywords if str(k).strip()]
             _setting_set('ai.alert_keywords', cleaned)
-        return jsonify({'search_prompt': get_ai_search_prompt(), 'alert_keywords': get_ai_alert_keywords(), 'message': 'AI search settings saved.'})
-    return jsonify({'search_prompt': get_ai_search_prompt(), 'alert_keywords': get_ai_alert_keywords()})
+        map_reduce = data.get('map_reduce')
+        if isinstance(map_reduce, dict):
+            try:
+                cfg = MapReduceConfig(**{k: map_reduce[k] for k in ('map_workers', 'reduce_fan_in', 'max_depth', 'max_report_chars') if k in map_reduce}).normalised()
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid map_reduce settings.'}), 400
+            _setting_set('ai.map_reduce', asdict(cfg))
+        anomaly_gate = data.get('anomaly_gate')
+        if isinstance(anomaly_gate, dict):
+            try:
+                gate_cfg = GateConfig(**{k: anomaly_gate[k] for k in asdict(GateConfig()) if k in anomaly_gate}).normalised()
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid anomaly_gate settings.'}), 400
+            _setting_set('ai.anomaly_gate', asdict(gate_cfg))
+        return jsonify({'search_prompt': get_ai_search_prompt(), 'alert_keywords': get_ai_alert_keywords(), 'map_reduce': asdict(get_map_reduce_config()), 'anomaly_gate': asdict(get_anomaly_gate_config()), 'message': 'AI search settings saved.'})
+    return jsonify({'search_prompt': get_ai_search_prompt(), 'alert_keywords': get_ai_alert_keywords(), 'map_reduce': asdict(get_map_reduce_config()), 'anomaly_gate': asdict(get_anomaly_gate_config())})
 
 @app.route('/suricata/prompt', methods=['GET', 'POST'])
 def suricata_prompt_config():
@@ -1602,7 +2517,7 @@ def discord_test():
             return jsonify({'success': False, 'error': 'No Discord webhook URL configured.'}), 400
 
         payload = {'content': '✅ AI Log Viewer test notification.'}
-        r = requests.post(webhook_url, json=payload, timeout=10)
+        r = ai_http.post(webhook_url, metric='discord.webhook', json=payload, timeout=10)
         if r.status_code in (200, 204):
             return jsonify({'success': True, 'message': 'Discord webhook test sent.'})
         return jsonify({'success': False, 'error': f'Discord returned {r.status_code}: {r.text[:200]}'}), 400
@@ -1633,25 +2548,44 @@ def ollama_config():
             'analysis_provider': config.get('analysis_provider', 'openai')
         })
 
-def analyse_with_ollama(log_content, log_name, ollama_url, ollama_model):
+def _provider_model(provider, config=None):
+    """Model name used for the given provider (OpenAI is fixed to gpt-3.5-turbo)."""
+    if provider == 'openai' or provider not in ('ollama', 'openrouter'):
+        return 'gpt-3.5-turbo'
+    config = config if config is not None else load_config()
+    return config.get('ollama_model') if provider == 'ollama' else config.get('openrouter_model')
+
+def _prepare_log_for_llm(log_content, condense=True, provider='openai', model=None):
+    """Condense repeated lines into templates, then keep the most recent whole lines that fit the model's token budget."""
+    content = log_content or ''
+    if condense:
+        try:
+            content = condense_log(content)
+        except Exception as e:
+            print(f"Log condensation failed, sending raw log: {e}")
+    budget = get_model_token_config(provider, model, MAX_INPUT_TOKENS).input_budget
+    if estimate_tokens(content) > budget:
+        content = f"[--- Log truncated to fit the model's context window... ---]\n" + tail_within_budget(content, budget)
+    return content
+
+def analyse_with_ollama(log_content, log_name, ollama_url, ollama_model, condense=True):
     """Analyze log using Ollama"""
     if not ollama_url.startswith('http'):
         ollama_url = f'http://{ollama_url}'
     ollama_url = ollama_url.rstrip('/')
     
-    truncated_content = log_content
-    if len(log_content) > MAX_CHAR_COUNT:
-        truncated_content = f"[--- Log truncated due to size limit... ---]\n" + log_content[-MAX_CHAR_COUNT:]
+    truncated_content = _prepare_log_for_llm(log_content, condense=condense, provider='ollama', model=ollama_model)
     
     prompt = f"Analyse this log for {log_name} for errors, create a summary report, and give troubleshooting tips.\n\n{truncated_content}"
     
     try:
         endpoint_url = f'{ollama_url}/api/generate'
-        response = requests.post(
+        response = ai_http.post(
             endpoint_url,
+            metric='ollama.generate',
+            rate_key='provider:ollama',
             allow_redirects=False,
-            json={'model': ollama_model, 'prompt': prompt, 'stream': False},
-            timeout=60
+            json={'model': ollama_model, 'prompt': prompt, 'stream': False}
         )
 
         if response.is_redirect or response.is_permanent_redirect:
@@ -1714,8 +2648,9 @@ def get_openrouter_models():
         return jsonify({'error': 'OpenRouter API key not provided.'}), 400
     
     try:
-        response = requests.get(
-            'https://openrouter.ai/api/v1/models',
+        response = ai_http.get(
+            f'{OPENROUTER_API_BASE}/models',
+            metric='openrouter.models',
             headers={'Authorization': f'Bearer {api_key}'},
             timeout=10
         )
@@ -1738,8 +2673,9 @@ def test_saved_openrouter_key():
         if not api_key:
             return jsonify({'success': False, 'error': 'No saved OpenRouter API key configured.'}), 400
 
-        response = requests.get(
-            'https://openrouter.ai/api/v1/models',
+        response = ai_http.get(
+            f'{OPENROUTER_API_BASE}/models',
+            metric='openrouter.models',
             headers={'Authorization': f'Bearer {api_key}'},
             timeout=10
         )
@@ -1756,15 +2692,15 @@ def test_saved_openrouter_key():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def analyse_with_openrouter(log_content, log_name, api_key, model):
+def analyse_with_openrouter(log_content, log_name, api_key, model, condense=True):
     """Analyze log using OpenRouter (OpenAI-compatible API)"""
-    truncated_content = log_content
-    if len(log_content) > MAX_CHAR_COUNT:
-        truncated_content = f"[--- Log truncated due to size limit... ---]\n" + log_content[-MAX_CHAR_COUNT:]
+    truncated_content = _prepare_log_for_llm(log_content, condense=condense, provider='openrouter', model=model)
     
     try:
-        response = requests.post(
-            'https://openrouter.ai/api/v1/chat/completions',
+        response = ai_http.post(
+            f'{OPENROUTER_API_BASE}/chat/completions',
+            metric='openrouter.chat',
+            rate_key='provider:openrouter',
             headers={
                 'Authorization': f'Bearer {api_key}',
                 'Content-Type': 'application/json'
@@ -1775,8 +2711,7 @@ def analyse_with_openrouter(log_content, log_name, api_key, model):
                     {'role': 'system', 'content': 'You are a helpful assistant that analyses log files.'},
                     {'role': 'user', 'content': f'Analyse this log for {log_name} for errors, create a summary report, and give troubleshooting tips.\n\n{truncated_content}'}
                 ]
-            },
-            timeout=60
+            }
         )
         response.raise_for_status()
         result = response.json()
@@ -1788,6 +2723,197 @@ def analyse_with_openrouter(log_content, log_name, api_key, model):
     except Exception as e:
         raise Exception(f'OpenRouter analysis failed: {str(e)}')
 
+def _openai_chat(api_key, messages, model="gpt-3.5-turbo"):
+    """Run a chat completion on the cached OpenAI client and return the message text."""
+    client = ai_http.get_openai_client(api_key, base_url=OPENAI_BASE_URL_OVERRIDE)
+    with ai_http.timed('openai.chat'):
+        response = ai_http.call_sdk('provider:openai', lambda: client.chat.completions.create(model=model, messages=messages))
+    return response.choices[0].message.content
+
+def _llm_complete(config, provider, system_prompt, user_prompt):
+    """Send a free-form prompt to the configured provider and return the reply text."""
+    if provider == 'ollama':
+        ollama_url = config.get('ollama_url') or ''
+        if not ollama_url.startswith('http'):
+            ollama_url = f'http://{ollama_url}'
+        response = ai_http.post(
+            f"{ollama_url.rstrip('/')}/api/generate",
+            metric='ollama.generate',
+            rate_key='provider:ollama',
+            allow_redirects=False,
+            json={'model': config.get('ollama_model'), 'system': system_prompt, 'prompt': user_prompt, 'stream': False}
+        )
+        response.raise_for_status()
+        return response.json().get('response', '')
+    messages = [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt},
+    ]
+    if provider == 'openrouter':
+        response = ai_http.post(
+            f'{OPENROUTER_API_BASE}/chat/completions',
+            metric='openrouter.chat',
+            rate_key='provider:openrouter',
+            headers={'Authorization': f"Bearer {config.get('openrouter_api_key')}", 'Content-Type': 'application/json'},
+            json={'model': config.get('openrouter_model'), 'messages': messages}
+        )
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+    return _openai_chat(config.get('api_key'), messages)
+
+def stream_with_ollama(prompt, ollama_url, ollama_model):
+    """Yield response text fragments from Ollama /api/generate as they arrive."""
+    if not ollama_url.startswith('http'):
+        ollama_url = f'http://{ollama_url}'
+    ollama_url = ollama_url.rstrip('/')
+    endpoint_url = f'{ollama_url}/api/generate'
+    response = ai_http.post(
+        endpoint_url,
+        metric='ollama.generate.stream',
+        rate_key='provider:ollama',
+        allow_redirects=False,
+        json={'model': ollama_model, 'prompt': prompt, 'stream': True},
+        stream=True,
+        timeout=ai_http.stream_timeout()
+    )
+    try:
+        if response.is_redirect or response.is_permanent_redirect:
+            loc = response.headers.get('Location')
+            raise Exception(f'Ollama redirected request from {endpoint_url} to {loc} (status {response.status_code}). Check the base URL (no trailing slash) and reverse proxy settings.')
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            if obj.get('error'):
+                raise Exception(f"Ollama error: {obj.get('error')}")
+            piece = obj.get('response')
+            if piece:
+                yield piece
+            if obj.get('done'):
+                break
+    finally:
+        response.close()
+
+def stream_with_openrouter(messages, api_key, model):
+    """Yield delta content from OpenRouter's OpenAI-compatible SSE stream."""
+    response = ai_http.post(
+        f'{OPENROUTER_API_BASE}/chat/completions',
+        metric='openrouter.chat.stream',
+        rate_key='provider:openrouter',
+        headers={
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        },
+        json={'model': model, 'messages': messages, 'stream': True},
+        stream=True,
+        timeout=ai_http.stream_timeout()
+    )
+    try:
+        if response.status_code >= 400:
+            raise Exception(f'OpenRouter API error ({response.status_code}): {(response.text or "")[:300]}')
+        for line in response.iter_lines(decode_unicode=True):
+            # OpenRouter sends ": OPENROUTER PROCESSING" comments while queued
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            try:
+                obj = json.loads(data)
+            except Exception:
+                continue
+            if obj.get('error'):
+                raise Exception(f"OpenRouter error: {obj['error'].get('message') if isinstance(obj['error'], dict) else obj['error']}")
+            for choice in obj.get('choices') or []:
+                piece = (choice.get('delta') or {}).get('content')
+                if piece:
+                    yield piece
+    finally:
+        response.close()
+
+def stream_with_openai(messages, api_key, model="gpt-3.5-turbo"):
+    """Yield delta content from the OpenAI chat completions stream."""
+    client = ai_http.get_openai_client(api_key, base_url=OPENAI_BASE_URL_OVERRIDE)
+    with ai_http.timed('openai.chat.stream'):
+        stream = ai_http.call_sdk('provider:openai', lambda: client.chat.completions.create(model=model, messages=messages, stream=True))
+    try:
+        for chunk in stream:
+            for choice in chunk.choices or []:
+                piece = getattr(choice.delta, 'content', None)
+                if piece:
+                    yield piece
+    finally:
+        try:
+            stream.response.close()
+        except Exception:
+            pass
+
+def _analysis_stream_response(token_iter_factory, on_complete=None):
+    """Proxy provider text fragments to the client as SSE.
+
+    Each fragment is sent as {'status': 'token', 'text': ...}; the final event
+    carries the assembled analysis plus whatever on_complete(analysis) returns.
+    If the client disconnects the generator is closed, which closes the
+    upstream provider response.
+    """
+    def generate():
+        parts = []
+        tokens = None
+        try:
+            yield f"data: {json.dumps({'status': 'progress', 'message': 'Contacting AI provider...'})}\n\n"
+            tokens = token_iter_factory()
+            for piece in tokens:
+                parts.append(piece)
+                yield f"data: {json.dumps({'status': 'token', 'text': piece})}\n\n"
+            analysis = ''.join(parts)
+            extra = {}
+            if on_complete:
+                try:
+                    extra = on_complete(analysis) or {}
+                except Exception as e:
+                    print(f"Post-analysis step failed: {e}")
+            yield f"data: {json.dumps({'status': 'complete', 'analysis': analysis, **extra})}\n\n"
+        except GeneratorExit:
+            print('Analysis stream cancelled by client.')
+            raise
+        except Exception as e:
+            yield f"data: {json.dumps({'status': 'error', 'message': f'An error occurred during AI Analysis: {str(e)}', 'analysis': ''.join(parts)})}\n\n"
+        finally:
+            if tokens is not None and hasattr(tokens, 'close'):
+                tokens.close()
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+def _provider_token_stream(provider, data, system_prompt, user_prompt):
+    """Return (factory, error) for the selected provider; factory() yields text fragments."""
+    messages = [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt},
+    ]
+    if provider == 'ollama':
+        config = load_config()
+        ollama_url = config.get('ollama_url')
+        ollama_model = config.get('ollama_model')
+        if not ollama_url or not ollama_model:
+            return None, 'Ollama not configured. Please set up Ollama in Settings.'
+        return (lambda: stream_with_ollama(user_prompt, ollama_url, ollama_model)), None
+    if provider == 'openrouter':
+        config = load_config()
+        api_key = config.get('openrouter_api_key')
+        model = config.get('openrouter_model')
+        if not api_key or not model:
+            return None, 'OpenRouter not configured. Please set up OpenRouter in Settings.'
+        return (lambda: stream_with_openrouter(messages, api_key, model)), None
+    api_key = data.get('api_key')
+    if not api_key:
+        return None, 'OpenAI API key not provided.'
+    return (lambda: stream_with_openai(messages, api_key)), None
+
 # --- ANALYSIS & SCHEDULER ROUTES (RESTORED) ---
 def save_config(config):
     """Persist relevant config keys to DB-backed AppSetting."""
@@ -1873,24 +2999,16 @@ def analyse_log():
             if not api_key:
                 return jsonify({'error': 'OpenAI API key not provided.'}), 400
 
-            truncated_content = log_content
-            if len(log_content) > MAX_CHAR_COUNT:
-                truncated_content = f"[--- Log truncated due to size limit... ---]\n" + log_content[-MAX_CHAR_COUNT:]
+            truncated_content = _prepare_log_for_llm(log_content, provider='openai', model='gpt-3.5-turbo')
 
-
-            client = openai.OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that analyses log files."},
-                    {"role": "user", "content": f"Analyse this log for {log_name} for errors, create a summary report, and give troubleshooting tips.\n\n{truncated_content}"}
-                ]
-            )
-            analysis = response.choices[0].message.content
+            analysis = _openai_chat(api_key, [
+                {"role": "system", "content": "You are a helpful assistant that analyses log files."},
+                {"role": "user", "content": f"Analyse this log for {log_name} for errors, create a summary report, and give troubleshooting tips.\n\n{truncated_content}"}
+            ])
 
         discord_sent = False
         data_start, data_end = extract_log_time_range(log_content)
-        if webhook_url and analysis and any(keyword.lower() in analysis.lower() for keyword in get_ai_alert_keywords()):
+        if webhook_url and analysis and get_alert_matcher().matches(analysis):
             send_discord_notification(webhook_url, log_name, 'local', analysis, data_start=data_start, data_end=data_end)
             discord_sent = True
 
@@ -1918,14 +3036,14 @@ def suricata_analyse():
             ollama_model = config.get('ollama_model')
             if not ollama_url or not ollama_model:
                 return jsonify({'error': 'Ollama not configured. Please set it up in Settings.'}), 400
-            analysis = analyse_with_ollama(f"{prompt}\n\n{log_content}", log_name, ollama_url, ollama_model)
+            analysis = analyse_with_ollama(f"{prompt}\n\n{log_content}", log_name, ollama_url, ollama_model, condense=False)
         elif provider == 'openrouter':
             config = load_config()
             api_key = config.get('openrouter_api_key')
             model = config.get('openrouter_model')
             if not api_key or not model:
                 return jsonify({'error': 'OpenRouter not configured. Please set it up in Settings.'}), 400
-            analysis = analyse_with_openrouter(f"{prompt}\n\n{log_content}", log_name, api_key, model)
+            analysis = analyse_with_openrouter(f"{prompt}\n\n{log_content}", log_name, api_key, model, condense=False)
         else:
             api_key = data.get('api_key')
             if not api_key:
@@ -1935,20 +3053,70 @@ def suricata_analyse():
             if len(log_content) > MAX_CHAR_COUNT:
                 truncated_content = f"[--- Data truncated due to size limit... ---]\n" + log_content[-MAX_CHAR_COUNT:]
 
-            client = openai.OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that analyses Suricata data."},
-                    {"role": "user", "content": f"{prompt}\n\n--- DATA for {log_name} ---\n{truncated_content}"},
-                ]
-            )
-            analysis = response.choices[0].message.content
+            analysis = _openai_chat(api_key, [
+                {"role": "system", "content": "You are a helpful assistant that analyses Suricata data."},
+                {"role": "user", "content": f"{prompt}\n\n--- DATA for {log_name} ---\n{truncated_content}"},
+            ])
 
         return jsonify({'analysis': analysis})
     except Exception as e:
         return jsonify({'error': f'An error occurred during AI Analysis: {str(e)}'}), 500
 
+@app.route('/analyse/stream', methods=['POST'])
+def analyse_log_stream():
+    """Streaming variant of /analyse: tokens are relayed over SSE as the provider produces them."""
+    data = request.get_json(silent=True) or {}
+    log_content = data.get('log_content')
+    log_name = data.get('log_name')
+    webhook_url = data.get('webhook_url')
+    provider = data.get('provider', 'openai')
+
+    if not log_content:
+        return jsonify({'error': 'Missing log_content.'}), 400
+
+    truncated_content = _prepare_log_for_llm(log_content, provider=provider, model=_provider_model(provider))
+    factory, err = _provider_token_stream(
+        provider, data,
+        'You are a helpful assistant that analyses log files.',
+        f"Analyse this log for {log_name} for errors, create a summary report, and give troubleshooting tips.\n\n{truncated_content}"
+    )
+    if err:
+        return jsonify({'error': err}), 400
+
+    data_start, data_end = extract_log_time_range(log_content)
+
+    def on_complete(analysis):
+        discord_sent = False
+        if webhook_url and analysis and get_alert_matcher().matches(analysis):
+            send_discord_notification(webhook_url, log_name, 'local', analysis, data_start=data_start, data_end=data_end)
+            discord_sent = True
+        return {'discord_sent': discord_sent}
+
+    return _analysis_stream_response(factory, on_complete=on_complete)
+
+
+@app.route('/suricata/analyse/stream', methods=['POST'])
+def suricata_analyse_stream():
+    """Streaming variant of /suricata/analyse."""
+    data = request.get_json(silent=True) or {}
+    log_content = data.get('log_content')
+    log_name = data.get('log_name') or 'Suricata Raw Data'
+    provider = data.get('provider', 'openai')
+
+    if not log_content:
+        return jsonify({'error': 'Missing log_content.'}), 400
+
+    prompt = (data.get('prompt') or '').strip() or get_suricata_prompt()
+    truncated_content = _prepare_log_for_llm(log_content, condense=False, provider=provider, model=_provider_model(provider))
+    factory, err = _provider_token_stream(
+        provider, data,
+        'You are a helpful assistant that analyses Suricata data.',
+        f"{prompt}\n\n--- DATA for {log_name} ---\n{truncated_content}"
+    )
+    if err:
+        return jsonify({'error': err}), 400
+    return _analysis_stream_response(factory)
+
 def _exec_summary_from_analysis(analysis_text: str, max_chars: int = 600) -> str:
     if not analysis_text:
         return '(no analysis output)'
@@ -1959,10 +3127,15 @@ def _exec_summary_from_analysis(analysis_text: str, max_chars: int = 600) -> str
         head = head[:max_chars].rstrip() + '…'
     return head
 
-def _do_analysis_task(emit=None):
+def _do_analysis_task(emit=None, sources=None, on_source=None, gate=None):
     """Run analysis over configured sources.
 
     If emit is provided, it will be called with dict payloads suitable for SSE.
+    sources overrides the legacy schedule.sources setting.
+    on_source, if provided, is called with a stage-timing dict after each source.
+    gate, if provided, is called as gate(source, log_content) -> (analyse, message, commit);
+    sources it declines get message posted to Discord instead of an LLM call, and
+    commit (when not None) is called once the source has been handled without error.
     """
     config = load_config()
 
@@ -1978,7 +3151,8 @@ def _do_analysis_task(emit=None):
     _emit({'status': 'progress', 'message': 'Starting scheduled analysis...', 'progress': 0})
 
     webhook_url = (config.get('webhook_url') or '').strip()
-    sources = config.get('sources', []) or []
+    if sources is None:
+        sources = config.get('sources', []) or []
     provider = config.get('analysis_provider', 'openai')
 
     if not webhook_url or not sources:
@@ -1999,6 +3173,7 @@ def _do_analysis_task(emit=None):
             return
 
     total = len(sources)
+    mr_config = get_map_reduce_config()
 
     for i, source in enumerate(sources, start=1):
         log_name = source.get('name')
@@ -2009,73 +3184,144 @@ def _do_analysis_task(emit=None):
         _emit({'status': 'progress', 'message': f'Analyzing {i}/{total}: {log_name} on {host}...', 'progress': progress})
         _emit({'status': 'log', 'message': f'Analyzing {log_type}: {log_name} on {host} using {provider}'})
 
-        try:
-            command = f"sudo zcat {shlex.quote(os.path.join(LOG_DIRECTORY, log_name))} 2>/dev/null | tail -n 500" if str(log_name).endswith('.gz') else f"sudo tail -n 500 {shlex.quote(os.path.join(LOG_DIRECTORY, log_name))}"
-            if log_type != 'file':
-                command = f"sudo journalctl -u {shlex.quote(log_name)} -n 500 --no-pager"
+        stats = {
+            'host_id': host, 'source_type': log_type, 'source_name': log_name,
+            'provider': provider, 'model': _provider_model(provider, config),
+            'started_at': datetime.datetime.utcnow(), 'outcome': 'ok', 'error': None,
+            'discord_ms': 0, 'reduce_ms': 0,
+        }
+        source_t0 = time.perf_counter()
 
-            result = execute_command(host, command)
-            log_content = result.stdout
+        def _ms(t0):
+            return int((time.perf_counter() - t0) * 1000)
+
+        try:
+            t0 = time.perf_counter()
+            mirrored = None if source.get('priority') or source.get('since') else \
+                mirror_fresh(host, 'file' if log_type == 'file' else 'journal', log_name)
+            if mirrored is not None:
+                log_content = mirrored.tail_text(500)
+                _emit({'status': 'log', 'message': f'Read {log_name} on {host} from the local mirror.'})
+            elif log_type == 'file' and str(log_name).endswith('.gz'):
+                log_content = _read_log_page(host, log_name, lines=500).content
+                _index_feed(log_index.add_text, host, 'file', log_name, log_content)
+            elif log_type == 'file':
+                command = f"sudo tail -n 500 {shlex.quote(os.path.join(LOG_DIRECTORY, log_name))}"
+                log_content = execute_command(host, command, compress=True, label='log fetch').stdout
+                _index_feed(log_index.add_text, host, 'file', log_name, log_content)
+            else:
+                # Structured read; a source may narrow it server-side with priority/since
+                query = JournalQuery(unit=log_name, priority=source.get('priority'), since=source.get('since')).validate()
+                records = query_records(_log_runner(host, label='log fetch'), query, lines=500)
+                log_content = ''.join(r.format_line() + '\n' for r in records)
+                _index_feed(log_index.add_records, host, log_name, records)
+            stats['fetch_ms'] = _ms(t0)
+            stats['bytes_fetched'] = len((log_content or '').encode('utf-8', 'replace'))
             if not log_content:
                 _emit({'status': 'log', 'message': f'Skipping {log_name} on {host}: empty log.'})
+                stats['outcome'] = 'empty'
                 continue
 
             data_start, data_end = extract_log_time_range(log_content)
 
+            gate_commit = None
+            if gate is not None:
+                analyse, gate_message, gate_commit = gate(source, log_content)
+                if not analyse:
+                    _emit({'status': 'log', 'message': f'Skipping LLM for {log_name} on {host}: {gate_message.splitlines()[0]}'})
+                    stats['outcome'] = 'skipped'
+                    t0 = time.perf_counter()
+                    send_discord_status(webhook_url, log_name, host, gate_message, data_start=data_start, data_end=data_end)
+                    stats['discord_ms'] += _ms(t0)
+                    if gate_commit:
+                        gate_commit()
+                    continue
+                _emit({'status': 'log', 'message': f'Analyzing {log_name} on {host}: {gate_message}'})
+
             # Notify Discord that analysis started (info)
+            t0 = time.perf_counter()
             send_discord_status(webhook_url, log_name, host, 'Analysis started.', data_start=data_start, data_end=data_end)
+            stats['discord_ms'] += _ms(t0)
+
+            # Collapse repeated lines into templates before chunking
+            condensed = condense_log(log_content)
+            if len(condensed) < len(log_content):
+                _emit({'status': 'log', 'message': f'Condensed log from {len(log_content)} to {len(condensed)} chars.'})
+                log_content = condensed
+
+            # Pack whole lines into chunks sized to the model's token budget
+            plan = plan_chunks(log_content, provider, _provider_model(provider, config), MAX_INPUT_TOKENS)
+            chunks = plan.chunks
+            _emit({'status': 'log', 'message': f'Analysis plan: {plan.summary()}.'})
+            stats['bytes_condensed'] = len(log_content.encode('utf-8', 'replace'))
+            stats['chunk_count'] = len(chunks)
+            stats['tokens_estimated'] = plan.total_tokens
+            chunk_ms = [None] * len(chunks)
+            reduce_ms = []  # one entry per reduce call; list.append is safe from the reduce workers
+
+            subject = f"{log_name} on {host}"
+            search_prompt = get_ai_search_prompt()
+
+            def _analyse_chunk(part_idx, chunk):
+                t0 = time.perf_counter()
+                try:
+                    return _analyse_chunk_with_provider(part_idx, chunk)
+                finally:
+                    chunk_ms[part_idx - 1] = _ms(t0)
 
-            # Split long logs into chunks instead of truncating
-            chunks = [log_content[j:j + MAX_CHAR_COUNT] for j in range(0, len(log_content), MAX_CHAR_COUNT)]
-            if len(chunks) > 1:
-                _emit({'status': 'log', 'message': f'Log is large; splitting into {len(chunks)} parts for analysis.'})
-
-            analysis_parts = []
-
-            for part_idx, chunk in enumerate(chunks, start=1):
+            def _analyse_chunk_with_provider(part_idx, chunk):
                 part_label = f'part {part_idx}/{len(chunks)}' if len(chunks) > 1 else 'single part'
                 _emit({'status': 'log', 'message': f'Analyzing {part_label}...'})
-
-                hb_stop = threading.Event()
-
-                def _hb():
-                    waited = 0
-                    while not hb_stop.wait(5):
-                        waited += 5
-                        _emit({'status': 'log', 'message': f'Waiting for {provider} response ({waited}s)...'})
-
-                hb_thread = threading.Thread(target=_hb)
-                hb_thread.daemon = True
-
+                if provider == 'ollama':
+                    return analyse_with_ollama(chunk, subject, config.get('ollama_url'), config.get('ollama_model'), condense=False)
+                if provider == 'openrouter':
+                    return analyse_with_openrouter(chunk, subject, config.get('openrouter_api_key'), config.get('openrouter_model'), condense=False)
+                return _openai_chat(config.get('api_key'), [
+                    {"role": "system", "content": "You are a helpful assistant that analyses log files for potential issues."},
+                    {"role": "user", "content": f"{search_prompt}\n\n--- LOG for {subject} ({part_label}) ---\n{chunk}"},
+                ])
+
+            def _reduce_group(partials, level):
+                t0 = time.perf_counter()
                 try:
-                    _emit({'status': 'log', 'message': f'Waiting for {provider} response...'})
-                    hb_thread.start()
+                    return _llm_complete(config, provider, REDUCE_SYSTEM_PROMPT, build_reduce_prompt(partials, subject, mr_config.max_report_chars))
+                finally:
+                    reduce_ms.append(_ms(t0))
 
-                    if provider == 'ollama':
-                        part_analysis = analyse_with_ollama(chunk, f"{log_name} on {host}", config.get('ollama_url'), config.get('ollama_model'))
-                    elif provider == 'openrouter':
-                        part_analysis = analyse_with_openrouter(chunk, f"{log_name} on {host}", config.get('openrouter_api_key'), config.get('openrouter_model'))
-                    else:
-                        prompt = get_ai_search_prompt()
-                        client = openai.OpenAI(api_key=config.get('api_key'))
-                        response = client.chat.completions.create(
-                            model="gpt-3.5-turbo",
-                            messages=[
-                                {"role": "system", "content": "You are a helpful assistant that analyses log files for potential issues."},
-                                {"role": "user", "content": f"{prompt}\n\n--- LOG for {log_name} on {host} ({part_label}) ---\n{chunk}"},
-                            ]
-                        )
-                        part_analysis = response.choices[0].message.content
+            hb_stop = threading.Event()
 
-                    analysis_parts.append(part_analysis)
+            def _hb():
+                waited = 0
+                while not hb_stop.wait(5):
+                    waited += 5
+                    _emit({'status': 'log', 'message': f'Waiting for {provider} response ({waited}s)...'})
 
-                    _emit({'status': 'log', 'message': f'✅ Completed {part_label}.'})
-                finally:
-                    hb_stop.set()
+            hb_thread = threading.Thread(target=_hb)
+            hb_thread.daemon = True
 
-            analysis = "\n\n".join(analysis_parts)
-            alert_needed = any(keyword.lower() in analysis.lower() for keyword in get_ai_alert_keywords())
+            llm_t0 = time.perf_counter()
+            part_errors = []
+            try:
+                _emit({'status': 'log', 'message': f'Waiting for {provider} response...'})
+                hb_thread.start()
+                analysis = map_reduce_analyse(
+                    chunks, _analyse_chunk, _reduce_group, mr_config,
+                    emit=lambda m: _emit({'status': 'log', 'message': m}), errors=part_errors,
+                )
+            finally:
+                hb_stop.set()
+                stats['llm_ms'] = _ms(llm_t0)
+                stats['llm_chunk_ms'] = chunk_ms
+                stats['reduce_ms'] = sum(reduce_ms)
+            if part_errors:
+                # The report covers the remaining parts; the missing ones are recorded against the source
+                stats['error'] = '; '.join(part_errors)
+                _emit({'status': 'log', 'message': f'Analysis of {log_name} on {host} is partial: {stats["error"]}'})
+
+            alert_needed = get_alert_matcher().matches(analysis)
+            t0 = time.perf_counter()
             if alert_needed:
+                stats['outcome'] = 'alert'
                 _emit({'status': 'log', 'message': f'Issue found in {log_name} on {host}. Sending alert to Discord...'})
                 send_discord_notification(webhook_url, log_name, host, analysis, data_start=data_start, data_end=data_end)
                 _emit({'status': 'log', 'message': 'Discord alert sent.'})
@@ -2083,31 +3329,160 @@ def _do_analysis_task(emit=None):
                 _emit({'status': 'log', 'message': f'No alert keywords found for {log_name} on {host}; sending summary to Discord.'})
                 exec_sum = _exec_summary_from_analysis(analysis)
                 send_discord_status(webhook_url, log_name, host, f'No alert keywords found.\n\nExecutive summary:\n{exec_sum}', data_start=data_start, data_end=data_end)
+            stats['discord_ms'] += _ms(t0)
+            if gate_commit:
+                gate_commit()
 
         except Exception as e:
+            stats['outcome'] = 'error'
+            stats['error'] = str(e)
             _emit({'status': 'log', 'message': f'Error analyzing {log_name} on {host}: {e}'})
+        finally:
+            stats['total_ms'] = _ms(source_t0)
+            if on_source:
+                try:
+                    on_source(stats)
+                except Exception as e:
+                    print(f"Failed to record source stats: {e}")
 
     _emit({'status': 'complete', 'message': 'Scheduled analysis completed.', 'progress': 100})
 
-def _run_schedule(schedule: Schedule, emit=None):
-    """Run analysis for a specific Schedule by temporarily overriding legacy schedule.sources.
+def _anomaly_gate(schedule_id, cfg, force=False):
+    """gate(source, log_content) for _do_analysis_task backed by SourceBaseline rows.
+
+    Only lines newer than the previous run are scored; force (manual runs)
+    always analyses. The baseline update is returned as a commit callback
+    and saved only once the source's LLM/Discord step has succeeded, so a
+    failed analysis leaves its window (and any unseen templates) to be
+    scored again next run.
+    """
+    def gate(source, log_content):
+        host, kind, name = str(source.get('host') or 'local'), str(source.get('type') or ''), str(source.get('name') or '')
+        key = dict(schedule_id=schedule_id, host_id=host, source_type=kind, source_name=name)
+        try:
+            row = SourceBaseline.query.filter_by(**key).first()
+            baseline = Baseline(row.state() if row else None)
+            stats = window_stats(log_content, after=baseline.last_ts)
+            verdict = baseline.assess(stats, cfg, force=force)
+            message = verdict.reason if verdict.analyse else local_summary(stats, baseline, verdict)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[WARN] Anomaly gate failed for {name} on {host}, analysing anyway: {e}")
+            return True, 'anomaly gate unavailable', None
+
+        def commit():
+            try:
+                baseline.update(stats, verdict, cfg)
+                row = SourceBaseline.query.filter_by(**key).first()
+                if row is None:
+                    row = SourceBaseline(runs=0, skipped=0, **key)
+                    db.session.add(row)
+                row.state_json = json.dumps(baseline.to_state())
+                row.runs = baseline.runs
+                row.skipped = (row.skipped or 0) + (0 if verdict.analyse else 1)
+                row.last_verdict_json = json.dumps({'analyse': verdict.analyse, 'reasons': verdict.reasons, 'values': verdict.values,
+                                                    'lines': stats.lines, 'at': datetime.datetime.utcnow().isoformat()})
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[WARN] Could not save the anomaly baseline for {name} on {host}: {e}")
+
+        return verdict.analyse, message, commit
+    return gate
+
 
-    This reuses the existing _do_analysis_task implementation while we complete the migration.
+def _run_schedule(schedule: Schedule, emit=None, run_meta=None):
+    """Run analysis for a specific Schedule's sources and record it as a ScheduleRun.
+
+    Sources are passed explicitly rather than via the legacy schedule.sources
+    setting so several schedules can run concurrently.
     """
     # Build sources list
     sources = []
     for ss in ScheduleSource.query.filter_by(schedule_id=schedule.id).all():
         sources.append({'host': ss.host_id, 'type': ss.source_type, 'name': ss.source_name})
 
-    old_sources = _setting_get('schedule.sources', [])
+    run_meta = run_meta or {}
+    provider = _setting_get('analysis_provider', 'openai')
+    run = ScheduleRun(
+        schedule_id=schedule.id,
+        schedule_name=schedule.name,
+        reason=run_meta.get('reason') or 'scheduled',
+        provider=provider,
+        model=_provider_model(provider),
+        status='running',
+        queued_at=run_meta.get('queued_at'),
+        started_at=datetime.datetime.utcnow(),
+        queue_wait_ms=run_meta.get('queue_wait_ms'),
+        source_count=len(sources),
+    )
     try:
-        _setting_set('schedule.sources', sources)
-        _do_analysis_task(emit=emit)
-    finally:
+        db.session.add(run)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to record schedule run: {e}")
+        run = None
+
+    errors = []
+
+    def _emit(payload):
+        if payload.get('status') == 'error':
+            errors.append(payload.get('message'))
+        if emit:
+            emit(payload)
+
+    def _on_source(stats):
+        if not run:
+            return
         try:
-            _setting_set('schedule.sources', old_sources)
-        except Exception:
-            pass
+            db.session.add(ScheduleRunSource(
+                run_id=run.id,
+                host_id=str(stats.get('host_id') or 'local'),
+                source_type=str(stats.get('source_type') or ''),
+                source_name=str(stats.get('source_name') or ''),
+                provider=stats.get('provider'),
+                model=stats.get('model'),
+                outcome=stats.get('outcome') or 'ok',
+                error=stats.get('error'),
+                started_at=stats.get('started_at'),
+                fetch_ms=stats.get('fetch_ms'),
+                bytes_fetched=stats.get('bytes_fetched'),
+                bytes_condensed=stats.get('bytes_condensed'),
+                chunk_count=stats.get('chunk_count'),
+                tokens_estimated=stats.get('tokens_estimated'),
+                llm_ms=stats.get('llm_ms'),
+                llm_chunk_ms_json=json.dumps(stats.get('llm_chunk_ms') or []),
+                reduce_ms=stats.get('reduce_ms'),
+                discord_ms=stats.get('discord_ms'),
+                total_ms=stats.get('total_ms'),
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to record schedule run source: {e}")
+
+    status, error = 'success', None
+    try:
+        gate_cfg = get_anomaly_gate_config()
+        gate = _anomaly_gate(schedule.id, gate_cfg, force=run_meta.get('reason') == 'manual') if gate_cfg.enabled else None
+        _do_analysis_task(emit=_emit, sources=sources, on_source=_on_source, gate=gate)
+        if errors:
+            status, error = 'error', errors[-1]
+    except Exception as e:
+        status, error = 'error', str(e)
+        raise
+    finally:
+        if run:
+            try:
+                run.status = status
+                run.error = error
+                run.finished_at = datetime.datetime.utcnow()
+                run.duration_ms = int((run.finished_at - run.started_at).total_seconds() * 1000)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Failed to finalise schedule run: {e}")
 
 
 # --- MULTI-SCHEDULE API + MIGRATION HELPERS ---
@@ -2225,6 +3600,15 @@ def _sync_scheduler_jobs_from_db():
         )
 
 
+@app.route('/api/schedules/status', methods=['GET'])
+def api_schedules_status():
+    """Queued/running state per schedule plus the run queue."""
+    return jsonify({
+        'schedules': {str(k): v for k, v in schedule_status_map.items()},
+        'queue': schedule_run_queue.snapshot(),
+    })
+
+
 @app.route('/api/schedules', methods=['GET', 'POST'])
 def api_schedules_collection():
     if request.method == 'GET':
@@ -2281,6 +3665,7 @@ def api_schedule_item(schedule_id: int):
             scheduler.remove_job(f'schedule_{s.id}')
         except Exception:
             pass
+        SourceBaseline.query.filter_by(schedule_id=s.id).delete()
         db.session.delete(s)
         db.session.commit()
         return jsonify({'message': 'Schedule deleted.'})
@@ -2324,6 +3709,109 @@ def api_schedule_item(schedule_id: int):
     return jsonify(_schedule_to_payload(s, include_children=True))
 
 
+@app.route('/api/schedules/runs', methods=['GET'])
+def api_schedule_runs():
+    """Recent schedule runs, newest first (?schedule_id=&limit=)."""
+    try:
+        limit = max(1, min(500, int(request.args.get('limit', 50))))
+    except ValueError:
+        limit = 50
+    q = ScheduleRun.query
+    sid = request.args.get('schedule_id')
+    if sid:
+        try:
+            q = q.filter(ScheduleRun.schedule_id == int(sid))
+        except ValueError:
+            return jsonify({'error': 'Invalid schedule_id'}), 400
+    runs = q.order_by(ScheduleRun.started_at.desc()).limit(limit).all()
+    return jsonify([r.to_dict() for r in runs])
+
+
+@app.route('/api/schedules/runs/<int:run_id>', methods=['GET'])
+def api_schedule_run_detail(run_id: int):
+    run = ScheduleRun.query.get_or_404(run_id)
+    return jsonify(run.to_dict(include_children=True))
+
+
+@app.route('/api/schedules/runs/stats', methods=['GET'])
+def api_schedule_run_stats():
+    """Where run time goes: per-source/host/provider stage timings, slowest first.
+
+    Query params: group_by=source|host|provider (default source), days=7,
+    limit=20, bucket=day to return a per-day series instead of totals.
+    """
+    group_by = (request.args.get('group_by') or 'source').strip().lower()
+    bucket = (request.args.get('bucket') or '').strip().lower()
+    try:
+        days = max(1, min(365, int(request.args.get('days', 7))))
+        limit = max(1, min(1000, int(request.args.get('limit', 20))))
+    except ValueError:
+        return jsonify({'error': 'days and limit must be integers'}), 400
+
+    R = ScheduleRunSource
+    if group_by == 'provider':
+        keys = [R.provider, R.model]
+    elif group_by == 'host':
+        keys = [R.host_id]
+    elif group_by == 'source':
+        keys = [R.host_id, R.source_type, R.source_name]
+    else:
+        return jsonify({'error': 'group_by must be source, host or provider'}), 400
+    if bucket == 'day':
+        keys = keys + [sa_func.date(R.started_at).label('day')]
+
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    avg_total = sa_func.avg(R.total_ms)
+    q = (db.session.query(
+            *keys,
+            sa_func.count(R.id),
+            avg_total,
+            sa_func.max(R.total_ms),
+            sa_func.avg(R.fetch_ms),
+            sa_func.avg(R.bytes_fetched),
+            sa_func.avg(R.llm_ms),
+            sa_func.sum(R.llm_ms),
+            sa_func.sum(R.chunk_count),
+            sa_func.avg(R.tokens_estimated),
+            sa_func.avg(R.discord_ms),
+            sa_func.sum(sa_case((R.outcome == 'error', 1), else_=0)),
+        )
+        .filter(R.started_at >= since)
+        .group_by(*keys))
+    if bucket == 'day':
+        q = q.order_by(keys[-1].asc(), avg_total.desc())
+    else:
+        q = q.order_by(avg_total.desc())
+
+    def _r(v):
+        return round(float(v), 1) if v is not None else None
+
+    out = []
+    nkeys = len(keys)
+    for row in q.limit(limit).all():
+        key_vals = row[:nkeys]
+        (count, avg_ms, max_ms, avg_fetch, avg_bytes, avg_llm, sum_llm,
+         sum_chunks, avg_tokens, avg_discord, errors) = row[nkeys:]
+        item = {c.key if hasattr(c, 'key') else str(c): v for c, v in zip(keys, key_vals)}
+        item.update({
+            'runs': count,
+            'errors': int(errors or 0),
+            'avg_total_ms': _r(avg_ms),
+            'max_total_ms': max_ms,
+            'avg_fetch_ms': _r(avg_fetch),
+            'avg_bytes_fetched': _r(avg_bytes),
+            'avg_llm_ms': _r(avg_llm),
+            'avg_llm_ms_per_chunk': _r(sum_llm / sum_chunks) if sum_llm and sum_chunks else None,
+            'avg_tokens_estimated': _r(avg_tokens),
+            'avg_discord_ms': _r(avg_discord),
+        })
+        if 'day' in item and item['day'] is not None:
+            item['day'] = str(item['day'])
+        out.append(item)
+
+    return jsonify({'group_by': group_by, 'days': days, 'bucket': bucket or None, 'rows': out})
+
+
 @app.route('/api/schedules/<int:schedule_id>/run_now/stream', methods=['GET'])
 def api_schedule_run_now_stream(schedule_id: int):
     from queue import Queue, Empty
@@ -2361,6 +3849,19 @@ def api_schedule_run_now_stream(schedule_id: int):
     return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
 
 
+@app.route('/api/schedules/<int:schedule_id>/baselines')
+def api_schedule_baselines(schedule_id):
+    rows = SourceBaseline.query.filter_by(schedule_id=schedule_id).order_by(SourceBaseline.host_id, SourceBaseline.source_name).all()
+    return jsonify({'schedule_id': schedule_id, 'config': asdict(get_anomaly_gate_config()), 'baselines': [r.to_dict() for r in rows]})
+
+
+@app.route('/api/schedules/<int:schedule_id>/baselines', methods=['DELETE'])
+def api_schedule_baselines_reset(schedule_id):
+    deleted = SourceBaseline.query.filter_by(schedule_id=schedule_id).delete()
+    db.session.commit()
+    return jsonify({'success': True, 'deleted': deleted})
+
+
 @app.route('/api/schedules/<int:schedule_id>/sources/table/stream', methods=['GET'])
 def api_schedule_sources_table_stream(schedule_id: int):
     """Like /sources/table/stream but limited to selected hosts (host-first)."""
@@ -2372,6 +3873,8 @@ def api_schedule_sources_table_stream(schedule_id: int):
     if hosts_param:
         allowed = {h.strip() for h in hosts_param.split(',') if h.strip()}
 
+    concurrency = _scan_concurrency_arg()
+
     def generate_table_events():
         def generate_event(data):
             return f"data: {json.dumps(data)}\n\n"
@@ -2379,81 +3882,20 @@ def api_schedule_sources_table_stream(schedule_id: int):
         try:
             yield generate_event({'status': 'progress', 'message': 'Initializing host scan...', 'progress': 5})
 
-            all_sources = []
-            failed_hosts = []
             all_hostnames = _get_all_host_choices()
             if allowed is not None:
                 all_hostnames = [(hid, hname) for hid, hname in all_hostnames if hid in allowed]
-
-            total_hosts = len(all_hostnames)
-            if total_hosts == 0:
+            if not all_hostnames:
                 yield generate_event({'status': 'error', 'message': 'No hosts selected.'})
                 return
 
-            yield generate_event({'status': 'progress', 'message': f'Found {total_hosts} hosts to scan', 'progress': 10})
-
-            for i, (host_id, host_name) in enumerate(all_hostnames):
-                host_progress = 10 + int((i / total_hosts) * 80)
-                yield generate_event({'status': 'progress', 'message': f'Connecting to {host_name}...', 'progress': host_progress})
-                try:
-                    host_sources = fetch_sources_from_host_detailed(host_id, host_name, generate_event, host_progress)
-                    all_sources.extend(host_sources)
-                    yield generate_event({'status': 'progress', 'message': f'✅ {host_name}: Found {len(host_sources)} log sources', 'progress': host_progress + int(80/total_hosts)})
-                except Exception as e:
-                    error_msg = str(e)
-                    if 'timeout' in error_msg.lower():
-                        error_msg = 'Connection timed out'
-                    elif 'connection refused' in error_msg.lower():
-                        error_msg = 'Connection refused'
-                    elif 'no route to host' in error_msg.lower():
-                        error_msg = 'No route to host'
-                    failed_hosts.append({'host_id': host_id, 'host_name': host_name, 'error': error_msg})
-                    yield generate_event({'status': 'progress', 'message': f'❌ {host_name}: {error_msg}', 'progress': host_progress + int(80/total_hosts)})
-
-            yield generate_event({'status': 'progress', 'message': 'Building log matrix...', 'progress': 90})
-
-            log_matrix = {}
-            host_list = []
-            for host_id, host_name in all_hostnames:
-                if not any(f['host_id'] == host_id for f in failed_hosts):
-                    host_list.append({'host_id': host_id, 'host_name': host_name})
-
-            for source in all_sources:
-                log_key = f"{source['name']}|{source['type']}"
-                if log_key not in log_matrix:
-                    log_matrix[log_key] = {
-                        'name': source['name'],
-                        'type': source['type'],
-                        'hosts': {},
-                        'size_info': source.get('size_formatted', 'N/A'),
-                        'modified_info': source.get('modified_formatted', 'N/A')
-                    }
-                log_matrix[log_key]['hosts'][source['host']] = {
-                    'host_id': source['host'],
-                    'host_name': source['host_name'],
-                    'size_bytes': source.get('size_bytes', 0),
-                    'size_formatted': source.get('size_formatted', 'N/A'),
-                    'modified_epoch': source.get('modified_epoch', 0),
-                    'modified_formatted': source.get('modified_formatted', 'N/A')
-                }
-
-            logs_table = list(log_matrix.values())
-            logs_table.sort(key=lambda x: x['name'].lower())
-
-            response_data = {
-                'logs': logs_table,
-                'hosts': host_list,
-                'failed_hosts': failed_hosts,
-                'total_hosts': len(all_hostnames),
-                'successful_hosts': len(host_list)
-            }
-
-            yield generate_event({'status': 'complete', 'data': response_data, 'progress': 100})
+            yield from _source_scan_stream(all_hostnames, concurrency)
 
         except Exception as e:
             yield generate_event({'status': 'error', 'message': str(e)})
 
-    return Response(stream_with_context(generate_table_events()), mimetype='text/event-stream')
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate_table_events()), mimetype='text/event-stream', headers=headers)
 
 
 @app.route('/schedule/start', methods=['POST'])
@@ -2591,6 +4033,15 @@ def startup_scheduler():
         except Exception as e:
             print(f'[WARN] Monitoring scheduler job not started: {e}')
 
+        try:
+            _schedule_mirror_job()
+        except Exception as e:
+            print(f'[WARN] Log mirror job not started: {e}')
+
+        if log_index.available:
+            scheduler.add_job(_search_index_prune_job, trigger='interval', hours=1, id='search_index_prune',
+                              replace_existing=True, max_instances=1, coalesce=True)
+
         try:
             _ensure_default_schedule_migrated()
         except Exception as e:
@@ -3014,9 +4465,18 @@ def _suricata_remote_stat(user: str, host: str, ssh_key_path: str | None, path:
 
 
 def _suricata_incremental_read(user: str, host: str, ssh_key_path: str | None, path: str, offset: int, max_bytes: int) -> tuple[bool, str]:
-    # dd is widely available and allows byte offsets; cap read size.
-    cmd = f"sudo dd if={shlex.quote(path)} bs=1 skip={int(offset)} count={int(max_bytes)} status=none 2>/dev/null"
-    return _suricata_remote_cmd(user, host, cmd, ssh_key_path, timeout=60)
+    # tail -c seeks to the offset (dd bs=1 did a syscall per byte); cap read size.
+    cmd = f"sudo tail -c +{int(offset) + 1} {shlex.quote(path)} 2>/dev/null | head -c {int(max_bytes)}"
+    if ssh_transfer.default_mode() == 'off':
+        return _suricata_remote_cmd(user, host, cmd, ssh_key_path, timeout=60)
+    try:
+        result = ssh_transfer.run_compressed(lambda c: (ssh_command_args(user, host, ssh_key_path) + [c], False), cmd,
+                                             timeout=60, errors='surrogateescape', label='suricata')
+    except subprocess.TimeoutExpired:
+        return (False, "Command timed out")
+    except Exception as e:
+        return (False, str(e))
+    return (True, result.stdout) if result.returncode == 0 else (False, result.stderr)
 
 
 def _suricata_get_or_create_state(sensor_id: int, filename: str) -> SuricataIngestState:
@@ -3269,7 +4729,7 @@ def suricata_ingest_sensor(sensor: SuricataSensor, bucket_size: int, max_bytes_p
         st.last_inode = inode
         st.last_size = size
         st.last_mtime = mtime
-        st.last_offset = offset + len(chunk.encode('utf-8', errors='ignore'))
+        st.last_offset = offset + len(chunk.encode('utf-8', errors='surrogateescape'))
         db.session.commit()
 
         summary['files'][fn] = {'ok': True, 'read_bytes': to_read, 'size': size, 'mtime': mtime, **out}
@@ -4073,11 +5533,12 @@ def collect_host_info():
             else:
                 user = 'root'
             
+            sys_info, services = collect_system_info_and_services(user, ip, ssh_key_path)
             info = {
                 'ip': ip,
                 'user': user,
-                'system_info': collect_system_info(user, ip, ssh_key_path),
-                'services': collect_services(user, ip, ssh_key_path)
+                'system_info': sys_info,
+                'services': services
             }
             results.append(info)
         
@@ -4234,8 +5695,7 @@ def rescan_host(host_id):
         # and writes a proper private key file.
         ssh_key_path = _materialize_ssh_key_path(host.ssh_key_id)
 
-        sys_info = collect_system_info(user, ip, ssh_key_path)
-        services = collect_services(user, ip, ssh_key_path)
+        sys_info, services = collect_system_info_and_services(user, ip, ssh_key_path)
 
         # Update host status
         host.status = 'online'
@@ -4322,8 +5782,7 @@ def rescan_all_hosts():
             ssh_key_path = _materialize_ssh_key_path(host.ssh_key_id)
 
             try:
-                sys_info = collect_system_info(user, ip, ssh_key_path)
-                services = collect_services(user, ip, ssh_key_path)
+                sys_info, services = collect_system_info_and_services(user, ip, ssh_key_path)
 
                 host.status = 'online'
                 host.last_seen = datetime.datetime.utcnow()
@@ -4787,6 +6246,7 @@ def restore_database():
             except Exception:
                 pass
 
+        _settings_cache_clear()
         return jsonify({'message': 'Database restored successfully. Please refresh the page.'})
 
     except Exception as e:
@@ -4978,6 +6438,7 @@ def restore_database_selective():
             except Exception:
                 pass
 
+        _settings_cache_clear()
         return jsonify({'message': 'Selective restore complete. Please refresh the page.'})
 
     except Exception as e:
@@ -5106,7 +6567,7 @@ def collect_info_stream(session_id):
                 msg = {'type': 'progress', 'current': i, 'total': len(ips), 'message': 'Collecting info from ' + ip + '...'}
                 yield "data: " + json.dumps(msg) + "\n\n"
                 
-                sys_info = collect_system_info(user, ip, ssh_key_path)
+                sys_info, services = collect_system_info_and_services(user, ip, ssh_key_path)
                 
                 if sys_info.get('os_version'):
                     os_msg = sys_info['os_version'][:80]
@@ -5132,7 +6593,6 @@ def collect_info_stream(session_id):
                     msg = {'type': 'log', 'ip': ip, 'message': cpu_msg, 'timestamp': timestamp}
                     yield "data: " + json.dumps(msg) + "\n\n"
                 
-                services = collect_services(user, ip, ssh_key_path)
                 running_count = sum(1 for s in services if s.get('is_running'))
                 svc_msg = 'Services: {} total, {} running'.format(len(services), running_count)
                 msg = {'type': 'log', 'ip': ip, 'message': svc_msg, 'timestamp': timestamp}
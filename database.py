@@ -277,6 +277,156 @@ class ScheduleSource(db.Model):
         }
 
 
+class ScheduleRun(db.Model):
+    """One execution of a schedule (manual or scheduled) with overall timings."""
+    __tablename__ = 'schedule_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, nullable=False, index=True)  # kept after a schedule is deleted
+    schedule_name = db.Column(db.String(255), nullable=True)
+    reason = db.Column(db.String(16), nullable=False, default='scheduled')  # scheduled|manual
+    provider = db.Column(db.String(32), nullable=True)
+    model = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(16), nullable=False, default='running')  # running|success|error|skipped
+    error = db.Column(db.Text, nullable=True)
+
+    queued_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    queue_wait_ms = db.Column(db.Integer, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    source_count = db.Column(db.Integer, default=0)
+
+    sources = db.relationship('ScheduleRunSource', backref='run', cascade='all, delete-orphan', order_by='ScheduleRunSource.id')
+
+    def to_dict(self, include_children=False):
+        d = {
+            'id': self.id,
+            'schedule_id': self.schedule_id,
+            'schedule_name': self.schedule_name,
+            'reason': self.reason,
+            'provider': self.provider,
+            'model': self.model,
+            'status': self.status,
+            'error': self.error,
+            'queued_at': self.queued_at.isoformat() if self.queued_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'queue_wait_ms': self.queue_wait_ms,
+            'duration_ms': self.duration_ms,
+            'source_count': self.source_count,
+        }
+        if include_children:
+            d['sources'] = [s.to_dict() for s in self.sources]
+        return d
+
+
+class ScheduleRunSource(db.Model):
+    """Per-source stage timings for a ScheduleRun."""
+    __tablename__ = 'schedule_run_sources'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('schedule_runs.id'), nullable=False, index=True)
+    host_id = db.Column(db.String(64), nullable=False, index=True)
+    source_type = db.Column(db.String(16), nullable=False)
+    source_name = db.Column(db.String(512), nullable=False)
+    provider = db.Column(db.String(32), nullable=True, index=True)
+    model = db.Column(db.String(255), nullable=True)
+    outcome = db.Column(db.String(16), nullable=False, default='ok')  # ok|alert|empty|skipped|error
+    error = db.Column(db.Text, nullable=True)
+
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    fetch_ms = db.Column(db.Integer, nullable=True)
+    bytes_fetched = db.Column(db.Integer, nullable=True)
+    bytes_condensed = db.Column(db.Integer, nullable=True)
+    chunk_count = db.Column(db.Integer, nullable=True)
+    tokens_estimated = db.Column(db.Integer, nullable=True)
+    llm_ms = db.Column(db.Integer, nullable=True)  # wall time of map + reduce
+    llm_chunk_ms_json = db.Column(db.Text, nullable=True)  # JSON list, one entry per chunk
+    reduce_ms = db.Column(db.Integer, nullable=True)
+    discord_ms = db.Column(db.Integer, nullable=True)
+    total_ms = db.Column(db.Integer, nullable=True)
+
+    def llm_chunk_ms(self):
+        try:
+            return json.loads(self.llm_chunk_ms_json or '[]')
+        except Exception:
+            return []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'host_id': self.host_id,
+            'type': self.source_type,
+            'name': self.source_name,
+            'provider': self.provider,
+            'model': self.model,
+            'outcome': self.outcome,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'fetch_ms': self.fetch_ms,
+            'bytes_fetched': self.bytes_fetched,
+            'bytes_condensed': self.bytes_condensed,
+            'chunk_count': self.chunk_count,
+            'tokens_estimated': self.tokens_estimated,
+            'llm_ms': self.llm_ms,
+            'llm_chunk_ms': self.llm_chunk_ms(),
+            'reduce_ms': self.reduce_ms,
+            'discord_ms': self.discord_ms,
+            'total_ms': self.total_ms,
+        }
+
+
+class SourceBaseline(db.Model):
+    """Anomaly-gate baseline of one scheduled source (see analysis.baseline).
+
+    Keyed by schedule and source rather than ScheduleSource.id, which changes
+    every time the schedule is saved.
+    """
+    __tablename__ = 'source_baselines'
+    __table_args__ = (db.UniqueConstraint('schedule_id', 'host_id', 'source_type', 'source_name'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, nullable=False, index=True)
+    host_id = db.Column(db.String(64), nullable=False)
+    source_type = db.Column(db.String(16), nullable=False)
+    source_name = db.Column(db.String(512), nullable=False)
+    state_json = db.Column(db.Text, nullable=False, default='{}')
+    runs = db.Column(db.Integer, default=0)       # windows that had new lines
+    skipped = db.Column(db.Integer, default=0)    # runs answered with a local summary
+    last_verdict_json = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def state(self):
+        try:
+            return json.loads(self.state_json or '{}')
+        except Exception:
+            return {}
+
+    def last_verdict(self):
+        try:
+            return json.loads(self.last_verdict_json or 'null')
+        except Exception:
+            return None
+
+    def to_dict(self):
+        state = self.state()
+        return {
+            'schedule_id': self.schedule_id,
+            'host_id': self.host_id,
+            'type': self.source_type,
+            'name': self.source_name,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'metrics': state.get('metrics', {}),
+            'known_templates': len(state.get('known') or []),
+            'consecutive_skips': state.get('skips', 0),
+            'last_verdict': self.last_verdict(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
 # -----------------------------
 # Suricata (remote sensor) data
 # -----------------------------
@@ -534,3 +684,37 @@ class HostDockerInventory(db.Model):
             'captured_at': self.captured_at.isoformat() if self.captured_at else None,
             'inventory': self.inventory(),
         }
+
+
+class HostSourceInventory(db.Model):
+    '''Last scanned log sources of one host (config host id, db-<id> or local).'''
+    __tablename__ = 'host_source_inventory'
+
+    host_key = db.Column(db.String(255), primary_key=True)
+    host_name = db.Column(db.String(255), nullable=True)
+    sources_json = db.Column(db.Text, nullable=False, default='[]')
+    fetched_at = db.Column(db.DateTime, nullable=True)           # last successful scan
+    error = db.Column(db.Text, nullable=True)                    # error of the last scan, if it failed
+    refresh_started_at = db.Column(db.DateTime, nullable=True)   # set while a worker is rescanning
+
+    def sources(self):
+        try:
+            return json.loads(self.sources_json or '[]')
+        except Exception:
+            return []
+
+    def age_seconds(self):
+        if not self.fetched_at:
+            return None
+        return max(0.0, (datetime.utcnow() - self.fetched_at).total_seconds())
+
+    def to_dict(self):
+        return {
+            'host_id': self.host_key,
+            'host_name': self.host_name,
+            'source_count': len(self.sources()),
+            'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
+            'age_seconds': self.age_seconds(),
+            'error': self.error,
+            'refreshing': self.refresh_started_at is not None,
+        }
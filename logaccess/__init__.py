@@ -0,0 +1,7 @@
+"""Remote log access (modular bolt-on).
+
+Readers that fetch windows of log files and journal units from a host
+through a command runner, instead of pulling whole sources over SSH.
+"""
+
+from .paging import Page, read_file_page, read_journal_page  # noqa: F401
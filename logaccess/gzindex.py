@@ -0,0 +1,346 @@
+"""Random access into gzip-rotated archives (zran-style access points).
+
+Reading the tail or a middle page of a ``.gz`` log otherwise means running
+``zcat`` over the whole archive. Rotated archives never change, so an index
+is built once per (host, path, inode, size): the compressed file is fetched
+in ``BUILD_FETCH_BYTES`` ranges and streamed through zlib here, and every
+``span`` bytes of output the decompressor state is saved as an access point,
+together with the line count and the first timestamp after it.
+
+A read starts from the nearest access point: only the compressed bytes from
+that point on are fetched (``tail -c +N | head -c M``) and inflated, so a
+page costs about one span of decompression. Every fetch re-checks inode and
+size; an archive that changed raises ``StaleArchive`` and the caller falls
+back to ``zcat``.
+
+Access points hold live zlib state (tens of KB each), so indexes live in
+memory only and the cache is bounded by its total number of points.
+"""
+
+from __future__ import annotations
+
+import bisect
+import shlex
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .paging import Page
+from .timestamps import line_time
+
+Runner = Callable[..., Any]
+
+SPAN_BYTES = 1024 * 1024            # decompressed bytes between access points
+MAX_POINTS = 256                    # per index; each holds a zlib state copy of ~40 KB
+MAX_CACHED_POINTS = 2048            # across all cached indexes
+BUILD_CHUNK = 64 * 1024
+BUILD_FETCH_BYTES = 8 * 1024 * 1024 # compressed bytes fetched per round trip while building
+FETCH_BYTES = 128 * 1024            # first compressed fetch of a read; doubles up to MAX_FETCH_BYTES
+MAX_FETCH_BYTES = 4 * 1024 * 1024
+MIN_ARCHIVE_BYTES = 256 * 1024      # smaller archives are cheap enough to zcat
+MAX_ARCHIVE_BYTES = 256 * 1024 * 1024
+PROBE_BYTES = 64 * 1024             # how far past a point to look for its timestamp
+RETRY_SECONDS = 600
+
+
+class StaleArchive(RuntimeError):
+    """The archive no longer matches the index (rotated over or rewritten)."""
+
+
+def _to_bytes(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def _feed(d, data: bytes):
+    """Inflate data, moving on to the next gzip member when one ends."""
+    if d.eof:
+        d = zlib.decompressobj(wbits=31)
+    out = d.decompress(data)
+    while d.eof and d.unused_data:
+        rest = d.unused_data
+        d = zlib.decompressobj(wbits=31)
+        out += d.decompress(rest)
+    return d, out
+
+
+def _pieces(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """The chunks re-cut to BUILD_CHUNK, so access points land at most that far apart."""
+    for data in chunks:
+        for i in range(0, len(data), BUILD_CHUNK):
+            yield data[i:i + BUILD_CHUNK]
+
+
+@dataclass
+class AccessPoint:
+    in_off: int              # compressed bytes consumed
+    out_off: int             # decompressed bytes produced
+    line: int                # newlines before out_off
+    at_line_start: bool      # out_off begins a line
+    state: Any               # zlib decompressor copy at this point
+    ts: Optional[float] = None
+
+    @property
+    def first_line(self) -> int:
+        """1-based number of the first whole line after the point."""
+        return self.line + 1 if self.at_line_start else self.line + 2
+
+
+class GzIndex:
+    def __init__(self, host: str, path: str, inode: int, size: int):
+        self.host, self.path, self.inode, self.size = host, path, inode, size
+        self.points: List[AccessPoint] = []
+        self.lines = 0
+        self.out_size = 0
+        self.built_at: Optional[float] = None
+        self.build_ms = 0
+
+    @classmethod
+    def build(cls, host: str, path: str, inode: int, size: int, chunks: Iterable[bytes], isize: int = 0) -> 'GzIndex':
+        """Index the archive from its compressed bytes, in order; isize is the gzip trailer's size hint."""
+        started = time.perf_counter()
+        idx = cls(host, path, inode, size)
+        span = max(SPAN_BYTES, isize // MAX_POINTS)
+        d = zlib.decompressobj(wbits=31)
+        idx.points.append(AccessPoint(0, 0, 0, True, d.copy()))
+        out_off = lines = 0
+        last_byte = b'\n'
+        probing: Optional[AccessPoint] = idx.points[0]
+        probe = b'\n'
+        pos = 0
+        for piece in _pieces(chunks):
+            pos += len(piece)
+            d, out = _feed(d, piece)
+            if not out:
+                continue
+            if probing is not None:
+                probe += out
+                for raw in probe.split(b'\n')[1:-1]:
+                    ts = line_time(raw.decode('utf-8', 'replace'))
+                    if ts is not None:
+                        probing.ts, probing = ts, None
+                        break
+                if probing is not None and len(probe) > PROBE_BYTES:
+                    probing = None
+            lines += out.count(b'\n')
+            out_off += len(out)
+            last_byte = out[-1:]
+            if out_off - idx.points[-1].out_off >= span:
+                probing = AccessPoint(pos, out_off, lines, last_byte == b'\n', d.copy())
+                idx.points.append(probing)
+                probe = b''
+        idx.out_size = out_off
+        idx.lines = lines + (1 if out_off and last_byte != b'\n' else 0)
+        idx.built_at = time.time()
+        idx.build_ms = int((time.perf_counter() - started) * 1000)
+        return idx
+
+    # --- reading ---
+
+    def _fetch(self, run: Runner, offset: int, length: int, timeout: int) -> bytes:
+        q = shlex.quote(self.path)
+        out = run(f"sudo stat -c '%i %s' {q} && sudo tail -c +{offset + 1} {q} | head -c {length}", timeout).stdout or ''
+        header, _, data = out.partition('\n')
+        try:
+            inode, size = (int(x) for x in header.split()[:2])
+        except ValueError:
+            raise RuntimeError(f"Unexpected output reading '{self.path}': {header[:200]!r}")
+        if (inode, size) != (self.inode, self.size):
+            raise StaleArchive(f"'{self.path}' changed since it was indexed")
+        return _to_bytes(data)
+
+    def _iter_lines(self, run: Runner, point: AccessPoint, timeout: int) -> Iterator[Tuple[int, str]]:
+        """(line number, text) of every whole line after point."""
+        d = point.state.copy()
+        offset, want = point.in_off, FETCH_BYTES
+        number = point.line + 1
+        skip = not point.at_line_start
+        pending = b''
+        while offset < self.size:
+            data = self._fetch(run, offset, min(want, self.size - offset), timeout)
+            if not data:
+                break
+            offset += len(data)
+            want = min(MAX_FETCH_BYTES, want * 2)
+            d, out = _feed(d, data)
+            pieces = (pending + out).split(b'\n')
+            pending = pieces.pop()
+            for raw in pieces:
+                if skip:
+                    skip = False
+                else:
+                    yield number, raw.decode('utf-8', 'surrogateescape')
+                number += 1
+        if pending and not skip:
+            yield number, pending.decode('utf-8', 'surrogateescape')
+
+    def _point_for_line(self, line: int) -> AccessPoint:
+        firsts = [p.first_line for p in self.points]
+        return self.points[max(0, bisect.bisect_right(firsts, line) - 1)]
+
+    def read_lines(self, run: Runner, first: int, count: int, timeout: int = 30) -> List[str]:
+        """Lines first .. first + count - 1 (1-based)."""
+        out: List[str] = []
+        if count <= 0:
+            return out
+        for number, text in self._iter_lines(run, self._point_for_line(first), timeout):
+            if number >= first:
+                out.append(text)
+                if len(out) >= count:
+                    break
+        return out
+
+    def page(self, run: Runner, line: Optional[int], direction: str, n: int, timeout: int = 30) -> Page:
+        """Same pages and ``l<line>`` cursors as a zcat read, from the nearest access point."""
+        total = self.lines
+        if line is None:
+            first = max(1, total - n + 1)
+            lines = self.read_lines(run, first, total - first + 1, timeout) if total else []
+            return Page(lines=lines, prev_cursor=f"l{first}" if first > 1 else None, next_cursor=f"l{total + 1}",
+                        has_next=False, start=first, end=total + 1, size=total, unit='lines')
+        if direction == 'after':
+            first = max(1, line)
+            last = min(total, first + n - 1)
+        else:
+            last = min(total, line - 1)
+            first = max(1, last - n + 1)
+        if last < first:
+            return Page(prev_cursor=f"l{first}" if first > 1 else None, next_cursor=f"l{first}",
+                        has_next=False, start=first, end=first, size=total, unit='lines')
+        lines = self.read_lines(run, first, last - first + 1, timeout)
+        end = first + len(lines)
+        return Page(lines=lines, prev_cursor=f"l{first}" if first > 1 else None, next_cursor=f"l{end}",
+                    has_next=end <= total, start=first, end=end, size=total, unit='lines')
+
+    def window_page(self, run: Runner, since: Optional[float], until: Optional[float], n: int = 500,
+                    timeout: int = 30) -> Page:
+        """First n lines stamped within [since, until], starting at the last point stamped before since."""
+        point = self.points[0]
+        if since is not None:
+            for p in self.points:
+                # A point stamped exactly since may follow earlier lines of that second
+                if p.ts is not None and p.ts >= since:
+                    break
+                if p.ts is not None:
+                    point = p
+        out: List[Tuple[int, str]] = []
+        current: Optional[float] = None
+        more = False
+        for number, text in self._iter_lines(run, point, timeout):
+            current = line_time(text) or current
+            if current is None or (since is not None and current < since):
+                continue
+            if until is not None and current > until:
+                break
+            if len(out) >= n:
+                more = True
+                break
+            out.append((number, text))
+        first = out[0][0] if out else None
+        end = out[-1][0] + 1 if out else None
+        return Page(lines=[t for _, t in out], prev_cursor=f"l{first}" if first and first > 1 else None,
+                    next_cursor=f"l{end}" if end else None, has_next=more, start=first, end=end,
+                    size=self.lines, unit='lines')
+
+    def status(self) -> dict:
+        return {
+            'host': self.host, 'path': self.path, 'inode': self.inode, 'size': self.size,
+            'points': len(self.points), 'lines': self.lines, 'uncompressed_bytes': self.out_size,
+            'built_at': self.built_at, 'build_ms': self.build_ms,
+        }
+
+
+def build_index(run: Runner, host: str, path: str, timeout: int = 300) -> Optional[GzIndex]:
+    """Stream the archive once and index it; None when it is too small or too large to be worth it.
+
+    The archive is fetched in BUILD_FETCH_BYTES ranges, each checked against
+    the inode and size seen first, so at most one range is held in memory.
+    """
+    q = shlex.quote(path)
+    # The last 4 bytes are the gzip ISIZE trailer (uncompressed size mod 2**32), used to size the span
+    out = run(f"sudo stat -c '%i %s' {q} && sudo tail -c 4 {q} | od -An -tu1", 30).stdout or ''
+    try:
+        header, _, trailer = out.partition('\n')
+        inode, size = (int(x) for x in header.split()[:2])
+        isize = int.from_bytes(bytes(int(b) for b in trailer.split()), 'little')
+    except ValueError:
+        raise RuntimeError(f"Unexpected output reading '{path}': {out[:200]!r}")
+    if not MIN_ARCHIVE_BYTES <= size <= MAX_ARCHIVE_BYTES:
+        return None
+    probe = GzIndex(host, path, inode, size)
+    deadline = time.monotonic() + timeout
+
+    def chunks():
+        for offset in range(0, size, BUILD_FETCH_BYTES):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"Indexing '{path}' timed out after {timeout}s")
+            data = probe._fetch(run, offset, min(BUILD_FETCH_BYTES, size - offset), max(1, int(remaining)))
+            if len(data) != min(BUILD_FETCH_BYTES, size - offset):
+                raise StaleArchive(f"'{path}' changed while it was indexed")
+            yield data
+
+    return GzIndex.build(host, path, inode, size, chunks(), isize)
+
+
+class GzIndexCache:
+    """Built indexes per (host, path), LRU-bounded by count and total access points, with at most one
+    background build per archive.
+
+    Indexes are keyed internally by (host, path, inode, size): a rotated or
+    rewritten archive is noticed on the next read and dropped.
+    """
+
+    def __init__(self, max_entries: int = 32, max_points: int = MAX_CACHED_POINTS):
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str], GzIndex]' = OrderedDict()
+        self._building: set = set()
+        self._skipped: dict = {}   # (host, path) -> time a build found nothing worth indexing or failed
+
+    def lookup(self, host: str, path: str) -> Optional[GzIndex]:
+        with self._lock:
+            idx = self._entries.pop((host, path), None)
+            if idx is not None:
+                self._entries[(host, path)] = idx
+            return idx
+
+    def drop(self, host: str, path: str):
+        with self._lock:
+            self._entries.pop((host, path), None)
+
+    def ensure(self, host: str, path: str, build: Callable[[], Optional[GzIndex]]):
+        """Start build() in the background unless the archive is indexed, being indexed or recently skipped."""
+        key = (host, path)
+        with self._lock:
+            if key in self._entries or key in self._building:
+                return
+            if time.time() - self._skipped.get(key, 0) < RETRY_SECONDS:
+                return
+            self._building.add(key)
+        threading.Thread(target=self._build, args=(key, build), name='gz-index', daemon=True).start()
+
+    def _build(self, key: Tuple[str, str], build: Callable[[], Optional[GzIndex]]):
+        idx = None
+        try:
+            idx = build()
+        except Exception as e:
+            print(f"[WARN] Could not index archive {key[1]} on {key[0]}: {e}")
+        with self._lock:
+            self._building.discard(key)
+            if idx is None:
+                self._skipped[key] = time.time()
+                return
+            self._entries[key] = idx
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or
+                                              sum(len(i.points) for i in self._entries.values()) > self.max_points):
+                self._entries.popitem(last=False)
+        print(f"[INFO] Indexed archive {key[1]} on {key[0]}: {len(idx.points)} access points in {idx.build_ms} ms")
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [idx.status() for idx in self._entries.values()] + \
+                   [{'host': h, 'path': p, 'building': True} for h, p in self._building]
@@ -0,0 +1,353 @@
+"""Client for the remote helper agent (``remote_helper.py``).
+
+Instead of one SSH round trip per ``ls``/``stat``/``grep``/``tail``, a batch
+of typed requests goes to a small Python helper on the host and comes back
+as framed JSON, with the requests run in parallel there.
+
+The helper is pushed over the host's usual SSH connection the first time it
+is needed and installed root-owned to ``/usr/local/lib/ailog/helper-<hash>.py``
+(a changed script gets a new name). It runs under sudo, so the install checks
+the sha256 of the root-owned copy before moving it into place, and an existing
+copy is only reused if its sha256 still matches. It then runs either
+
+  oneshot   one ``ssh`` per batch: the batch on stdin, frames on stdout
+  session   one long-lived ``ssh`` per host; batches are multiplexed over its
+            stdin/stdout by batch id and the session is closed after
+            ``idle_seconds`` without use
+
+Hosts where the helper cannot start (no python3, install failed) are
+remembered for ``RETRY_SECONDS`` and callers fall back to plain commands.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'remote_helper.py')
+REMOTE_DIR = '/usr/local/lib/ailog'
+MODES = ('off', 'oneshot', 'session')
+RETRY_SECONDS = 600
+START_TIMEOUT = 20
+
+ArgvFor = Callable[[str, str], Tuple[List[str], bool]]   # (host, command_str) -> (args, shell)
+
+
+class HelperError(RuntimeError):
+    """A helper request failed."""
+
+
+class HelperUnavailable(HelperError):
+    """The helper could not be installed or started on the host."""
+
+
+_script_cache: Dict[str, Any] = {}
+
+
+def script() -> bytes:
+    if 'data' not in _script_cache:
+        with open(SCRIPT_PATH, 'rb') as f:
+            _script_cache['data'] = f.read()
+        _script_cache['sha256'] = hashlib.sha256(_script_cache['data']).hexdigest()
+    return _script_cache['data']
+
+
+def script_sha256() -> str:
+    script()
+    return _script_cache['sha256']
+
+
+def script_id() -> str:
+    return script_sha256()[:12]
+
+
+def remote_path() -> str:
+    return f"{REMOTE_DIR}/helper-{script_id()}.py"
+
+
+@dataclass
+class Response:
+    id: int
+    ok: bool
+    result: Any = None
+    error: Optional[str] = None
+
+    def value(self) -> Any:
+        if not self.ok:
+            raise HelperError(self.error or 'Helper request failed')
+        return self.result
+
+
+def _frames(requests: List[Dict[str, Any]], batch_id: int) -> bytes:
+    body = [{'id': i, 'op': r['op'], 'args': {k: v for k, v in r.items() if k != 'op'}} for i, r in enumerate(requests)]
+    return (json.dumps({'batch': batch_id, 'requests': body}) + '\n').encode('utf-8', 'surrogateescape')
+
+
+def _collect(frames, count: int) -> List[Response]:
+    """Responses in request order from an iterable of frames; missing ones become errors."""
+    out: List[Optional[Response]] = [None] * count
+    for frame in frames:
+        if frame.get('done'):
+            break
+        i = frame.get('id')
+        if isinstance(i, int) and 0 <= i < count:
+            out[i] = Response(i, bool(frame.get('ok')), frame.get('result'), frame.get('error'))
+    return [r or Response(i, False, error='No response from helper') for i, r in enumerate(out)]
+
+
+class _Session:
+    """One long-lived helper process; concurrent batches are told apart by batch id."""
+
+    def __init__(self, host: str, args: List[str], shell: bool):
+        self.host = host
+        self.proc = subprocess.Popen(args, shell=shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE)
+        self.started_at = self.last_used = time.time()
+        self.batches = self.requests = 0
+        self.version: Optional[int] = None
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._waiting: Dict[int, Queue] = {}
+        self._hello = threading.Event()
+        self._stderr: deque = deque(maxlen=20)
+        threading.Thread(target=self._read, name=f"helper-{host}", daemon=True).start()
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+
+    def _read(self):
+        for raw in self.proc.stdout:
+            try:
+                frame = json.loads(raw.decode('utf-8', 'surrogateescape'))
+            except ValueError:
+                continue
+            if frame.get('hello'):
+                self.version = frame.get('version')
+                self._hello.set()
+                continue
+            with self._lock:
+                q = self._waiting.get(frame.get('batch'))
+            if q is not None:
+                q.put(frame)
+        self.closed = True
+        self._hello.set()
+        with self._lock:
+            for q in self._waiting.values():
+                q.put(None)
+
+    def _drain_stderr(self):
+        for raw in self.proc.stderr:
+            self._stderr.append(raw.decode('utf-8', 'replace').rstrip())
+
+    @property
+    def alive(self) -> bool:
+        return not self.closed and self.proc.poll() is None
+
+    def stderr(self) -> str:
+        return '\n'.join(self._stderr)
+
+    def wait_ready(self, timeout: float):
+        if not self._hello.wait(timeout) or self.version is None:
+            self.close()
+            raise HelperUnavailable(f"Helper did not start on {self.host}: {self.stderr() or 'no response'}")
+
+    def request(self, requests: List[Dict[str, Any]], timeout: float) -> List[Response]:
+        batch_id = next(self._ids)
+        q: Queue = Queue()
+        with self._lock:
+            self._waiting[batch_id] = q
+        try:
+            try:
+                with self._write_lock:
+                    self.proc.stdin.write(_frames(requests, batch_id))
+                    self.proc.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self.closed = True
+                raise HelperError(f"Helper session on {self.host} is gone: {e}")
+            deadline = time.monotonic() + timeout
+
+            def frames():
+                while True:
+                    try:
+                        frame = q.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except Empty:
+                        raise HelperError(f"Helper on {self.host} timed out after {timeout}s")
+                    if frame is None:
+                        raise HelperError(f"Helper session on {self.host} closed: {self.stderr() or 'no error output'}")
+                    yield frame
+
+            responses = _collect(frames(), len(requests))
+        finally:
+            with self._lock:
+                self._waiting.pop(batch_id, None)
+        self.last_used = time.time()
+        self.batches += 1
+        self.requests += len(requests)
+        return responses
+
+    def close(self):
+        self.closed = True
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def status(self) -> Dict[str, Any]:
+        return {'alive': self.alive, 'pid': self.proc.pid, 'version': self.version, 'started_at': self.started_at,
+                'last_used': self.last_used, 'batches': self.batches, 'requests': self.requests}
+
+
+class HelperClient:
+    def __init__(self, argv_for: ArgvFor, mode: str = 'session', workers: int = 4, idle_seconds: float = 300,
+                 install_timeout: int = 30):
+        self.argv_for = argv_for
+        self.mode = mode if mode in MODES else 'off'
+        self.workers = workers
+        self.idle_seconds = idle_seconds
+        self.install_timeout = install_timeout
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._sessions: Dict[str, _Session] = {}
+        self._installed: set = set()
+        self._failed: Dict[str, Tuple[float, str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def _host_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+    def _command(self, host: str) -> str:
+        path = SCRIPT_PATH if host == 'local' else remote_path()
+        return f"sudo python3 {shlex.quote(path)} --workers {int(self.workers)}"
+
+    def _install(self, host: str):
+        if host == 'local' or host in self._installed:
+            return
+        target = shlex.quote(remote_path())
+        check = f"echo {shlex.quote(script_sha256())}' '"
+        # The pushed bytes are copied root-owned to a unique staging name and verified there, so nothing the
+        # SSH user can write is run and concurrent installers do not step on each other
+        cmd = (f'command -v python3 >/dev/null || {{ echo "python3 not found" >&2; exit 3; }}; '
+               f'{check}{target} | sudo sha256sum -c --status 2>/dev/null && exit 0; '
+               f'sudo mkdir -p {shlex.quote(REMOTE_DIR)} && staged=$(sudo mktemp {target}.XXXXXX) || exit 5; '
+               f'tmp=$(mktemp) && cat > "$tmp" && sudo install -m 0644 -o root -g root "$tmp" "$staged"; '
+               f'rc=$?; rm -f "$tmp"; [ $rc -eq 0 ] || {{ sudo rm -f "$staged"; exit $rc; }}; '
+               f'if {check}"$staged" | sudo sha256sum -c --status; then sudo mv -f "$staged" {target}; '
+               f'else sudo rm -f "$staged"; echo "helper checksum mismatch after upload" >&2; exit 4; fi')
+        args, shell = self.argv_for(host, cmd)
+        try:
+            res = subprocess.run(args, shell=shell, input=script(), capture_output=True, timeout=self.install_timeout)
+        except subprocess.TimeoutExpired:
+            raise HelperUnavailable(f"Installing the helper on {host} timed out")
+        if res.returncode != 0:
+            raise HelperUnavailable(f"Could not install the helper on {host}: "
+                                    f"{res.stderr.decode('utf-8', 'replace').strip() or res.returncode}")
+        self._installed.add(host)
+
+    def _session(self, host: str) -> _Session:
+        with self._host_lock(host):
+            session = self._sessions.get(host)
+            if session is not None and session.alive:
+                return session
+            self._install(host)
+            args, shell = self.argv_for(host, self._command(host))
+            session = _Session(host, args, shell)
+            session.wait_ready(START_TIMEOUT)
+            with self._lock:
+                self._sessions[host] = session
+            return session
+
+    def _oneshot(self, host: str, requests: List[Dict[str, Any]], timeout: float) -> List[Response]:
+        with self._host_lock(host):
+            self._install(host)
+        args, shell = self.argv_for(host, self._command(host))
+        try:
+            res = subprocess.run(args, shell=shell, input=_frames(requests, 1), capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise HelperError(f"Helper on {host} timed out after {timeout}s")
+        frames = []
+        for raw in res.stdout.splitlines():
+            try:
+                frames.append(json.loads(raw.decode('utf-8', 'surrogateescape')))
+            except ValueError:
+                continue
+        if not any(f.get('hello') for f in frames):
+            raise HelperUnavailable(f"Helper did not start on {host}: "
+                                    f"{res.stderr.decode('utf-8', 'replace').strip() or res.returncode}")
+        return _collect((f for f in frames if not f.get('hello')), len(requests))
+
+    def available(self, host: str) -> bool:
+        failed = self._failed.get(host)
+        return self.enabled and (failed is None or time.time() - failed[0] >= RETRY_SECONDS)
+
+    def batch(self, host: str, requests: List[Dict[str, Any]], timeout: float = 60) -> List[Response]:
+        """Run [{'op': ..., **args}] on host in one round trip; responses come back in request order."""
+        if not self.enabled:
+            raise HelperUnavailable('Remote helper is disabled')
+        if not self.available(host):
+            raise HelperUnavailable(f"Helper unavailable on {host}: {self._failed[host][1]}")
+        self.reap()
+        try:
+            if self.mode == 'oneshot':
+                return self._oneshot(host, requests, timeout)
+            try:
+                return self._session(host).request(requests, timeout)
+            except HelperError as e:
+                if isinstance(e, HelperUnavailable) or 'timed out' in str(e):
+                    raise
+                # The session died (host rebooted, ssh dropped): one retry on a fresh one
+                self.close(host)
+                return self._session(host).request(requests, timeout)
+        except HelperUnavailable as e:
+            self._failed[host] = (time.time(), str(e)[:300])
+            self._installed.discard(host)
+            raise
+
+    def call(self, host: str, op: str, timeout: float = 60, **args) -> Any:
+        return self.batch(host, [dict(args, op=op)], timeout=timeout)[0].value()
+
+    def reap(self):
+        """Close sessions idle for longer than idle_seconds."""
+        now = time.time()
+        with self._lock:
+            idle = [h for h, s in self._sessions.items() if not s.alive or now - s.last_used > self.idle_seconds]
+            sessions = [self._sessions.pop(h) for h in idle]
+        for session in sessions:
+            session.close()
+
+    def close(self, host: Optional[str] = None):
+        with self._lock:
+            hosts = list(self._sessions) if host is None else [host]
+            sessions = [self._sessions.pop(h) for h in hosts if h in self._sessions]
+            if host is None:
+                self._failed.clear()
+            else:
+                self._failed.pop(host, None)
+        for session in sessions:
+            session.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = {h: s.status() for h, s in self._sessions.items()}
+        return {
+            'mode': self.mode, 'script_id': script_id(), 'workers': self.workers, 'idle_seconds': self.idle_seconds,
+            'sessions': sessions, 'installed': sorted(self._installed),
+            'unavailable': {h: {'since': t, 'error': e} for h, (t, e) in self._failed.items()},
+        }
@@ -0,0 +1,268 @@
+"""Per-minute line counts by severity for a log source.
+
+Counting never ships log lines here. For a plain file an awk pass runs on
+the host over just the byte range that can hold the window (see
+``timeindex``), ``.gz`` archives are streamed through ``zcat``, and journal
+units are read as ``-o json --output-fields=PRIORITY``; each returns one
+``minute  level  count`` row per bucket. A fresh local mirror is counted in
+place instead.
+
+Severity is the journal priority for journal entries and a keyword match
+for file lines; the keyword patterns are shared by the awk and Python
+classifiers so both paths count the same way.
+
+``HistogramCache`` keeps the completed minutes of every (host, kind, source)
+it has counted, so a sliding "last hour" view only fetches the minutes that
+are new since the previous request. A minute only counts as completed once it
+is ``SETTLE_SECONDS`` old, so late writes and host clock skew are picked up.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .timestamps import line_time
+
+Runner = Callable[..., Any]
+Buckets = Dict[int, Dict[str, int]]      # minute start (epoch) -> level -> count
+
+LEVELS = ('critical', 'error', 'warning', 'info', 'debug')
+STEP = 60
+MAX_MINUTES = 7 * 24 * 60
+RETAIN_SECONDS = 8 * 24 * 3600
+SETTLE_SECONDS = 2 * STEP            # minutes this recent are recounted: clock skew, buffered syslog, journald flushes
+
+# Checked in order on the lowercased line; anything else is info
+LEVEL_KEYWORDS = (
+    ('critical', 'emerg|emergency|alert|crit|critical|fatal|panic'),
+    ('error', 'err|error|errors|fail|failed|failure|exception|traceback'),
+    ('warning', 'warn|warning|warnings'),
+    ('debug', 'debug|trace'),
+)
+_WORD = '(^|[^a-z])({})([^a-z]|$)'
+_LEVEL_RES = [(level, re.compile(_WORD.format(words))) for level, words in LEVEL_KEYWORDS]
+
+# The minute a line belongs to, as a stamp line_time() parses, carried over to unstamped lines
+_AWK_FILE = r'''
+{
+  if (match($0, /^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) +[0-9]+ [0-9][0-9]:[0-9][0-9]/)) {
+    key = substr($0, RSTART, RLENGTH) ":00"
+  } else if (match($0, /[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9][T ][0-9][0-9]:[0-9][0-9]:[0-9][0-9](\.[0-9]+)?(Z|[+-][0-9][0-9]:?[0-9][0-9])?/)) {
+    s = substr($0, RSTART, RLENGTH); z = ""
+    if (match(s, /(Z|[+-][0-9][0-9]:?[0-9][0-9])$/)) z = substr(s, RSTART)
+    key = substr(s, 1, 16) ":00" z
+  }
+  if (key == "") next
+  l = tolower($0)
+  if (l ~ re_critical) v = "critical"
+  else if (l ~ re_error) v = "error"
+  else if (l ~ re_warning) v = "warning"
+  else if (l ~ re_debug) v = "debug"
+  else v = "info"
+  n[key "\t" v]++
+}
+END { for (k in n) print k "\t" n[k] }
+'''
+
+_AWK_JOURNAL = r'''
+{
+  if (!match($0, /"__REALTIME_TIMESTAMP":"[0-9]+"/)) next
+  m = int(substr($0, RSTART + 24, RLENGTH - 25) / 60000000) * 60
+  p = "6"
+  if (match($0, /"PRIORITY":"[0-9]"/)) p = substr($0, RSTART + 12, 1)
+  n[sprintf("%.0f", m) "\t" p]++
+}
+END { for (k in n) print k "\t" n[k] }
+'''
+
+
+def line_level(line: str) -> str:
+    text = line.lower()
+    for level, rx in _LEVEL_RES:
+        if rx.search(text):
+            return level
+    return 'info'
+
+
+def priority_level(priority: Optional[int]) -> str:
+    """Severity of a syslog/journal priority (0 emerg .. 7 debug); unknown counts as info."""
+    if priority is None:
+        return 'info'
+    if priority <= 2:
+        return 'critical'
+    return {3: 'error', 4: 'warning', 7: 'debug'}.get(priority, 'info')
+
+
+def minute(ts: float) -> int:
+    return int(ts // STEP) * STEP
+
+
+def _add(buckets: Buckets, m: int, level: str, n: int = 1):
+    slot = buckets.setdefault(m, {})
+    slot[level] = slot.get(level, 0) + n
+
+
+def count_mirror(src: Any, since: float, until: float) -> Buckets:
+    """Buckets from a ``MirrorSource`` without leaving this machine."""
+    buckets: Buckets = {}
+    for _, ts, line in src.iter_window(since, until):
+        if ts >= until:
+            break
+        if src.kind == 'journal':
+            try:
+                level = priority_level(json.loads(line).get('p'))
+            except ValueError:
+                continue
+        else:
+            level = line_level(line)
+        _add(buckets, minute(ts), level)
+    return buckets
+
+
+def file_command(path: str, byte_range: Optional[Tuple[int, int]] = None) -> str:
+    q = shlex.quote(path)
+    if path.endswith('.gz'):
+        source = f"sudo zcat {q}"
+    elif byte_range is not None:
+        lo, hi = byte_range
+        source = f"sudo tail -c +{lo + 1} {q} | head -c {max(0, hi - lo)}"
+    else:
+        source = f"sudo cat {q}"
+    regexes = ' '.join(f"-v re_{level}={shlex.quote(_WORD.format(words))}" for level, words in LEVEL_KEYWORDS)
+    return f"{source} | LC_ALL=C awk {regexes} {shlex.quote(_AWK_FILE)}"
+
+
+def journal_command(unit: Optional[str], since: float, until: float) -> str:
+    unit_arg = f"-u {shlex.quote(unit)} " if unit else ''
+    return (f"sudo journalctl {unit_arg}--since=@{int(since)} --until=@{int(math.ceil(until))} -o json "
+            f"--output-fields=PRIORITY --no-pager | LC_ALL=C awk {shlex.quote(_AWK_JOURNAL)}")
+
+
+def count_file(run: Runner, path: str, since: float, until: float,
+               byte_range: Optional[Tuple[int, int]] = None, timeout: int = 120) -> Buckets:
+    buckets: Buckets = {}
+    now = time.time()
+    for row in (run(file_command(path, byte_range), timeout).stdout or '').splitlines():
+        parts = row.split('\t')
+        if len(parts) != 3 or parts[1] not in LEVELS:
+            continue
+        ts = line_time(parts[0], now)
+        if ts is None or ts < minute(since) or ts >= until:
+            continue
+        _add(buckets, minute(ts), parts[1], int(parts[2]))
+    return buckets
+
+
+def count_journal(run: Runner, unit: Optional[str], since: float, until: float, timeout: int = 120) -> Buckets:
+    buckets: Buckets = {}
+    for row in (run(journal_command(unit, since, until), timeout).stdout or '').splitlines():
+        parts = row.split('\t')
+        if len(parts) != 3 or not parts[0].isdigit():
+            continue
+        m = int(parts[0])
+        if m < minute(since) or m >= until:
+            continue
+        _add(buckets, m, priority_level(int(parts[1]) if parts[1].isdigit() else None), int(parts[2]))
+    return buckets
+
+
+@dataclass
+class Histogram:
+    since: int                       # first minute (inclusive)
+    until: int                       # end minute (exclusive)
+    buckets: Buckets = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        minutes = list(range(self.since, self.until, STEP))
+        series = {level: [self.buckets.get(m, {}).get(level, 0) for m in minutes] for level in LEVELS}
+        totals = [sum(series[level][i] for level in LEVELS) for i in range(len(minutes))]
+        return {'since': self.since, 'until': self.until, 'step': STEP, 'minutes': minutes, 'levels': list(LEVELS),
+                'series': series, 'total': totals, 'counts': {level: sum(series[level]) for level in LEVELS}}
+
+
+def window(since: float, until: float) -> Tuple[int, int]:
+    """Whole-minute [since, until) bounds, checked against MAX_MINUTES."""
+    lo, hi = minute(since), minute(until) + (STEP if until % STEP else 0)
+    if hi <= lo:
+        raise ValueError('until must be after since')
+    if (hi - lo) // STEP > MAX_MINUTES:
+        raise ValueError(f"Time range is limited to {MAX_MINUTES // 1440} days")
+    return lo, hi
+
+
+@dataclass
+class _Series:
+    lo: int                           # completed minutes [lo, hi) are held in buckets
+    hi: int
+    buckets: Buckets = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    used_at: float = 0.0
+
+
+class HistogramCache:
+    """Completed minutes per (host, kind, source); only missing minutes are counted again."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str, str], _Series]' = OrderedDict()
+
+    def _series(self, key: Tuple[str, str, str], lo: int) -> _Series:
+        with self._lock:
+            series = self._entries.pop(key, None) or _Series(lo, lo)
+            self._entries[key] = series
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return series
+
+    def get(self, key: Tuple[str, str, str], since: float, until: float,
+            count: Callable[[float, float], Buckets]) -> Tuple[Histogram, Dict[str, Any]]:
+        """Histogram for [since, until); count(lo, hi) is called for the minutes not cached yet."""
+        lo, hi = window(since, until)
+        settled = minute(time.time()) - SETTLE_SECONDS
+        series = self._series(key, lo)
+        with series.lock:
+            if lo > series.hi or hi < series.lo:
+                series.lo = series.hi = lo          # disjoint from what is held: start over
+                series.buckets = {}
+            gaps = [(a, b) for a, b in ((lo, min(hi, series.lo)), (max(lo, series.hi), hi)) if a < b]
+            counted = 0
+            fresh: Buckets = {}
+            for a, b in gaps:
+                part = count(a, b)
+                counted += (b - a) // STEP
+                for m, levels in part.items():
+                    fresh.setdefault(m, {}).update(levels)
+            # Only settled minutes are kept; recent ones may still receive lines
+            for m, levels in fresh.items():
+                if m < settled:
+                    series.buckets[m] = levels
+            series.lo = min(series.lo, lo)
+            series.hi = max(series.hi, min(hi, settled))
+            cutoff = minute(time.time() - RETAIN_SECONDS)
+            if series.lo < cutoff:
+                series.buckets = {m: v for m, v in series.buckets.items() if m >= cutoff}
+                series.lo = max(series.lo, cutoff)
+            buckets = {m: v for m, v in series.buckets.items() if lo <= m < hi}
+            buckets.update({m: v for m, v in fresh.items() if m >= settled and lo <= m < hi})
+            series.used_at = time.time()
+        return Histogram(lo, hi, buckets), {'counted_minutes': counted, 'cached_minutes': (hi - lo) // STEP - counted}
+
+    def invalidate(self, host: Optional[str] = None):
+        with self._lock:
+            for key in [k for k in self._entries if host is None or k[0] == host]:
+                del self._entries[key]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._entries.items())
+        return [{'host': h, 'kind': k, 'source': s, 'from': v.lo, 'to': v.hi, 'minutes': len(v.buckets),
+                 'used_at': v.used_at} for (h, k, s), v in items]
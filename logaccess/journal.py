@@ -0,0 +1,213 @@
+"""Structured journal access on top of ``journalctl -o json``.
+
+Filters (unit, time window, priority, field matches, message grep) are turned
+into journalctl arguments so the remote side does the selection and only
+matching entries cross the wire; ``--output-fields`` trims each entry to the
+fields a ``JournalRecord`` needs (hosts whose journalctl predates it get the
+full entry).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import shlex
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+PRIORITY_NAMES = ('emerg', 'alert', 'crit', 'err', 'warning', 'notice', 'info', 'debug')
+
+# Fields kept by --output-fields; __CURSOR and __REALTIME_TIMESTAMP are always included
+RECORD_FIELDS = ('PRIORITY', 'MESSAGE', 'SYSLOG_IDENTIFIER', '_COMM', 'SYSLOG_PID', '_PID',
+                 '_HOSTNAME', '_SYSTEMD_UNIT')
+
+_FIELD_RE = re.compile(r'^[A-Z0-9_]+$')
+_TIME_RE = re.compile(r'^[\w:+\-. @]{1,64}$')
+
+
+def parse_json_lines(text: str) -> List[Dict[str, Any]]:
+    """One journal entry per line; lines that are not JSON objects are skipped."""
+    entries = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line.startswith('{'):
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def message_text(value: Any) -> str:
+    """MESSAGE is a string, or a list of byte values when it is not valid UTF-8."""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        try:
+            return bytes(value).decode('utf-8', 'replace')
+        except (TypeError, ValueError):
+            return ''
+    return str(value)
+
+
+def entry_time(entry: Dict[str, Any]) -> float:
+    """Entry wall-clock time in epoch seconds (0.0 when missing)."""
+    try:
+        return int(entry.get('__REALTIME_TIMESTAMP')) / 1_000_000
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def format_entry(entry: Dict[str, Any]) -> str:
+    """Render an entry the way ``journalctl -o short`` does."""
+    return JournalRecord.from_entry(entry).format_line()
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class JournalRecord:
+    ts: float
+    priority: Optional[int]
+    message: str
+    ident: str = ''
+    pid: Optional[int] = None
+    host: str = ''
+    unit: str = ''
+    cursor: str = ''
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> 'JournalRecord':
+        return cls(
+            ts=entry_time(entry),
+            priority=_int(entry.get('PRIORITY')),
+            message=message_text(entry.get('MESSAGE')),
+            ident=entry.get('SYSLOG_IDENTIFIER') or entry.get('_COMM') or '',
+            pid=_int(entry.get('SYSLOG_PID') or entry.get('_PID')),
+            host=entry.get('_HOSTNAME') or '',
+            unit=entry.get('_SYSTEMD_UNIT') or '',
+            cursor=entry.get('__CURSOR') or '',
+        )
+
+    def format_line(self) -> str:
+        stamp = time.strftime('%b %d %H:%M:%S', time.localtime(self.ts)) if self.ts else '-'
+        ident = self.ident or 'unknown'
+        prefix = f"{ident}[{self.pid}]" if self.pid else ident
+        return f"{stamp} {self.host} {prefix}: {self.message}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form: t (epoch s), p (priority), i (identifier), pid, h (host), u (unit), m, c (cursor)."""
+        d = {'t': round(self.ts, 6), 'p': self.priority, 'i': self.ident, 'pid': self.pid,
+             'h': self.host, 'u': self.unit, 'm': self.message, 'c': self.cursor}
+        return {k: v for k, v in d.items() if v not in (None, '')}
+
+
+def parse_priority(value: Any) -> Optional[str]:
+    """Validate a journalctl -p value: 0-7, a name, or a FROM..TO range of either."""
+    if value is None or value == '':
+        return None
+    s = str(value).strip().lower()
+    for part in s.split('..'):
+        if not (part.isdigit() and 0 <= int(part) <= 7) and part not in PRIORITY_NAMES:
+            raise ValueError(f"Invalid priority: {value!r}")
+    if s.count('..') > 1:
+        raise ValueError(f"Invalid priority: {value!r}")
+    return s
+
+
+@dataclass
+class JournalQuery:
+    unit: Optional[str] = None
+    since: Optional[str] = None          # anything journalctl accepts: "-1h", "2026-01-01 10:00", "today"
+    until: Optional[str] = None
+    priority: Optional[str] = None       # "err", "3", "warning..emerg"
+    matches: Dict[str, List[str]] = field(default_factory=dict)   # FIELD -> values (OR within, AND across)
+    grep: Optional[str] = None           # MESSAGE regex (journalctl -g)
+    case_sensitive: bool = False
+
+    def validate(self) -> 'JournalQuery':
+        for name in ('since', 'until'):
+            v = getattr(self, name)
+            if v and not _TIME_RE.match(v):
+                raise ValueError(f"Invalid {name}: {v!r}")
+        self.priority = parse_priority(self.priority)
+        for k in self.matches:
+            if not _FIELD_RE.match(k):
+                raise ValueError(f"Invalid journal field: {k!r}")
+        return self
+
+    @classmethod
+    def from_args(cls, args, unit: Optional[str] = None) -> 'JournalQuery':
+        """Build from request args: since, until, priority, grep, case_sensitive and repeated match=FIELD=value."""
+        matches: Dict[str, List[str]] = {}
+        for m in args.getlist('match') if hasattr(args, 'getlist') else (args.get('match') or []):
+            k, sep, v = str(m).partition('=')
+            if not sep:
+                raise ValueError(f"Invalid match (expected FIELD=value): {m!r}")
+            matches.setdefault(k.strip().upper(), []).append(v)
+        return cls(
+            unit=unit,
+            since=args.get('since') or None,
+            until=args.get('until') or None,
+            priority=args.get('priority') or None,
+            matches=matches,
+            grep=args.get('grep') or None,
+            case_sensitive=str(args.get('case_sensitive', '')).lower() in ('1', 'true', 'yes'),
+        ).validate()
+
+    def is_filtered(self) -> bool:
+        return bool(self.since or self.until or self.priority or self.matches or self.grep)
+
+    def args(self) -> List[str]:
+        out = []
+        if self.unit:
+            out.append(f"-u {shlex.quote(self.unit)}")
+        if self.since:
+            out.append(f"--since={shlex.quote(self.since)}")
+        if self.until:
+            out.append(f"--until={shlex.quote(self.until)}")
+        if self.priority:
+            out.append(f"-p {shlex.quote(self.priority)}")
+        if self.grep:
+            out.append(f"-g {shlex.quote(self.grep)}")
+            out.append('--case-sensitive=yes' if self.case_sensitive else '--case-sensitive=no')
+        for k, values in self.matches.items():
+            out.extend(shlex.quote(f"{k}={v}") for v in values)
+        return out
+
+
+def journal_command(query: JournalQuery, extra: str = '', compact: bool = True) -> str:
+    """journalctl command for query with JSON output; extra is appended verbatim (e.g. "-n 500", "-r")."""
+    parts = ['sudo journalctl', *query.args(), '-o json', '--no-pager']
+    if compact:
+        parts.append('--output-fields=' + ','.join(RECORD_FIELDS))
+    if extra:
+        parts.append(extra)
+    return ' '.join(parts)
+
+
+def run_journal(run: Callable[..., Any], query: JournalQuery, extra: str = '', timeout: int = 30) -> List[Dict[str, Any]]:
+    """Run a journal query and return raw entries, retrying without --output-fields on old journalctl."""
+    try:
+        out = run(journal_command(query, extra), timeout).stdout
+    except RuntimeError as e:
+        if 'output-fields' not in str(e):
+            raise
+        out = run(journal_command(query, extra, compact=False), timeout).stdout
+    return parse_json_lines(out)
+
+
+def query_records(run: Callable[..., Any], query: JournalQuery, lines: int = 500,
+                  timeout: int = 30) -> List[JournalRecord]:
+    """The newest ``lines`` entries matching query, oldest first."""
+    # -r -n walks back from the newest entry; plain -n with --since would start at the oldest
+    entries = run_journal(run, query, f"-r -n {int(lines)}", timeout=timeout)
+    entries.reverse()
+    return [JournalRecord.from_entry(e) for e in entries]
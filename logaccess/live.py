@@ -0,0 +1,239 @@
+"""Live tail of files and journal units, shared between viewers.
+
+One follower process (``tail -F`` / ``journalctl -f``, usually over SSH) is
+kept per (host, kind, name). A reader thread collects its output and a
+flusher batches the pending lines into a frame every ``flush_interval``
+seconds, fanning each frame out to every subscriber.
+
+Each subscriber has a bounded frame queue. When a slow client falls behind,
+its oldest frames are discarded and the number of lines lost is reported on
+the next frame it receives, so one stalled browser cannot hold memory or slow
+the others down. The follower is stopped ``idle_grace`` seconds after its last
+subscriber leaves.
+"""
+
+from __future__ import annotations
+
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+Key = Tuple[str, str, str]   # (host, kind, name)
+
+MAX_PENDING_LINES = 20000
+
+
+def follow_command(kind: str, name: str) -> str:
+    """Remote command that follows a source and exits when its stdin closes.
+
+    Closing stdin (our end of the SSH session) ends ``cat``, which then stops
+    the follower; otherwise a remote ``tail -F`` would linger until it next
+    tried to write.
+    """
+    if kind == 'journal':
+        follower = f"sudo journalctl -u {shlex.quote(name)} -f -n 0 --no-pager -o short"
+    else:
+        follower = f"sudo tail -n 0 -F {shlex.quote(name)}"
+    return f"{follower} & p=$!; cat >/dev/null; kill $p 2>/dev/null"
+
+
+class Subscription:
+    def __init__(self, stream: '_TailStream', max_frames: int):
+        self._stream = stream
+        self._frames: Deque[List[str]] = deque()
+        self._max_frames = max(1, int(max_frames))
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+        self.error: Optional[str] = None
+
+    @property
+    def key(self) -> Key:
+        return self._stream.key
+
+    def _push(self, lines: List[str], dropped: int = 0):
+        with self._cond:
+            self.dropped += dropped
+            if len(self._frames) >= self._max_frames:
+                self.dropped += len(self._frames.popleft())
+            self._frames.append(lines)
+            self._cond.notify()
+
+    def _end(self, error: Optional[str] = None):
+        with self._cond:
+            self.closed = True
+            self.error = error
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next frame as {'lines', 'dropped'}, {'closed', 'error'} when the stream ended, or None on timeout."""
+        with self._cond:
+            if not self._frames and not self.closed:
+                self._cond.wait(timeout)
+            if self._frames:
+                lines = self._frames.popleft()
+                dropped, self.dropped = self.dropped, 0
+                return {'lines': lines, 'dropped': dropped}
+            if self.closed:
+                return {'closed': True, 'error': self.error}
+            return None
+
+    def close(self):
+        self._stream.hub._unsubscribe(self)
+
+
+class _TailStream:
+    def __init__(self, hub: 'TailHub', key: Key, spawn: Callable[[], subprocess.Popen]):
+        self.hub = hub
+        self.key = key
+        self.subscribers: List[Subscription] = []
+        self.lock = threading.Lock()
+        self.pending: List[str] = []
+        self.pending_dropped = 0
+        self.started_at = time.time()
+        self.lines_total = 0
+        self.frames_total = 0
+        self.idle_since: Optional[float] = None
+        self.stopped = threading.Event()
+        self.proc = spawn()
+        threading.Thread(target=self._read, name=f"tail-read-{key[2]}", daemon=True).start()
+        threading.Thread(target=self._flush_loop, name=f"tail-flush-{key[2]}", daemon=True).start()
+
+    def _read(self):
+        error = None
+        last = ''
+        try:
+            for line in self.proc.stdout:
+                last = line.strip() or last
+                with self.lock:
+                    self.pending.append(line.rstrip('\n'))
+                    if len(self.pending) > MAX_PENDING_LINES:
+                        cut = len(self.pending) - MAX_PENDING_LINES
+                        del self.pending[:cut]
+                        self.pending_dropped += cut
+        except Exception as e:
+            error = str(e)
+        rc = self.proc.wait()
+        if not self.stopped.is_set():
+            # stderr is merged into stdout, so the last line usually says why
+            error = error or f"follower exited (rc={rc}): {last[:500]}"
+        self.hub._stream_ended(self, error if not self.stopped.is_set() else None)
+
+    def _flush_loop(self):
+        while not self.stopped.wait(self.hub.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            lines, self.pending = self.pending, []
+            dropped, self.pending_dropped = self.pending_dropped, 0
+            subs = list(self.subscribers)
+        if not lines:
+            return
+        self.lines_total += len(lines)
+        self.frames_total += 1
+        for sub in subs:
+            sub._push(lines, dropped)
+
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.terminate()
+        except Exception:
+            pass
+
+
+class TailHub:
+    """Registry of shared follower streams."""
+
+    def __init__(self, flush_interval: float = 0.3, max_frames: int = 200, idle_grace: float = 5.0):
+        self.flush_interval = flush_interval
+        self.max_frames = max_frames
+        self.idle_grace = idle_grace
+        self._lock = threading.Lock()
+        self._streams: Dict[Key, _TailStream] = {}
+        self._reaper: Optional[threading.Thread] = None
+
+    def subscribe(self, key: Key, spawn: Callable[[], subprocess.Popen]) -> Subscription:
+        """Join the stream for key, starting it with spawn() if nobody is following it yet."""
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name='tail-reaper', daemon=True)
+                self._reaper.start()
+            stream = self._streams.get(key)
+            if stream is None or stream.stopped.is_set():
+                stream = _TailStream(self, key, spawn)
+                self._streams[key] = stream
+            sub = Subscription(stream, self.max_frames)
+            with stream.lock:
+                stream.subscribers.append(sub)
+                stream.idle_since = None
+            return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        stream = sub._stream
+        with stream.lock:
+            if sub in stream.subscribers:
+                stream.subscribers.remove(sub)
+            if not stream.subscribers:
+                stream.idle_since = time.monotonic()
+        sub._end()
+
+    def _stream_ended(self, stream: _TailStream, error: Optional[str]):
+        stream.stopped.set()
+        stream.flush()
+        with self._lock:
+            if self._streams.get(stream.key) is stream:
+                self._streams.pop(stream.key, None)
+        with stream.lock:
+            subs, stream.subscribers = list(stream.subscribers), []
+        for sub in subs:
+            sub._end(error)
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(max(1.0, self.idle_grace / 2))
+            now = time.monotonic()
+            with self._lock:
+                idle = [s for s in self._streams.values()
+                        if s.idle_since is not None and now - s.idle_since >= self.idle_grace]
+                for s in idle:
+                    self._streams.pop(s.key, None)
+            for s in idle:
+                s.stop()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            streams = list(self._streams.values())
+        out = []
+        for s in streams:
+            with s.lock:
+                subs = list(s.subscribers)
+            out.append({
+                'host': s.key[0], 'kind': s.key[1], 'name': s.key[2],
+                'subscribers': len(subs),
+                'lagging': sum(1 for sub in subs if sub.dropped),
+                'lines': s.lines_total,
+                'frames': s.frames_total,
+                'started_at': s.started_at,
+            })
+        return out
+
+
+def spawn_follower(args: List[str], shell: bool) -> subprocess.Popen:
+    """Start a follower process built from execute-style (args, shell)."""
+    return subprocess.Popen(
+        args if not shell else args[0], shell=shell,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, errors='replace', bufsize=1,
+    )
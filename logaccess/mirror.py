@@ -0,0 +1,499 @@
+"""Local incremental mirror of remote log files and journal units.
+
+Each mirrored source lives in its own directory as a series of append-only
+segments plus a ``manifest.json`` holding the sync position:
+
+  files     inode + byte offset of the remote file; only complete lines are
+            copied, so a partially written line is picked up on the next sync.
+            A changed inode or a shrunken file means rotation: the rest of the
+            old file is read from ``<path>.1`` when its inode matches, then the
+            new file is mirrored from the start.
+  journals  the last journald cursor; entries are stored one compact JSON
+            record per line (see ``JournalRecord.to_dict``).
+
+The active segment is plain text; once it reaches ``segment_bytes`` it is
+sealed and gzip-compressed, and the oldest sealed segments are deleted when a
+source exceeds ``max_bytes``. Commands go through a ``run(command_str,
+timeout)`` callable, as in ``paging``.
+
+Syncs of one source are serialised by ``sync_lock``; remote reads run without
+``lock``, which is only held to check the position is unchanged, append and
+save, so readers are never held up by a slow host.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .journal import JournalQuery, JournalRecord, run_journal
+from .paging import Page
+from .timestamps import line_time
+
+Runner = Callable[..., Any]
+
+SEGMENT_BYTES = 8 * 1024 * 1024
+MAX_SOURCE_BYTES = 256 * 1024 * 1024
+READ_BYTES = 4 * 1024 * 1024        # per remote read
+INITIAL_BYTES = 4 * 1024 * 1024     # history pulled the first time a file is mirrored
+MAX_READS_PER_SYNC = 8
+JOURNAL_BATCH = 5000
+JOURNAL_INITIAL = 2000
+
+
+def _safe(name: str) -> str:
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('._')[:80] or 'x'
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8', 'surrogateescape')).hexdigest()[:8]}"
+
+
+def _bytes(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogateescape')
+
+
+class MirrorSource:
+    """One mirrored (host, kind, name) and its segment store."""
+
+    def __init__(self, root: str, host: str, kind: str, name: str,
+                 segment_bytes: int = SEGMENT_BYTES, max_bytes: int = MAX_SOURCE_BYTES):
+        self.host, self.kind, self.name = host, kind, name
+        self.dir = os.path.join(root, _safe(host), kind, _safe(name))
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.sync_lock = threading.Lock()
+        self.state = self._load()
+
+    # --- manifest ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.dir, 'manifest.json')
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {
+                'host': self.host, 'kind': self.kind, 'name': self.name,
+                'inode': None, 'offset': 0, 'cursor': None,
+                'remote_base': 0,     # logical offset where the current remote file starts
+                'end': 0,             # logical bytes mirrored so far (including deleted segments)
+                'segments': [],       # [{id, start, bytes, lines, sealed}]
+                'last_sync': None, 'last_error': None, 'synced_bytes': 0,
+            }
+
+    def _save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._manifest_path())
+
+    # --- segments ---
+
+    def _segment_path(self, seg: Dict[str, Any]) -> str:
+        return os.path.join(self.dir, f"seg-{seg['id']:06d}.log" + ('.gz' if seg['sealed'] else ''))
+
+    def _active(self) -> Dict[str, Any]:
+        segs = self.state['segments']
+        if not segs or segs[-1]['sealed']:
+            segs.append({'id': (segs[-1]['id'] + 1) if segs else 1, 'start': self.state['end'],
+                         'bytes': 0, 'lines': 0, 'sealed': False})
+        return segs[-1]
+
+    def _seal(self, seg: Dict[str, Any]):
+        plain = self._segment_path(seg)
+        seg['sealed'] = True
+        with open(plain, 'rb') as src, gzip.open(self._segment_path(seg), 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(plain)
+
+    def _enforce_retention(self):
+        segs = self.state['segments']
+        while len(segs) > 1 and sum(s['bytes'] for s in segs) > self.max_bytes and segs[0]['sealed']:
+            try:
+                os.remove(self._segment_path(segs.pop(0)))
+            except OSError:
+                pass
+
+    def append(self, text: str):
+        """Append whole lines (text must end with a newline)."""
+        if not text:
+            return
+        data = _bytes(text)
+        os.makedirs(self.dir, exist_ok=True)
+        seg = self._active()
+        with open(self._segment_path(seg), 'ab') as f:
+            f.write(data)
+        seg['bytes'] += len(data)
+        seg['lines'] += text.count('\n')
+        first, last = self._time_bounds(text)
+        if first is not None and seg.get('first_ts') is None:
+            seg['first_ts'] = first
+        if last is not None:
+            seg['last_ts'] = last
+        self.state['end'] += len(data)
+        self.state['synced_bytes'] += len(data)
+        if seg['bytes'] >= self.segment_bytes:
+            self._seal(seg)
+            self._enforce_retention()
+
+    def _line_time(self, line: str) -> Optional[float]:
+        if self.kind == 'journal':
+            try:
+                return json.loads(line).get('t')
+            except ValueError:
+                return None
+        return line_time(line)
+
+    def _time_bounds(self, text: str, probe: int = 50) -> Tuple[Optional[float], Optional[float]]:
+        """Timestamps of the first and last stamped lines of text (looking at most probe lines in)."""
+        lines = text.splitlines()
+        first = next((t for t in map(self._line_time, lines[:probe]) if t), None)
+        last = next((t for t in map(self._line_time, reversed(lines[-probe:])) if t), None)
+        return first, last
+
+    def _segments(self) -> List[Dict[str, Any]]:
+        """Snapshot of the segment list; sync may seal or retire segments meanwhile."""
+        with self.lock:
+            return [dict(s) for s in self.state['segments']]
+
+    def _read_segment(self, seg: Dict[str, Any]) -> bytes:
+        try:
+            if not seg['sealed']:
+                try:
+                    with open(self._segment_path(seg), 'rb') as f:
+                        return f.read()
+                except FileNotFoundError:
+                    # Sealed since the snapshot was taken
+                    seg = dict(seg, sealed=True)
+            with gzip.open(self._segment_path(seg), 'rb') as f:
+                return f.read()
+        except OSError:
+            return b''
+
+    def iter_lines(self) -> Iterator[Tuple[int, str]]:
+        """(logical offset, line) for every mirrored line, oldest first."""
+        for seg in self._segments():
+            pos = seg['start']
+            for raw in self._read_segment(seg).split(b'\n')[:-1]:
+                yield pos, raw.decode('utf-8', 'surrogateescape')
+                pos += len(raw) + 1
+
+    def lines_since(self, position: int) -> Tuple[List[str], int]:
+        """Lines stored at or after a logical offset, and the offset to continue from."""
+        with self.lock:
+            segs = [s for s in self._segments() if s['start'] + s['bytes'] > position]
+            end = self.state['end']
+        lines = []
+        for seg in segs:
+            pos = seg['start']
+            for raw in self._read_segment(seg).split(b'\n')[:-1]:
+                if pos >= position:
+                    lines.append(raw.decode('utf-8', 'surrogateescape'))
+                pos += len(raw) + 1
+        return lines, end
+
+    @staticmethod
+    def record(line: str) -> JournalRecord:
+        """The JournalRecord of a stored journal line."""
+        return _record(json.loads(line))
+
+    def tail(self, n: int) -> List[Tuple[int, str]]:
+        """The last n lines with their logical offsets."""
+        out: List[Tuple[int, str]] = []
+        for seg in reversed(self._segments()):
+            pos = seg['start']
+            lines = []
+            for raw in self._read_segment(seg).split(b'\n')[:-1]:
+                lines.append((pos, raw.decode('utf-8', 'surrogateescape')))
+                pos += len(raw) + 1
+            out = lines[-(n - len(out)):] + out if len(out) < n else out
+            if len(out) >= n:
+                break
+        return out[-n:]
+
+    # --- reads for the app ---
+
+    def age(self) -> Optional[float]:
+        last = self.state.get('last_sync')
+        return None if last is None else max(0.0, time.time() - last)
+
+    def is_fresh(self, max_age: float) -> bool:
+        age = self.age()
+        return age is not None and age <= max_age and not self.state.get('last_error') and bool(self.state['segments'])
+
+    def tail_text(self, n: int = 500) -> str:
+        lines = [t for _, t in self.tail(n)]
+        if self.kind == 'journal':
+            lines = [_record_line(t) for t in lines]
+        return ''.join(line + '\n' for line in lines)
+
+    def tail_page(self, n: int = 500) -> Page:
+        """A tail page whose prev cursor continues against the remote source."""
+        with self.lock:
+            entries = self.tail(n)
+            base, end = self.state['remote_base'], self.state['end']
+        if self.kind == 'journal':
+            records = [json.loads(t) for _, t in entries]
+            first = records[0].get('c') if records else None
+            last = records[-1].get('c') if records else None
+            return Page(lines=[_record_line(r) for r in records],
+                        prev_cursor=f"c{first}" if first and len(records) >= n else None,
+                        next_cursor=f"c{last}" if last else None, unit='entries')
+        start = entries[0][0] - base if entries else end - base
+        # Lines mirrored from before the last rotation have no offset in the current file
+        prev = f"b{start}" if start > 0 else None
+        return Page(lines=[t for _, t in entries], prev_cursor=prev, next_cursor=f"b{end - base}",
+                    has_next=False, start=max(0, start), end=end - base, unit='bytes')
+
+    def iter_window(self, since: Optional[float], until: Optional[float]) -> Iterator[Tuple[int, float, str]]:
+        """(logical offset, time, line) of every line stamped within [since, until], skipping segments outside it.
+
+        Lines without a timestamp of their own take the time of the line before them.
+        """
+        with self.lock:
+            segs = [s for s in self._segments()
+                    if not ((since is not None and s.get('last_ts') is not None and s['last_ts'] < since) or
+                            (until is not None and s.get('first_ts') is not None and s['first_ts'] > until))]
+        current: Optional[float] = None
+        for seg in segs:
+            pos = seg['start']
+            for raw in self._read_segment(seg).split(b'\n')[:-1]:
+                line, offset = raw.decode('utf-8', 'surrogateescape'), pos
+                pos += len(raw) + 1
+                current = self._line_time(line) or current
+                if current is None or (since is not None and current < since):
+                    continue
+                if until is not None and current > until:
+                    return
+                yield offset, current, line
+
+    def first_time(self) -> Optional[float]:
+        """Time of the oldest mirrored line, when known."""
+        with self.lock:
+            segs = self.state['segments']
+            return segs[0].get('first_ts') if segs else None
+
+    def time_window(self, since: Optional[float], until: Optional[float], n: int = 500) -> Page:
+        """First n lines stamped within [since, until], skipping segments outside the window."""
+        with self.lock:
+            base = self.state['remote_base']
+        out: List[Tuple[int, str]] = []
+        more = False
+        for offset, _, line in self.iter_window(since, until):
+            if len(out) >= n:
+                more = True
+                break
+            out.append((offset, line))
+        lines = [_record_line(t) for _, t in out] if self.kind == 'journal' else [t for _, t in out]
+        if self.kind == 'journal':
+            return Page(lines=lines, has_next=more, unit='entries')
+        start = out[0][0] - base if out else None
+        end = out[-1][0] + len(_bytes(out[-1][1])) + 1 - base if out else None
+        # Offsets from before the last rotation do not exist in the current remote file
+        return Page(lines=lines, prev_cursor=f"b{start}" if start else None,
+                    next_cursor=f"b{end}" if end is not None and end > 0 else None,
+                    has_next=more, start=start, end=end)
+
+    def grep(self, pattern: 're.Pattern', limit: int = 20) -> List[Tuple[int, str]]:
+        """(line number in the mirror, text) of the newest matching lines, oldest first.
+
+        Segments are scanned newest first, so older ones are only decompressed
+        while fewer than limit lines have matched.
+        """
+        segs = self._segments()
+        first_line = 1 + sum(s['lines'] for s in segs)
+        hits: List[Tuple[int, str]] = []
+        for seg in reversed(segs):
+            first_line -= seg['lines']
+            raws = self._read_segment(seg).split(b'\n')[:-1]
+            for i in range(len(raws) - 1, -1, -1):
+                line = raws[i].decode('utf-8', 'surrogateescape')
+                text = _record_line(line) if self.kind == 'journal' else line
+                if pattern.search(text):
+                    hits.append((first_line + i, text))
+                    if len(hits) >= limit:
+                        return hits[::-1]
+        return hits[::-1]
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            st = self.state
+            segs = st['segments']
+            return {
+                'host': self.host, 'kind': self.kind, 'name': self.name,
+                'last_sync': st['last_sync'], 'age_seconds': self.age(), 'last_error': st['last_error'],
+                'segments': len(segs), 'sealed_segments': sum(1 for s in segs if s['sealed']),
+                'stored_bytes': sum(s['bytes'] for s in segs), 'lines': sum(s['lines'] for s in segs),
+                'synced_bytes': st['synced_bytes'], 'inode': st['inode'], 'offset': st['offset'],
+                'cursor': st['cursor'],
+            }
+
+    def clear(self):
+        with self.lock:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.state = self._load()
+
+    # --- sync ---
+
+    def sync(self, run: Runner, path: Optional[str] = None, timeout: int = 60) -> int:
+        """Pull new data from the remote source; returns bytes appended."""
+        with self.sync_lock:
+            with self.lock:
+                before = self.state['end']
+            error = None
+            try:
+                if self.kind == 'journal':
+                    self._sync_journal(run, timeout)
+                else:
+                    self._sync_file(run, path or self.name, timeout)
+            except Exception as e:
+                error = str(e)[:500]
+                raise
+            finally:
+                with self.lock:
+                    self.state['last_error'] = error
+                    self.state['last_sync'] = time.time()
+                    self._save()
+            with self.lock:
+                return max(0, self.state['end'] - before)
+
+    def _read(self, run: Runner, path: str, offset: int, length: int, timeout: int) -> Tuple[int, int, str]:
+        q = shlex.quote(path)
+        out = run(f"sudo stat -c '%i %s' {q} && sudo tail -c +{int(offset) + 1} {q} | head -c {int(length)}",
+                  timeout).stdout or ''
+        header, _, data = out.partition('\n')
+        try:
+            inode, size = header.split()[:2]
+            return int(inode), int(size), data
+        except ValueError:
+            raise RuntimeError(f"Unexpected output mirroring '{path}': {header[:200]!r}")
+
+    def _append_complete(self, data: str, full_read: bool) -> int:
+        """Append the complete lines of data; returns the bytes consumed."""
+        cut = data.rfind('\n') + 1
+        if cut == 0 and full_read and data:
+            # A single line longer than a whole read; store it in pieces
+            self.append(data + '\n')
+            return len(_bytes(data))
+        self.append(data[:cut])
+        return len(_bytes(data[:cut]))
+
+    def _position(self) -> Tuple[Optional[int], int]:
+        with self.lock:
+            return self.state['inode'], self.state['offset']
+
+    def _sync_file(self, run: Runner, path: str, timeout: int):
+        st_inode, _ = self._position()
+        if st_inode is None:
+            inode, size, _ = self._read(run, path, 0, 0, timeout)
+            offset = max(0, size - INITIAL_BYTES)
+            if offset:
+                # Start at a line boundary
+                _, _, head = self._read(run, path, offset, 64 * 1024, timeout)
+                nl = head.find('\n')
+                if nl >= 0:
+                    offset += len(_bytes(head[:nl + 1]))
+            with self.lock:
+                st = self.state
+                if st['inode'] is not None:
+                    return
+                st['inode'], st['offset'] = inode, offset
+                st['remote_base'] = st['end'] - offset
+        for _ in range(MAX_READS_PER_SYNC):
+            known_inode, offset = self._position()
+            if known_inode is None:
+                return   # cleared meanwhile
+            inode, size, data = self._read(run, path, offset, READ_BYTES, timeout)
+            if inode != known_inode or size < offset:
+                rest = self._rotated_rest(run, path, known_inode, offset, timeout)
+                with self.lock:
+                    st = self.state
+                    if (st['inode'], st['offset']) != (known_inode, offset):
+                        return
+                    if rest:
+                        self.append(rest)
+                    st['inode'], st['offset'], st['remote_base'] = inode, 0, st['end']
+                continue
+            with self.lock:
+                st = self.state
+                if (st['inode'], st['offset']) != (known_inode, offset):
+                    return
+                st['offset'] += self._append_complete(data, len(_bytes(data)) >= READ_BYTES)
+            if len(_bytes(data)) < READ_BYTES:
+                break
+
+    def _rotated_rest(self, run: Runner, path: str, inode: int, offset: int, timeout: int) -> str:
+        """What was written to the old file after offset, if it was renamed to <path>.1."""
+        try:
+            old_inode, _, data = self._read(run, f"{path}.1", offset, READ_BYTES * MAX_READS_PER_SYNC, timeout)
+        except Exception:
+            return ''
+        if old_inode != inode or not data:
+            return ''
+        return data if data.endswith('\n') else data + '\n'
+
+    def _sync_journal(self, run: Runner, timeout: int):
+        query = JournalQuery(unit=self.name)
+        for _ in range(MAX_READS_PER_SYNC):
+            with self.lock:
+                cursor = self.state['cursor']
+            if cursor:
+                entries = run_journal(run, query, f"--after-cursor={shlex.quote(cursor)} -n {JOURNAL_BATCH}",
+                                      timeout=timeout)
+            else:
+                entries = run_journal(run, query, f"-r -n {JOURNAL_INITIAL}", timeout=timeout)
+                entries.reverse()
+            if not entries:
+                break
+            records = [JournalRecord.from_entry(e) for e in entries]
+            with self.lock:
+                if self.state['cursor'] != cursor:
+                    return   # cleared meanwhile
+                self.append(''.join(json.dumps(r.to_dict(), separators=(',', ':')) + '\n' for r in records))
+                self.state['cursor'] = records[-1].cursor or cursor
+            if len(entries) < JOURNAL_BATCH:
+                break
+
+
+def _record(d: Dict[str, Any]) -> JournalRecord:
+    return JournalRecord(ts=d.get('t') or 0.0, priority=d.get('p'), message=d.get('m', ''), ident=d.get('i', ''),
+                         pid=d.get('pid'), host=d.get('h', ''), unit=d.get('u', ''), cursor=d.get('c', ''))
+
+
+def _record_line(raw: Any) -> str:
+    return _record(json.loads(raw) if isinstance(raw, str) else raw).format_line()
+
+
+class LogMirror:
+    """Registry of mirrored sources under one root directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._sources: Dict[Tuple[str, str, str], MirrorSource] = {}
+
+    def source(self, host: str, kind: str, name: str, **kwargs) -> MirrorSource:
+        key = (host, kind, name)
+        with self._lock:
+            src = self._sources.get(key)
+            if src is None:
+                src = MirrorSource(self.root, host, kind, name, **kwargs)
+                self._sources[key] = src
+            for k, v in kwargs.items():
+                setattr(src, k, v)
+            return src
+
+    def existing(self, host: str, kind: str, name: str) -> Optional[MirrorSource]:
+        """The source if it has been mirrored at least once."""
+        src = self.source(host, kind, name)
+        return src if src.state['segments'] else None
@@ -0,0 +1,256 @@
+"""Paged, seekable reads of log files and journal units.
+
+A page is a window of whole lines plus cursors for the neighbouring windows:
+
+  plain files    ``b<offset>``  byte offset of a line start; only the window is
+                 read (``tail -c +N | head -c M`` seeks) and sent over the wire
+  .gz archives   ``l<line>``    1-based line number; the archive is
+                 decompressed remotely up to the window and only the window sent
+  journal units  ``c<cursor>``  journald entry cursor
+
+``direction='before'`` returns the lines ending at the cursor and
+``'after'`` the lines starting at it; with no cursor the page is the tail of
+the source. Commands are issued through ``run(command_str, timeout)`` so this
+module does not depend on how the app reaches a host. The runner should decode
+output with ``errors='surrogateescape'`` so byte offsets stay exact.
+"""
+
+from __future__ import annotations
+
+import shlex
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .journal import JournalQuery, format_entry, run_journal
+
+Runner = Callable[..., Any]
+
+DEFAULT_LINES = 500
+MAX_LINES = 5000
+BYTES_PER_LINE = 256            # window sizing estimate for byte-addressed reads
+MIN_WINDOW_BYTES = 64 * 1024
+MAX_WINDOW_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class Page:
+    lines: List[str] = field(default_factory=list)
+    prev_cursor: Optional[str] = None   # None at the start of the source
+    next_cursor: Optional[str] = None   # where to continue reading forwards (or poll for growth)
+    has_next: bool = False
+    start: Optional[int] = None         # byte offset / line number of the first line
+    end: Optional[int] = None           # byte offset / line number after the last line
+    size: Optional[int] = None          # file size in bytes, or line count for archives when known
+    unit: str = 'bytes'                 # bytes|lines|entries
+
+    @property
+    def content(self) -> str:
+        return '\n'.join(self.lines) + '\n' if self.lines else ''
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'content': self.content,
+            'line_count': len(self.lines),
+            'prev_cursor': self.prev_cursor,
+            'next_cursor': self.next_cursor,
+            'has_prev': self.prev_cursor is not None,
+            'has_next': self.has_next,
+            'start': self.start,
+            'end': self.end,
+            'size': self.size,
+            'unit': self.unit,
+        }
+
+
+def clamp_lines(lines: Any) -> int:
+    try:
+        n = int(lines)
+    except (TypeError, ValueError):
+        n = DEFAULT_LINES
+    return max(1, min(MAX_LINES, n))
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Split ``b123``/``l45``/``c<journal cursor>`` into (kind, value)."""
+    if not cursor:
+        return None, None
+    kind, value = cursor[0], cursor[1:]
+    if kind not in ('b', 'l', 'c') or not value:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if kind in ('b', 'l') and not value.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return kind, value
+
+
+def _blen(s: str) -> int:
+    return len(s.encode('utf-8', 'surrogateescape'))
+
+
+def _split_lines(data: str, base: int, drop_head: bool):
+    """Complete lines in data as (offset, text) pairs, the unterminated tail and its offset."""
+    pieces = data.split('\n')
+    trailing = pieces.pop()
+    out = []
+    pos = base
+    for i, piece in enumerate(pieces):
+        if not (i == 0 and drop_head):
+            out.append((pos, piece))
+        pos += _blen(piece) + 1
+    return out, trailing, pos
+
+
+def _window_bytes(n: int) -> int:
+    return max(MIN_WINDOW_BYTES, min(MAX_WINDOW_BYTES, n * BYTES_PER_LINE))
+
+
+def _read_bytes(run: Runner, path: str, start_expr: str, end_expr: str, timeout: int):
+    """Read [o, e) of path, with o/e computed remotely against the current size."""
+    q = shlex.quote(path)
+    cmd = (
+        f"s=$(sudo stat -c %s {q}) || exit 1; {start_expr}; {end_expr}; "
+        f"echo \"$s $o $e\"; sudo tail -c +$(( o + 1 )) {q} | head -c $(( e - o ))"
+    )
+    out = run(cmd, timeout).stdout or ''
+    header, _, data = out.partition('\n')
+    try:
+        size, o, e = (int(x) for x in header.split())
+    except ValueError:
+        raise RuntimeError(f"Unexpected output reading '{path}': {header[:200]!r}")
+    return size, o, e, data
+
+
+def _file_page(run: Runner, path: str, offset: Optional[int], direction: str, n: int, timeout: int) -> Page:
+    w = _window_bytes(n)
+    if direction == 'after':
+        # Read from one byte early so we can tell whether offset is a line start
+        o = max(0, (offset or 0) - 1)
+        size, o, e, data = _read_bytes(
+            run, path, f"o=$(( {o} < s ? {o} : s ))", f"e=$(( o + {w} < s ? o + {w} : s ))", timeout)
+        complete, trailing, pos = _split_lines(data, o, o > 0)
+        entries = complete[:n]
+        if entries:
+            end = entries[-1][0] + _blen(entries[-1][1]) + 1
+        elif trailing and e < size:
+            # A single line longer than the window; hand it over in pieces
+            entries, end = [(pos, trailing)], e
+        else:
+            end = pos
+        start = entries[0][0] if entries else end
+        return Page(
+            lines=[t for _, t in entries],
+            prev_cursor=f"b{start}" if start > 0 else None,
+            next_cursor=f"b{end}",
+            has_next=end < size,
+            start=start,
+            end=end,
+            size=size,
+        )
+
+    end_expr = 's' if offset is None else str(int(offset))
+    size, o, e, data = _read_bytes(
+        run, path, f"e=$(( {end_expr} < s ? {end_expr} : s ))", f"o=$(( e > {w} ? e - {w} : 0 ))", timeout)
+    complete, trailing, pos = _split_lines(data, o, o > 0)
+    entries = list(complete)
+    end = pos
+    if trailing:
+        if e >= size or not entries:
+            # Unterminated last line at EOF, or a single line longer than the window
+            entries.append((pos, trailing))
+            end = e
+    entries = entries[-n:]
+    start = entries[0][0] if entries else end
+    return Page(
+        lines=[t for _, t in entries],
+        prev_cursor=f"b{start}" if start > 0 else None,
+        next_cursor=f"b{end}",
+        has_next=end < size,
+        start=start,
+        end=end,
+        size=size,
+    )
+
+
+def _gz_page(run: Runner, path: str, line: Optional[int], direction: str, n: int, timeout: int) -> Page:
+    q = shlex.quote(path)
+    if line is None:
+        # One pass keeping the last n lines; the total is printed first
+        awk = ("{ b[NR % n] = $0 } END { print NR; s = NR - n + 1; if (s < 1) s = 1; "
+               "for (i = s; i <= NR; i++) print b[i % n] }")
+        out = run(f"sudo zcat {q} 2>/dev/null | awk -v n={n} {shlex.quote(awk)}", timeout).stdout or ''
+        total_s, _, body = out.partition('\n')
+        try:
+            total = int(total_s.strip() or 0)
+        except ValueError:
+            raise RuntimeError(f"Unexpected output reading '{path}': {total_s[:200]!r}")
+        lines = body.split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        lines = lines[-n:] if total else []
+        first = total - len(lines) + 1
+        return Page(lines=lines, prev_cursor=f"l{first}" if first > 1 else None, next_cursor=f"l{total + 1}",
+                    has_next=False, start=first, end=total + 1, size=total, unit='lines')
+
+    if direction == 'after':
+        first, last = max(1, line), max(1, line) + n - 1
+    else:
+        last = line - 1
+        first = max(1, last - n + 1)
+    if last < first:
+        return Page(prev_cursor=None, next_cursor=f"l{first}", has_next=True, start=first, end=first, unit='lines')
+    # sed quits after the window so zcat stops early on SIGPIPE
+    out = run(f"sudo zcat {q} 2>/dev/null | sed -n '{first},{last}p;{last}q'", timeout).stdout or ''
+    lines = out.split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    end = first + len(lines)
+    return Page(lines=lines, prev_cursor=f"l{first}" if first > 1 else None, next_cursor=f"l{end}",
+                has_next=direction != 'after' or len(lines) == n, start=first, end=end, unit='lines')
+
+
+def read_file_page(run: Runner, path: str, cursor: Optional[str] = None, direction: str = 'before',
+                   lines: Any = DEFAULT_LINES, offset: Optional[int] = None, timeout: int = 30) -> Page:
+    """Page through a file; ``offset`` jumps to the first line starting at or after a byte offset."""
+    n = clamp_lines(lines)
+    kind, value = parse_cursor(cursor)
+    if path.endswith('.gz'):
+        if kind not in (None, 'l'):
+            raise ValueError('Archives are paged by line cursor')
+        return _gz_page(run, path, int(value) if value else None, direction, n, timeout)
+    if kind not in (None, 'b'):
+        raise ValueError('Files are paged by byte cursor')
+    if offset is not None:
+        return _file_page(run, path, max(0, int(offset)), 'after', n, timeout)
+    return _file_page(run, path, int(value) if value else None, direction if value else 'before', n, timeout)
+
+
+def read_journal_page(run: Runner, unit: str, cursor: Optional[str] = None, direction: str = 'before',
+                      lines: Any = DEFAULT_LINES, timeout: int = 30, query: Optional[JournalQuery] = None) -> Page:
+    """Page through a journal unit by entry cursor; query adds server-side filters."""
+    n = clamp_lines(lines)
+    kind, value = parse_cursor(cursor)
+    if kind not in (None, 'c'):
+        raise ValueError('Journal units are paged by entry cursor')
+    query = query or JournalQuery()
+    query.unit = unit
+    if value is None:
+        entries = run_journal(run, query, f"-r -n {n}", timeout=timeout)
+        entries.reverse()
+        has_prev, has_next = len(entries) >= n, False
+    elif direction == 'after':
+        entries = run_journal(run, query, f"--after-cursor={shlex.quote(value)} -n {n}", timeout=timeout)
+        has_prev, has_next = True, len(entries) >= n
+    else:
+        # Walk backwards from the cursor entry itself, then drop it
+        out = run_journal(run, query, f"--cursor={shlex.quote(value)} -r -n {n + 1}", timeout=timeout)
+        entries = [e for e in out if e.get('__CURSOR') != value][:n]
+        entries.reverse()
+        has_prev, has_next = len(entries) >= n, True
+    first = entries[0].get('__CURSOR') if entries else None
+    last = entries[-1].get('__CURSOR') if entries else None
+    return Page(
+        lines=[format_entry(e) for e in entries],
+        prev_cursor=f"c{first}" if first and has_prev else None,
+        next_cursor=f"c{last}" if last else cursor,
+        has_next=has_next,
+        unit='entries',
+    )
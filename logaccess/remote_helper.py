@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""ailog remote helper: batched, typed log operations over one stdin/stdout pipe.
+
+Pushed to hosts by ``logaccess.helper`` and started over the usual SSH
+connection. Standard library only, Python 3.6+.
+
+Protocol (one JSON object per line, both directions):
+
+  -> {"batch": 7, "requests": [{"id": 0, "op": "stat", "args": {"path": "/var/log/syslog"}}, ...]}
+  <- {"hello": true, "version": 1, "pid": 1234}                 once, at start
+  <- {"batch": 7, "id": 0, "ok": true, "result": {...}}          one per request, in completion order
+  <- {"batch": 7, "id": 1, "ok": false, "error": "..."}
+  <- {"batch": 7, "done": true, "count": 2}                      after the batch's last response
+
+Requests of a batch (and of concurrent batches) run in parallel on a small
+thread pool. The helper exits when stdin closes. File contents are decoded
+with surrogateescape, so undecodable bytes survive the JSON round trip.
+"""
+
+import gzip
+import json
+import os
+import platform
+import re
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+VERSION = 1
+MAX_READ_BYTES = 8 * 1024 * 1024
+MAX_MATCHES = 10000
+MAX_TAIL_LINES = 100000
+JOURNAL_TIMEOUT = 60
+_CHUNK = 64 * 1024
+_SKIP_FS = {'proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'cgroup', 'cgroup2', 'securityfs', 'pstore', 'debugfs',
+            'tracefs', 'mqueue', 'hugetlbfs', 'configfs', 'fusectl', 'bpf', 'autofs', 'squashfs', 'overlay', 'nsfs',
+            'binfmt_misc', 'rpc_pipefs', 'efivarfs', 'ramfs'}
+
+
+def _text(data):
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def _stat(st):
+    kind = 'dir' if stat.S_ISDIR(st.st_mode) else 'file' if stat.S_ISREG(st.st_mode) else 'other'
+    return {'type': kind, 'size': st.st_size, 'mtime': int(st.st_mtime), 'inode': st.st_ino}
+
+
+def op_ping():
+    return {'version': VERSION, 'pid': os.getpid(), 'python': platform.python_version()}
+
+
+def op_list(path):
+    """Directory entries with their stat, one round trip instead of ls + a stat per file."""
+    entries = []
+    for name in sorted(os.listdir(path)):
+        try:
+            entries.append(dict(_stat(os.stat(os.path.join(path, name))), name=name))
+        except OSError as e:
+            entries.append({'name': name, 'type': 'other', 'error': str(e)})
+    return {'path': path, 'entries': entries}
+
+
+def op_stat(path=None, paths=None):
+    if paths is None:
+        return _stat(os.stat(path))
+    out = {}
+    for p in paths:
+        try:
+            out[p] = _stat(os.stat(p))
+        except OSError as e:
+            out[p] = {'error': str(e)}
+    return out
+
+
+def _tail_offset(f, size, lines):
+    """Byte offset where the last ``lines`` lines start."""
+    pos, seen = size, 0
+    if size:
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            pos -= 1   # the final newline ends the last line, it does not start one
+    while pos > 0:
+        step = min(_CHUNK, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step)
+        i = len(chunk)
+        while True:
+            i = chunk.rfind(b'\n', 0, i)
+            if i < 0:
+                break
+            seen += 1
+            if seen >= lines:
+                return pos + i + 1
+    return 0
+
+
+def op_read(path, offset=0, length=_CHUNK, lines=None):
+    """A byte range (offset < 0 counts from the end), or the last ``lines`` lines."""
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        if lines:
+            offset = _tail_offset(f, size, min(int(lines), MAX_TAIL_LINES))
+            length = size - offset
+        elif offset < 0:
+            offset = max(0, size + offset)
+        length = max(0, min(int(length), MAX_READ_BYTES))
+        f.seek(offset)
+        data = f.read(length)
+    return {'data': _text(data), 'offset': offset, 'end': offset + len(data), 'size': size, 'inode': st.st_ino,
+            'truncated': offset + len(data) < size and bool(lines)}
+
+
+def op_grep(path, pattern, ignore_case=False, fixed=False, invert=False, max_matches=1000):
+    """Matching lines with their 1-based numbers; .gz archives are read decompressed."""
+    if fixed:
+        pattern = re.escape(pattern)
+    rx = re.compile(pattern.encode('utf-8', 'surrogateescape'), re.IGNORECASE if ignore_case else 0)
+    limit = min(int(max_matches), MAX_MATCHES)
+    opener = gzip.open if path.endswith('.gz') else open
+    matches, truncated = [], False
+    with opener(path, 'rb') as f:
+        for number, raw in enumerate(f, 1):
+            if bool(rx.search(raw)) != bool(invert):
+                if len(matches) >= limit:
+                    truncated = True
+                    break
+                matches.append([number, _text(raw.rstrip(b'\n'))])
+    return {'matches': matches, 'truncated': truncated}
+
+
+def op_journal(unit=None, since=None, until=None, lines=None, grep=None, priority=None, output='short-iso',
+               reverse=False, fields=None):
+    """journalctl with typed arguments (no shell), stdout as text."""
+    args = ['journalctl', '--no-pager', '-o', output]
+    if unit:
+        args += ['-u', unit]
+    if since:
+        args += ['--since', str(since)]
+    if until:
+        args += ['--until', str(until)]
+    if lines:
+        args += ['-n', str(int(lines))]
+    if grep:
+        args += ['--grep', grep]
+    if priority is not None and priority != '':
+        args += ['-p', str(priority)]
+    if reverse:
+        args.append('-r')
+    if fields:
+        args.append('--output-fields=' + ','.join(fields))
+    proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=JOURNAL_TIMEOUT)
+    if proc.returncode not in (0, 1):   # 1: --grep found nothing
+        raise RuntimeError(_text(proc.stderr).strip() or 'journalctl exited with %d' % proc.returncode)
+    return {'text': _text(proc.stdout)}
+
+
+def _meminfo():
+    out = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            parts = rest.split()
+            if parts and parts[0].isdigit():
+                out[key] = int(parts[0]) * 1024
+    return out
+
+
+def _os_name():
+    try:
+        with open('/etc/os-release') as f:
+            for line in f:
+                if line.startswith('PRETTY_NAME='):
+                    return line.split('=', 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return platform.system()
+
+
+def _disks():
+    disks, seen = [], set()
+    try:
+        with open('/proc/mounts') as f:
+            mounts = [line.split()[:3] for line in f]
+    except OSError:
+        mounts = [['rootfs', '/', 'rootfs']]
+    for device, mountpoint, fstype in mounts:
+        if fstype in _SKIP_FS or mountpoint in seen:
+            continue
+        try:
+            st = os.statvfs(mountpoint)
+        except OSError:
+            continue
+        seen.add(mountpoint)
+        total = st.f_blocks * st.f_frsize
+        if not total:
+            continue
+        disks.append({'device': device, 'mountpoint': mountpoint, 'fstype': fstype, 'total': total,
+                      'used': (st.f_blocks - st.f_bfree) * st.f_frsize, 'free': st.f_bavail * st.f_frsize})
+    return disks
+
+
+def op_sysinfo():
+    info = {'hostname': socket.gethostname(), 'os': _os_name(), 'kernel': platform.release(),
+            'arch': platform.machine(), 'cpus': os.cpu_count(), 'time': time.time()}
+    try:
+        with open('/proc/uptime') as f:
+            info['uptime_seconds'] = float(f.read().split()[0])
+    except OSError:
+        pass
+    try:
+        info['load'] = list(os.getloadavg())
+    except OSError:
+        pass
+    try:
+        mem = _meminfo()
+        info['memory'] = {'total': mem.get('MemTotal'), 'available': mem.get('MemAvailable'),
+                          'swap_total': mem.get('SwapTotal'), 'swap_free': mem.get('SwapFree')}
+    except OSError:
+        pass
+    info['disks'] = _disks()
+    return info
+
+
+OPS = {
+    'ping': op_ping,
+    'list': op_list,
+    'stat': op_stat,
+    'read': op_read,
+    'grep': op_grep,
+    'journal': op_journal,
+    'sysinfo': op_sysinfo,
+}
+
+
+class Server:
+    def __init__(self, workers=4, out=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.out = out or sys.stdout.buffer
+        self.write_lock = threading.Lock()
+
+    def send(self, frame):
+        line = (json.dumps(frame, ensure_ascii=True, separators=(',', ':')) + '\n').encode('ascii')
+        with self.write_lock:
+            self.out.write(line)
+            self.out.flush()
+
+    def _handle(self, batch_id, request):
+        try:
+            fn = OPS[request.get('op')]
+        except KeyError:
+            return {'batch': batch_id, 'id': request.get('id'), 'ok': False,
+                    'error': 'Unknown op %r' % request.get('op')}
+        try:
+            return {'batch': batch_id, 'id': request.get('id'), 'ok': True, 'result': fn(**(request.get('args') or {}))}
+        except Exception as e:
+            return {'batch': batch_id, 'id': request.get('id'), 'ok': False, 'error': '%s: %s' % (type(e).__name__, e)}
+
+    def submit(self, batch):
+        batch_id = batch.get('batch')
+        requests = batch.get('requests') or []
+        if not requests:
+            self.send({'batch': batch_id, 'done': True, 'count': 0})
+            return
+        state = {'left': len(requests)}
+        lock = threading.Lock()
+
+        def run(request):
+            self.send(self._handle(batch_id, request))
+            with lock:
+                state['left'] -= 1
+                last = state['left'] == 0
+            if last:
+                self.send({'batch': batch_id, 'done': True, 'count': len(requests)})
+
+        for request in requests:
+            self.pool.submit(run, request)
+
+    def serve(self, stdin=None):
+        stdin = stdin or sys.stdin.buffer
+        self.send({'hello': True, 'version': VERSION, 'pid': os.getpid()})
+        while True:
+            line = stdin.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                batch = json.loads(line.decode('utf-8', 'surrogateescape'))
+            except ValueError as e:
+                self.send({'error': 'Bad request line: %s' % e})
+                continue
+            self.submit(batch)
+        self.pool.shutdown(wait=True)
+
+
+def main(argv):
+    workers = 4
+    if '--workers' in argv:
+        workers = max(1, int(argv[argv.index('--workers') + 1]))
+    Server(workers=workers).serve()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
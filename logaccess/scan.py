@@ -0,0 +1,104 @@
+"""Concurrent host scans merged into one event stream.
+
+``stream_scan`` runs ``scan(host_id, host_name, emit)`` for every host on a
+bounded thread pool. Progress events that a scan passes to ``emit`` and a
+``host`` event for each finished host go through one queue, so a single
+consumer (an SSE response) sees events from all hosts interleaved as they
+happen, and each host's result as soon as it is ready.
+
+Every host has its own deadline, counted from when its scan starts. A host
+that misses it is reported as failed and whatever it returns later is
+ignored (the worker thread is left to hit its own command timeouts).
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+Host = Tuple[str, str]   # (host_id, host_name)
+
+
+def stream_scan(hosts: List[Host], scan: Callable[[str, str, Callable[[Dict[str, Any]], None]], Any],
+                concurrency: int = 8, host_deadline: float = 60, context: Optional[Callable[[], Any]] = None,
+                poll: float = 1.0, keepalive: float = 10.0) -> Iterator[Optional[Dict[str, Any]]]:
+    """Yield event dicts while hosts are scanned, None as a keepalive tick, and finally a ``done`` event.
+
+    Events:
+      {'status': 'progress', 'host_id', 'message', 'progress'}   from scan's emit
+      {'status': 'host', 'host_id', 'host_name', 'ok', 'result' | 'error', 'ms', 'done', 'total'}
+      {'status': 'done', 'results': {host_id: result}, 'failed': [{'host_id', 'host_name', 'error'}]}
+    """
+    context = context or nullcontext
+    total = len(hosts)
+    q: Queue = Queue()
+    started: Dict[str, float] = {}
+    finished: Dict[str, bool] = {}
+    results: Dict[str, Any] = {}
+    failed: List[Dict[str, str]] = []
+
+    def _progress() -> int:
+        return 10 + int(80 * len(finished) / total) if total else 90
+
+    def _run(host_id: str, host_name: str):
+        started[host_id] = time.monotonic()
+
+        def emit(event: Dict[str, Any]):
+            q.put({**event, 'host_id': host_id})
+
+        t0 = time.perf_counter()
+        try:
+            with context():
+                result = scan(host_id, host_name, emit)
+            q.put({'status': '_finished', 'host_id': host_id, 'host_name': host_name, 'ok': True, 'result': result,
+                   'ms': int((time.perf_counter() - t0) * 1000)})
+        except Exception as e:
+            q.put({'status': '_finished', 'host_id': host_id, 'host_name': host_name, 'ok': False, 'error': str(e),
+                   'ms': int((time.perf_counter() - t0) * 1000)})
+
+    names = dict(hosts)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(int(concurrency), total or 1)), thread_name_prefix='scan')
+    try:
+        for host_id, host_name in hosts:
+            executor.submit(_run, host_id, host_name)
+        last_event = time.monotonic()
+        while len(finished) < total:
+            try:
+                event = q.get(timeout=poll)
+            except Empty:
+                event = None
+            now = time.monotonic()
+            if event is not None:
+                host_id = event['host_id']
+                if finished.get(host_id):
+                    continue  # late output from a host that already missed its deadline
+                if event['status'] == '_finished':
+                    finished[host_id] = True
+                    if event['ok']:
+                        results[host_id] = event['result']
+                    else:
+                        failed.append({'host_id': host_id, 'host_name': event['host_name'], 'error': event['error']})
+                    event = {**event, 'status': 'host', 'done': len(finished), 'total': total, 'progress': _progress()}
+                else:
+                    event = {**event, 'progress': _progress()}
+                last_event = now
+                yield event
+            for host_id, t in list(started.items()):
+                if not finished.get(host_id) and now - t > host_deadline:
+                    finished[host_id] = True
+                    error = f"Timed out after {int(host_deadline)}s"
+                    failed.append({'host_id': host_id, 'host_name': names.get(host_id, host_id), 'error': error})
+                    last_event = now
+                    yield {'status': 'host', 'host_id': host_id, 'host_name': names.get(host_id, host_id), 'ok': False,
+                           'error': error, 'ms': int(host_deadline * 1000), 'done': len(finished), 'total': total,
+                           'progress': _progress()}
+            if now - last_event >= keepalive:
+                last_event = now
+                yield None
+        yield {'status': 'done', 'results': results, 'failed': failed}
+    finally:
+        # Do not wait for workers stuck past their deadline (or a client that went away)
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,284 @@
+"""Local full-text index of log lines (SQLite FTS5).
+
+Lines are fed incrementally from data the app already pulls: mirror syncs
+(tracked per source, so each line is indexed once) and the windows fetched
+for analysis. A line is keyed by (host, kind, source, digest of its text, or
+the journald cursor), so overlapping fetches do not index it twice; exact
+repeats of a line within one source are kept once.
+
+Queries take the usual search-box syntax and are translated to FTS5:
+
+  error timeout         both terms (implicit AND)
+  "connection reset"    phrase
+  ssh*                  prefix
+  a OR b, a NOT b, -b   boolean operators; parentheses group
+
+Results are ranked by bm25 (or newest first) and paged with limit/offset;
+host, source, kind and time-window filters are applied in the same query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .journal import JournalRecord
+from .timestamps import line_time
+
+MAX_PER_PAGE = 200
+INSERT_BATCH = 2000
+
+_TOKEN_RE = re.compile(r'"([^"]*)"(\*?)|([()])|([^\s()"]+)')
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    ts REAL NOT NULL,
+    digest TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (host, kind, source, digest)
+);
+CREATE INDEX IF NOT EXISTS lines_source_ts ON lines (host, source, ts);
+CREATE INDEX IF NOT EXISTS lines_ts ON lines (ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(
+    text, content='lines', content_rowid='id', tokenize="unicode61 tokenchars '_'"
+);
+CREATE TRIGGER IF NOT EXISTS lines_ai AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_ad AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts (lines_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS feeds (
+    host TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (host, kind, source)
+);
+"""
+
+
+def to_match(query: str) -> str:
+    """Translate search-box syntax into an FTS5 MATCH expression."""
+    out: List[str] = []
+    operand_before = False
+    for phrase, star, paren, word in _TOKEN_RE.findall(query or ''):
+        if paren:
+            if paren == '(' and operand_before:
+                out.append('AND')
+            out.append(paren)
+            operand_before = paren == ')'
+            continue
+        if word in _OPERATORS:
+            out.append(word)
+            operand_before = False
+            continue
+        negate = False
+        if phrase == '' and not star and word.startswith('-') and len(word) > 1:
+            negate, word = True, word[1:]
+        if not phrase and word:
+            star = '*' if word.endswith('*') else ''
+            phrase = word.rstrip('*')
+        if not phrase.strip():
+            continue
+        if negate:
+            if not operand_before:
+                raise ValueError(f"Nothing to exclude -{phrase} from; FTS queries cannot start with NOT")
+            out.append('NOT')
+        elif out and out[-1] == ')':
+            # FTS5 only implies AND between adjacent terms, not after a group
+            out.append('AND')
+        out.append('"' + phrase.replace('"', '""') + '"' + star)
+        operand_before = True
+    expr = ' '.join(out)
+    if not expr:
+        raise ValueError('Search query has no terms')
+    return expr
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogateescape'), digest_size=12).hexdigest()
+
+
+class LogIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self.error: Optional[str] = None
+        try:
+            d = os.path.dirname(os.path.abspath(path))
+            os.makedirs(d, exist_ok=True)
+            with self._conn() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            # Most likely an SQLite build without FTS5
+            self.error = str(e)
+            print(f"[WARN] Search index unavailable: {e}")
+
+    @property
+    def available(self) -> bool:
+        return self.error is None
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _check(self):
+        if self.error:
+            raise RuntimeError(f"Search index unavailable: {self.error}")
+
+    # --- feeding ---
+
+    def add_lines(self, host: str, kind: str, source: str,
+                  lines: Iterable[Tuple[Optional[float], str, Optional[str]]]) -> int:
+        """Index (ts, text, key) tuples; ts None is parsed from the text, key None means the text digest."""
+        self._check()
+        now = time.time()
+        rows = []
+        for ts, text, key in lines:
+            text = text.rstrip('\r\n')
+            if not text.strip():
+                continue
+            rows.append((host, kind, source, ts or line_time(text, now) or now, key or _digest(text),
+                         text.encode('utf-8', 'replace').decode('utf-8')))
+        added = 0
+        with self._write_lock, self._conn() as conn:
+            for i in range(0, len(rows), INSERT_BATCH):
+                cur = conn.executemany(
+                    'INSERT OR IGNORE INTO lines (host, kind, source, ts, digest, text) VALUES (?, ?, ?, ?, ?, ?)',
+                    rows[i:i + INSERT_BATCH])
+                added += max(0, cur.rowcount)
+        return added
+
+    def add_text(self, host: str, kind: str, source: str, text: str) -> int:
+        return self.add_lines(host, kind, source, ((None, line, None) for line in (text or '').splitlines()))
+
+    def add_records(self, host: str, source: str, records: Sequence[JournalRecord]) -> int:
+        return self.add_lines(host, 'journal', source,
+                              ((r.ts or None, r.format_line(), f"c:{r.cursor}" if r.cursor else None) for r in records))
+
+    def ingest_mirror(self, src) -> int:
+        """Index what a MirrorSource gained since the last call for it."""
+        self._check()
+        with self._conn() as conn:
+            row = conn.execute('SELECT position FROM feeds WHERE host = ? AND kind = ? AND source = ?',
+                               (src.host, src.kind, src.name)).fetchone()
+        position = row[0] if row else 0
+        with src.lock:
+            if position > src.state['end']:
+                position = 0   # the mirror was cleared and is being refilled
+        lines, end = src.lines_since(position)
+        if src.kind == 'journal':
+            records = [src.record(line) for line in lines]
+            added = self.add_records(src.host, src.name, records)
+        else:
+            added = self.add_lines(src.host, src.kind, src.name, ((None, line, None) for line in lines))
+        with self._write_lock, self._conn() as conn:
+            conn.execute('INSERT OR REPLACE INTO feeds (host, kind, source, position) VALUES (?, ?, ?, ?)',
+                         (src.host, src.kind, src.name, end))
+        return added
+
+    def reset_feed(self, host: str, kind: str, source: str):
+        """Forget a source's feed position, e.g. after its mirror was cleared."""
+        self._check()
+        with self._write_lock, self._conn() as conn:
+            conn.execute('DELETE FROM feeds WHERE host = ? AND kind = ? AND source = ?', (host, kind, source))
+
+    # --- querying ---
+
+    def search(self, query: str, hosts: Optional[Sequence[str]] = None, sources: Optional[Sequence[str]] = None,
+               kinds: Optional[Sequence[str]] = None, since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 50, offset: int = 0, order: str = 'rank') -> Dict[str, Any]:
+        """Ranked page of matching lines plus the total match count."""
+        self._check()
+        started = time.perf_counter()
+        where = ['lines_fts MATCH ?']
+        params: List[Any] = [to_match(query)]
+        for column, values in (('l.host', hosts), ('l.source', sources), ('l.kind', kinds)):
+            if values:
+                where.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if since is not None:
+            where.append('l.ts >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('l.ts < ?')
+            params.append(until)
+        limit = max(1, min(MAX_PER_PAGE, int(limit)))
+        offset = max(0, int(offset))
+        base = f"FROM lines_fts JOIN lines l ON l.id = lines_fts.rowid WHERE {' AND '.join(where)}"
+        order_by = 'l.ts DESC' if order == 'time' else 'bm25(lines_fts), l.ts DESC'
+        try:
+            with self._conn() as conn:
+                total = conn.execute(f"SELECT count(*) {base}", params).fetchone()[0]
+                rows = conn.execute(
+                    f"SELECT l.host, l.kind, l.source, l.ts, l.text, bm25(lines_fts) {base} "
+                    f"ORDER BY {order_by} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        except sqlite3.OperationalError as e:
+            if 'fts5' in str(e) or 'syntax' in str(e):
+                raise ValueError(f"Invalid search query: {e}")
+            raise
+        return {
+            'results': [{'host': h, 'kind': k, 'source': s, 'ts': ts, 'text': text, 'score': round(-score, 3)}
+                        for h, k, s, ts, text, score in rows],
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'has_more': offset + len(rows) < total,
+            'took_ms': int((time.perf_counter() - started) * 1000),
+        }
+
+    # --- maintenance ---
+
+    def prune(self, max_age_days: float) -> int:
+        """Drop lines older than max_age_days."""
+        self._check()
+        with self._write_lock, self._conn() as conn:
+            return conn.execute('DELETE FROM lines WHERE ts < ?', (time.time() - max_age_days * 86400,)).rowcount
+
+    def clear(self, host: Optional[str] = None) -> int:
+        self._check()
+        with self._write_lock, self._conn() as conn:
+            if host is None:
+                n = conn.execute('DELETE FROM lines').rowcount
+                conn.execute('DELETE FROM feeds')
+            else:
+                n = conn.execute('DELETE FROM lines WHERE host = ?', (host,)).rowcount
+                conn.execute('DELETE FROM feeds WHERE host = ?', (host,))
+            return n
+
+    def stats(self) -> Dict[str, Any]:
+        if self.error:
+            return {'available': False, 'error': self.error, 'path': self.path}
+        with self._conn() as conn:
+            sources = conn.execute(
+                'SELECT host, kind, source, count(*), min(ts), max(ts) FROM lines GROUP BY host, kind, source').fetchall()
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {
+            'available': True,
+            'path': self.path,
+            'size_bytes': size,
+            'lines': sum(s[3] for s in sources),
+            'sources': [{'host': h, 'kind': k, 'source': s, 'lines': n, 'oldest': lo, 'newest': hi}
+                        for h, k, s, n, lo, hi in sources],
+        }
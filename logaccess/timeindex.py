@@ -0,0 +1,174 @@
+"""Sparse time index over plain log files for time-window reads.
+
+Every ``step`` bytes the first timestamped line is sampled as a (byte
+offset, timestamp) pair. Sampling runs where the file lives (an awk pass
+through the usual ``run(command_str, timeout)`` runner), so only the sampled
+lines come back, and it resumes from where the last pass stopped; a changed
+inode or a shrunken file starts the index over.
+
+A window read binary-searches the samples for the byte range that can hold
+[since, until], reads just that range and keeps the lines inside the window.
+Lines without a timestamp of their own (continuations, stack traces) take
+the time of the line before them.
+"""
+
+from __future__ import annotations
+
+import bisect
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple
+
+from .paging import Page, _blen, _read_bytes, _split_lines
+from .timestamps import AWK_TIME_RE, line_time
+
+Runner = Callable[..., Any]
+
+STEP_BYTES = 64 * 1024
+MAX_WINDOW_BYTES = 16 * 1024 * 1024
+SAMPLE_CHARS = 96
+
+# pos/next_at/step come in with -v; pos tracks the byte offset of each line (LC_ALL=C makes length() count bytes)
+_AWK = ("BEGIN { last = pos } "
+        "{ if (pos >= next_at && $0 ~ re) { print pos \"\\t\" substr($0, 1, " + str(SAMPLE_CHARS) + "); "
+        "next_at = pos + step } last = pos; pos += length($0) + 1 } "
+        "END { print \"E\\t\" last \"\\t\" pos }")
+
+
+@dataclass
+class TimeIndex:
+    host: str
+    path: str
+    step: int = STEP_BYTES
+    inode: Optional[int] = None
+    size: int = 0
+    indexed_to: int = 0                 # where the next pass resumes (a line start)
+    offsets: List[int] = field(default_factory=list)
+    times: List[float] = field(default_factory=list)
+    updated_at: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def _reset(self, inode: Optional[int]):
+        self.inode, self.indexed_to = inode, 0
+        self.offsets, self.times = [], []
+
+    def _scan(self, run: Runner, timeout: int) -> Tuple[int, int, str]:
+        q = shlex.quote(self.path)
+        next_at = (self.offsets[-1] + self.step) if self.offsets else self.indexed_to
+        cmd = (f"sudo stat -c '%i %s' {q} || exit 1; sudo tail -c +{self.indexed_to + 1} {q} | "
+               f"LC_ALL=C awk -v pos={self.indexed_to} -v next_at={next_at} -v step={self.step} "
+               f"-v re={shlex.quote(AWK_TIME_RE)} {shlex.quote(_AWK)}")
+        out = run(cmd, timeout).stdout or ''
+        header, _, body = out.partition('\n')
+        try:
+            inode, size = (int(x) for x in header.split()[:2])
+        except ValueError:
+            raise RuntimeError(f"Unexpected output indexing '{self.path}': {header[:200]!r}")
+        return inode, size, body
+
+    def refresh(self, run: Runner, timeout: int = 120) -> 'TimeIndex':
+        """Sample what was appended since the last pass."""
+        with self.lock:
+            return self._refresh(run, timeout)
+
+    def _refresh(self, run: Runner, timeout: int) -> 'TimeIndex':
+        inode, size, body = self._scan(run, timeout)
+        if inode != self.inode or size < self.indexed_to:
+            self._reset(inode)
+            inode, size, body = self._scan(run, timeout)
+        now = time.time()
+        for line in body.split('\n'):
+            tag, _, rest = line.partition('\t')
+            if tag == 'E':
+                last, _, pos = rest.partition('\t')
+                # Resume at the last line unless it was complete
+                self.indexed_to = int(pos) if int(pos) <= size else int(last)
+            elif tag.isdigit():
+                ts = line_time(rest, now)
+                if ts is not None and int(tag) >= (self.offsets[-1] + 1 if self.offsets else 0):
+                    self.offsets.append(int(tag))
+                    self.times.append(ts)
+        self.size = size
+        self.updated_at = now
+        return self
+
+    def byte_range(self, since: Optional[float], until: Optional[float]) -> Tuple[int, int]:
+        """[lo, hi) byte range that holds every line stamped within [since, until]."""
+        lo, hi = 0, self.size
+        if since is not None and self.times:
+            # Last sample strictly before since: lines of the same second may precede a sample stamped since
+            i = bisect.bisect_left(self.times, since) - 1
+            lo = self.offsets[i] if i >= 0 else 0
+        if until is not None and self.times:
+            j = bisect.bisect_right(self.times, until)
+            hi = self.offsets[j] if j < len(self.offsets) else self.size
+        return lo, max(lo, hi)
+
+    def window_page(self, run: Runner, since: Optional[float], until: Optional[float],
+                    lines: int = 500, timeout: int = 60) -> Page:
+        """First ``lines`` lines stamped within [since, until]; next_cursor continues with normal paging."""
+        self.refresh(run, timeout=max(timeout, 120))
+        lo, hi = self.byte_range(since, until)
+        hi = min(hi, lo + MAX_WINDOW_BYTES)
+        size, o, e, data = _read_bytes(run, self.path, f"o={lo}", f"e=$(( {hi} < s ? {hi} : s ))", timeout)
+        complete, trailing, pos = _split_lines(data, o, False)
+        if trailing and e >= size:
+            complete.append((pos, trailing))
+        out: List[Tuple[int, str]] = []
+        current: Optional[float] = None
+        more = e < hi
+        for offset, text in complete:
+            current = line_time(text) or current
+            if current is None or (since is not None and current < since):
+                continue
+            if until is not None and current > until:
+                break
+            if len(out) >= lines:
+                more = True
+                break
+            out.append((offset, text))
+        start = out[0][0] if out else lo
+        end = out[-1][0] + _blen(out[-1][1]) + 1 if out else lo
+        return Page(
+            lines=[t for _, t in out],
+            prev_cursor=f"b{start}" if start > 0 else None,
+            next_cursor=f"b{min(end, size)}",
+            has_next=more or end < size,
+            start=start,
+            end=min(end, size),
+            size=size,
+        )
+
+    def status(self) -> dict:
+        return {
+            'host': self.host, 'path': self.path, 'inode': self.inode, 'size': self.size,
+            'indexed_to': self.indexed_to, 'samples': len(self.offsets), 'step': self.step,
+            'first': self.times[0] if self.times else None, 'last': self.times[-1] if self.times else None,
+            'updated_at': self.updated_at,
+        }
+
+
+class TimeIndexCache:
+    """Per (host, path) indexes kept in memory, least recently used dropped first."""
+
+    def __init__(self, max_entries: int = 256, step: int = STEP_BYTES):
+        self.max_entries = max_entries
+        self.step = step
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str], TimeIndex]' = OrderedDict()
+
+    def get(self, host: str, path: str) -> TimeIndex:
+        key = (host, path)
+        with self._lock:
+            idx = self._entries.pop(key, None) or TimeIndex(host, path, step=self.step)
+            self._entries[key] = idx
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return idx
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [idx.status() for idx in self._entries.values()]
@@ -0,0 +1,82 @@
+"""Log line timestamp parsing shared by the viewer, indexes and analysis.
+
+Two shapes are recognised: a syslog prefix (``Oct 19 14:02:11``, no year) and
+an ISO 8601 stamp anywhere in the line. The patterns are compiled once here.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+import time
+from typing import Any, Optional
+
+ISO_RE = re.compile(r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?)")
+SYSLOG_RE = re.compile(r"^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+([ 0-3]?\d)\s+(\d{2}:\d{2}:\d{2})")
+
+# The same two shapes for awk on the remote side (no {n} intervals; mawk lacks them)
+AWK_TIME_RE = ("^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) +[0-9]+ [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+               "|[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9][T ][0-9][0-9]:[0-9][0-9]:[0-9][0-9]")
+
+_RELATIVE_RE = re.compile(r'^-(\d+)([smhd])$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def line_datetime(line: str, now: Optional[datetime.datetime] = None,
+                  tz: Optional[datetime.tzinfo] = None) -> Optional[datetime.datetime]:
+    """Timestamp of a log line, or None.
+
+    Syslog stamps carry no year or zone: they get the current year (last year
+    when that would put them more than a day in the future) and ``tz``, naive
+    local time when tz is None. ISO stamps keep their own offset.
+    """
+    if not line:
+        return None
+    ms = SYSLOG_RE.match(line)
+    if ms:
+        now = now or datetime.datetime.now(tz)
+        try:
+            stamp = f"{ms.group(1)} {int(ms.group(2)):02d} {ms.group(3)}"
+            dt = datetime.datetime.strptime(f"{now.year} {stamp}", "%Y %b %d %H:%M:%S").replace(tzinfo=tz)
+            if dt - now.replace(tzinfo=tz) > datetime.timedelta(days=1):
+                dt = dt.replace(year=now.year - 1)
+            return dt
+        except ValueError:
+            pass
+    mt = ISO_RE.search(line)
+    if mt:
+        s = mt.group(1).replace(' ', 'T')
+        if s.endswith('Z'):
+            s = s[:-1] + '+00:00'
+        try:
+            return datetime.datetime.fromisoformat(s)
+        except ValueError:
+            pass
+    return None
+
+
+def line_time(line: str, now: Optional[float] = None) -> Optional[float]:
+    """Timestamp of a log line in epoch seconds, or None."""
+    ref = datetime.datetime.fromtimestamp(now if now is not None else time.time())
+    dt = line_datetime(line, ref)
+    return dt.timestamp() if dt is not None else None
+
+
+def parse_time(value: Any, now: Optional[float] = None) -> Optional[float]:
+    """Epoch seconds from an epoch number, ISO date/time or relative ``-15m``/``-2h``/``-7d``."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = str(value).strip()
+    m = _RELATIVE_RE.match(s)
+    if m:
+        return (now or time.time()) - int(m.group(1)) * _UNITS[m.group(2)]
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(s.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r}")
@@ -0,0 +1,166 @@
+"""Compressed transport for bulk command output over SSH.
+
+The remote command's stdout is piped through zstd (preferred, when the
+``zstandard`` package is installed here) or gzip, whichever the remote host
+has, falling back to plain ``cat``. A one-byte marker in front of the stream
+names the codec, and the command's exit status is appended to stderr so
+failures still surface. Output is decompressed incrementally as it arrives.
+
+Every call records raw vs on-wire byte counts; see ``stats.snapshot()``.
+
+  AILOG_SSH_COMPRESSION  off (default) | auto | gzip | zstd
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used without it
+    zstandard = None
+
+MODES = ('off', 'auto', 'gzip', 'zstd')
+
+_RC_RE = re.compile(r'\n?__AILOG_RC=(\d+)\s*$')
+_READ_SIZE = 64 * 1024
+
+
+def default_mode() -> str:
+    mode = (os.getenv('AILOG_SSH_COMPRESSION', 'off') or 'off').strip().lower()
+    return mode if mode in MODES else 'off'
+
+
+def wrap_command(command_str: str, mode: str = 'auto') -> str:
+    """Shell snippet running command_str with its stdout compressed and codec-tagged."""
+    branches = []
+    if mode in ('auto', 'zstd') and zstandard is not None:
+        branches.append(("zstd", "Z", "zstd -q -c -3"))
+    branches.append(("gzip", "G", "gzip -c -1"))
+    select = ''
+    for i, (binary, marker, cmd) in enumerate(branches):
+        select += f"{'if' if i == 0 else 'elif'} command -v {binary} >/dev/null 2>&1; then printf {marker}; z='{cmd}'; "
+    select += "else printf N; z=cat; fi"
+    return f"{select}; {{ {command_str}; printf '\\n__AILOG_RC=%d\\n' \"$?\" >&2; }} | $z"
+
+
+def _decompressor(marker: bytes):
+    if marker == b'G':
+        d = zlib.decompressobj(wbits=31)
+        return 'gzip', d.decompress, d.flush
+    if marker == b'Z':
+        if zstandard is None:
+            raise RuntimeError('Remote sent zstd but the zstandard package is not installed')
+        d = zstandard.ZstdDecompressor().decompressobj()
+        return 'zstd', d.decompress, lambda: b''
+    return 'none', (lambda b: b), (lambda: b'')
+
+
+class TransferResult(subprocess.CompletedProcess):
+    """CompletedProcess with a ``transfer`` dict: codec, raw_bytes, wire_bytes, ratio, ms."""
+
+    transfer: Dict[str, Any] = {}
+
+
+class TransferStats:
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._recent: deque = deque(maxlen=window)
+
+    def record(self, label: str, info: Dict[str, Any]):
+        with self._lock:
+            t = self._totals.setdefault(label, {'calls': 0, 'raw_bytes': 0, 'wire_bytes': 0, 'ms': 0})
+            t['calls'] += 1
+            t['raw_bytes'] += info['raw_bytes']
+            t['wire_bytes'] += info['wire_bytes']
+            t['ms'] += info['ms']
+            self._recent.append({'label': label, 'at': time.time(), **info})
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = {}
+            for label, t in self._totals.items():
+                totals[label] = {**t, 'ratio': round(t['raw_bytes'] / t['wire_bytes'], 2) if t['wire_bytes'] else None}
+            return {'mode': default_mode(), 'zstd_available': zstandard is not None,
+                    'totals': totals, 'recent': list(self._recent)}
+
+
+stats = TransferStats()
+
+
+def run_compressed(build: Callable[[str], Tuple[List[str], bool]], command_str: str, timeout: float = 60,
+                   mode: Optional[str] = None, errors: Optional[str] = None, label: str = 'ssh') -> TransferResult:
+    """Run command_str via build(cmd) -> (args, shell) with compressed stdout.
+
+    Returns a TransferResult whose stdout is the decompressed text and whose
+    returncode is the wrapped command's own exit status.
+    """
+    mode = mode or default_mode()
+    args, shell = build(wrap_command(command_str, mode))
+    started = time.perf_counter()
+    proc = subprocess.Popen(args[0] if shell else args, shell=shell,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    stderr_chunks: List[bytes] = []
+    drain = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    drain.start()
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        # Kill the whole group so a local shell's children release the pipe too
+        try:
+            os.killpg(proc.pid, 9)
+        except OSError:
+            proc.kill()
+
+    timer = threading.Timer(timeout, _kill)
+    timer.start()
+    out: List[bytes] = []
+    wire = 0
+    codec = 'none'
+    try:
+        marker = proc.stdout.read(1)
+        wire += len(marker)
+        codec, feed, flush = _decompressor(marker)
+        while True:
+            block = proc.stdout.read1(_READ_SIZE) if hasattr(proc.stdout, 'read1') else proc.stdout.read(_READ_SIZE)
+            if not block:
+                break
+            wire += len(block)
+            out.append(feed(block))
+        out.append(flush())
+        proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        drain.join(timeout=5)
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(args, timeout)
+
+    raw = b''.join(out)
+    stderr = b''.join(stderr_chunks).decode('utf-8', 'replace')
+    rc = proc.returncode
+    m = _RC_RE.search(stderr)
+    if m:
+        rc = int(m.group(1))
+        stderr = stderr[:m.start()]
+    elif rc == 0:
+        rc = 255  # the wrapper never finished (e.g. the connection dropped)
+    ms = int((time.perf_counter() - started) * 1000)
+    info = {'codec': codec, 'raw_bytes': len(raw), 'wire_bytes': wire,
+            'ratio': round(len(raw) / wire, 2) if wire else None, 'ms': ms}
+    stats.record(label, info)
+    print(f"[SSH] {label}: {len(raw)} bytes -> {wire} on wire ({codec}, {info['ratio']}x, {ms} ms)")
+    result = TransferResult(args, rc, raw.decode('utf-8', errors or 'strict'), stderr)
+    result.transfer = info
+    return result
@@ -0,0 +1,132 @@
+"""Cached journal unit discovery per host.
+
+``journalctl --field _SYSTEMD_UNIT`` walks the whole journal, so its result
+is kept per host and served with stale-while-revalidate semantics:
+
+  age < ttl          served as is
+  age < max_stale    served immediately, refreshed in the background
+  older / missing    fetched before returning
+
+A refresh is incremental: units appearing in entries written since the last
+refresh are merged in (``--since=@<epoch>``), and a full scan runs every
+``full_every`` seconds so units that have aged out of the journal drop off.
+At most one refresh per host runs at a time; concurrent callers share it.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Runner = Callable[..., Any]
+
+FULL_COMMAND = "sudo journalctl --field _SYSTEMD_UNIT --no-pager | sort -u"
+_UNIT_RE = re.compile(r'"_SYSTEMD_UNIT":"((?:[^"\\]|\\.)*)"')
+
+
+def incremental_command(since: float) -> str:
+    """Units that logged since an epoch time; only the field values cross the wire."""
+    return (f"sudo journalctl --since=@{int(since)} -o json --output-fields=_SYSTEMD_UNIT --no-pager"
+            f" | grep -o '\"_SYSTEMD_UNIT\":\"[^\"]*\"' | sort -u")
+
+
+@dataclass
+class UnitList:
+    units: List[str] = field(default_factory=list)
+    fetched_at: Optional[float] = None      # last successful refresh
+    full_at: Optional[float] = None         # last full scan
+    error: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    refreshing: bool = False
+
+
+class JournalUnitCache:
+    def __init__(self, runner_for: Callable[[str], Runner], context: Optional[Callable[[], Any]] = None,
+                 ttl: float = 300, max_stale: float = 6 * 3600, full_every: float = 6 * 3600, timeout: int = 30):
+        self.runner_for = runner_for
+        self.context = context or nullcontext
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.full_every = full_every
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, UnitList] = {}
+
+    def _entry(self, host: str) -> UnitList:
+        with self._lock:
+            return self._hosts.setdefault(host, UnitList())
+
+    def get(self, host: str, force: bool = False) -> Tuple[List[str], Dict[str, Any]]:
+        """(units, freshness metadata) for host; raises only when there is nothing cached to fall back on."""
+        entry = self._entry(host)
+        age = None if entry.fetched_at is None else time.time() - entry.fetched_at
+        if force or age is None or age >= self.max_stale:
+            self.refresh(host)
+        elif age >= self.ttl:
+            self.refresh_async(host)
+        return list(entry.units), self.meta(host)
+
+    def meta(self, host: str) -> Dict[str, Any]:
+        entry = self._entry(host)
+        age = None if entry.fetched_at is None else round(time.time() - entry.fetched_at, 1)
+        return {
+            'count': len(entry.units), 'fetched_at': entry.fetched_at, 'age_seconds': age,
+            'stale': age is None or age >= self.ttl, 'refreshing': entry.refreshing, 'error': entry.error,
+        }
+
+    def refresh_async(self, host: str):
+        entry = self._entry(host)
+        if entry.refreshing:
+            return
+
+        def _run():
+            try:
+                with self.context():
+                    self.refresh(host)
+            except Exception as e:
+                print(f"[WARN] Background journal unit refresh failed for {host}: {e}")
+
+        threading.Thread(target=_run, name=f"units-{host}", daemon=True).start()
+
+    def refresh(self, host: str) -> List[str]:
+        entry = self._entry(host)
+        with entry.lock:
+            # Someone else refreshed while we waited for the lock
+            if entry.fetched_at is not None and time.time() - entry.fetched_at < 1:
+                return entry.units
+            entry.refreshing = True
+            started = time.time()
+            try:
+                run = self.runner_for(host)
+                if entry.full_at is None or started - entry.full_at >= self.full_every:
+                    out = run(FULL_COMMAND, self.timeout).stdout or ''
+                    units = sorted({u.strip() for u in out.splitlines() if u.strip()})
+                    entry.full_at = started
+                else:
+                    # Overlap the last refresh a little so entries written during it are not missed
+                    out = run(incremental_command(entry.fetched_at - 60), self.timeout).stdout or ''
+                    units = sorted(set(entry.units) | set(_UNIT_RE.findall(out)))
+                entry.units, entry.fetched_at, entry.error = units, started, None
+            except Exception as e:
+                entry.error = str(e)[:300]
+                if entry.fetched_at is None:
+                    raise
+            finally:
+                entry.refreshing = False
+            return entry.units
+
+    def invalidate(self, host: Optional[str] = None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            hosts = list(self._hosts)
+        return {h: self.meta(h) for h in hosts}
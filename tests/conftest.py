@@ -0,0 +1,19 @@
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def local_run():
+    """A logaccess runner that executes commands here (without sudo), decoding like _log_runner."""
+    def run(command_str, timeout=30):
+        proc = subprocess.run(command_str.replace('sudo ', ''), shell=True, capture_output=True, timeout=timeout)
+        return SimpleNamespace(stdout=proc.stdout.decode('utf-8', 'surrogateescape'), returncode=proc.returncode)
+    return run
+
+
+def stamped_lines(start_minute, seconds, per_second):
+    """per_second lines for each of the first seconds of 2026-10-19T14:<start_minute>."""
+    return ''.join(f"2026-10-19T14:{start_minute:02d}:{s:02d}Z host app[1]: request {s}-{i} served\n"
+                   for s in range(seconds) for i in range(per_second))
@@ -0,0 +1,20 @@
+import gzip
+
+from logaccess import gzindex
+from logaccess.timestamps import parse_time
+
+from conftest import stamped_lines
+
+
+def test_window_page_keeps_whole_second_at_access_point(tmp_path, local_run, monkeypatch):
+    monkeypatch.setattr(gzindex, 'SPAN_BYTES', 4096)
+    monkeypatch.setattr(gzindex, 'BUILD_CHUNK', 256)
+    monkeypatch.setattr(gzindex, 'MIN_ARCHIVE_BYTES', 0)
+    path = tmp_path / 'app.log.gz'
+    path.write_bytes(gzip.compress(stamped_lines(5, 10, 300).encode()))
+    idx = gzindex.build_index(local_run, 'local', str(path))
+    assert len(idx.points) > 10
+    for second in range(1, 10):
+        ts = parse_time(f'2026-10-19T14:05:{second:02d}Z')
+        page = idx.window_page(local_run, ts, ts, n=1000)
+        assert len(page.lines) == 300, second
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from logaccess.mirror import MirrorSource
+
+
+def test_sync_appends_complete_lines_and_follows_rotation(tmp_path, local_run):
+    log = tmp_path / 'app.log'
+    log.write_text('one\ntwo\npart')
+    src = MirrorSource(str(tmp_path / 'mirror'), 'local', 'file', 'app.log')
+    src.sync(local_run, path=str(log))
+    assert src.tail_text(10) == 'one\ntwo\n'
+
+    with open(log, 'a') as f:
+        f.write('ial\nthree\n')
+    log.rename(tmp_path / 'app.log.1')
+    log.write_text('four\n')
+    src.sync(local_run, path=str(log))
+    assert src.tail_text(10) == 'one\ntwo\npartial\nthree\nfour\n'
+
+
+def test_readers_are_not_blocked_by_a_slow_sync(tmp_path, local_run):
+    log = tmp_path / 'app.log'
+    log.write_text('one\n')
+    src = MirrorSource(str(tmp_path / 'mirror'), 'local', 'file', 'app.log')
+    src.sync(local_run, path=str(log))
+    started = threading.Event()
+
+    def slow_run(command_str, timeout=30):
+        started.set()
+        time.sleep(1.0)
+        return local_run(command_str, timeout)
+
+    sync = threading.Thread(target=src.sync, args=(slow_run,), kwargs={'path': str(log)})
+    sync.start()
+    started.wait(5)
+    t0 = time.monotonic()
+    assert src.tail_text(10) == 'one\n'
+    assert time.monotonic() - t0 < 0.5
+    sync.join()
@@ -0,0 +1,63 @@
+import pytest
+
+from logaccess.search_index import LogIndex, to_match
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('error timeout', '"error" "timeout"'),
+    ('"connection reset" ssh*', '"connection reset" "ssh"*'),
+    ('a OR b', '"a" OR "b"'),
+    ('a -b', '"a" NOT "b"'),
+    ('(a OR b) c', '( "a" OR "b" ) AND "c"'),
+    ('c (a OR b)', '"c" AND ( "a" OR "b" )'),
+    ('(a OR b) (c OR d)', '( "a" OR "b" ) AND ( "c" OR "d" )'),
+    ('(a OR b) -c', '( "a" OR "b" ) NOT "c"'),
+    ('(a OR b) OR c', '( "a" OR "b" ) OR "c"'),
+])
+def test_to_match(query, expected):
+    assert to_match(query) == expected
+
+
+@pytest.mark.parametrize('query', ['', '-a'])
+def test_to_match_rejects(query):
+    with pytest.raises(ValueError):
+        to_match(query)
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = LogIndex(str(tmp_path / 'index.db'))
+    if not idx.available:
+        pytest.skip(f'SQLite FTS5 unavailable: {idx.error}')
+    idx.add_text('web1', 'file', 'syslog', 'sshd failed password\nnginx timeout upstream\nsshd accepted key\n')
+    return idx
+
+
+@pytest.mark.parametrize('query, texts', [
+    ('(failed OR timeout) sshd', ['sshd failed password']),
+    ('nginx (failed OR timeout)', ['nginx timeout upstream']),
+    ('(sshd OR nginx) -failed', ['nginx timeout upstream', 'sshd accepted key']),
+])
+def test_grouped_queries_run_against_fts5(index, query, texts):
+    found = index.search(query, order='time')
+    assert sorted(r['text'] for r in found['results']) == texts
+
+
+def test_cleared_mirror_is_indexed_again(tmp_path, local_run):
+    from logaccess.mirror import MirrorSource
+
+    idx = LogIndex(str(tmp_path / 'index.db'))
+    if not idx.available:
+        pytest.skip(f'SQLite FTS5 unavailable: {idx.error}')
+    log = tmp_path / 'app.log'
+    log.write_text('sshd first session\n' * 3)
+    src = MirrorSource(str(tmp_path / 'mirror'), 'local', 'file', 'app.log')
+    src.sync(local_run, path=str(log))
+    idx.ingest_mirror(src)
+
+    src.clear()
+    idx.reset_feed('local', 'file', 'app.log')
+    log.write_text('sshd second session\n')
+    src.sync(local_run, path=str(log))
+    assert idx.ingest_mirror(src) == 1
+    assert idx.search('second')['total'] == 1
@@ -0,0 +1,20 @@
+from logaccess.timeindex import TimeIndex
+from logaccess.timestamps import parse_time
+
+from conftest import stamped_lines
+
+
+def test_byte_range_starts_before_samples_stamped_since():
+    idx = TimeIndex('local', '/x', size=1000, offsets=[0, 100, 200, 300], times=[10.0, 20.0, 20.0, 30.0])
+    assert idx.byte_range(20.0, None) == (0, 1000)
+    assert idx.byte_range(25.0, None) == (200, 1000)
+    assert idx.byte_range(None, 20.0) == (0, 300)
+
+
+def test_window_page_keeps_whole_first_second(tmp_path, local_run):
+    path = tmp_path / 'app.log'
+    path.write_text(stamped_lines(5, 20, 200))
+    idx = TimeIndex('local', str(path), step=4096).refresh(local_run)
+    since, until = parse_time('2026-10-19T14:05:00Z'), parse_time('2026-10-19T14:05:10Z')
+    page = idx.window_page(local_run, since, until, lines=5000)
+    assert len(page.lines) == 11 * 200
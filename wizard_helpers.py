@@ -66,24 +66,32 @@ def test_ssh_connection(user: str, ip: str, ssh_key_path: str = None, timeout: i
         }
 
 
+def ssh_command_args(user: str, ip: str, ssh_key_path: str = None) -> List[str]:
+    """
+    SSH argument list (without the remote command) used by execute_remote_command
+    """
+    cmd = [
+        "ssh",
+        "-o", "ConnectTimeout=5",
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "BatchMode=yes",
+        "-o", "UserKnownHostsFile=/dev/null"
+    ]
+    
+    if ssh_key_path:
+        cmd.extend(["-i", ssh_key_path])
+    
+    cmd.append(f"{user}@{ip}")
+    return cmd
+
+
 def execute_remote_command(user: str, ip: str, command: str, ssh_key_path: str = None, timeout: int = 10) -> Tuple[bool, str]:
     """
     Execute a command on a remote host via SSH
     Returns (success, output)
     """
     try:
-        cmd = [
-            "ssh",
-            "-o", "ConnectTimeout=5",
-            "-o", "StrictHostKeyChecking=no",
-            "-o", "BatchMode=yes",
-            "-o", "UserKnownHostsFile=/dev/null"
-        ]
-        
-        if ssh_key_path:
-            cmd.extend(["-i", ssh_key_path])
-        
-        cmd.append(f"{user}@{ip}")
+        cmd = ssh_command_args(user, ip, ssh_key_path)
         cmd.append(command)
         
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
@@ -98,112 +106,145 @@ def execute_remote_command(user: str, ip: str, command: str, ssh_key_path: str =
         return (False, str(e))
 
 
-def collect_system_info(user: str, ip: str, ssh_key_path: str = None) -> Dict:
-    """
-    Collect comprehensive system information from a host
-    Returns dict with collected info
-    """
+# Commands behind each collected field; run one SSH call each on the fallback path,
+# or all at once on the host by _COLLECT_SCRIPT
+SYSTEM_INFO_COMMANDS = {
+    'os_version': "uname -a",
+    'hostname': "hostname",
+    'ram': "free -b | grep Mem | awk '{print $2, $3}'",
+    'disk': "df -B1 / | tail -1 | awk '{print $2, $3}'",
+    'cpu_type': "lscpu | grep 'Model name' | cut -d':' -f2",
+    'cpu_cores': "nproc",
+    # Main IP (try multiple methods)
+    'main_ip': "hostname -I | awk '{print $1}' || ip -4 addr show scope global | grep -oP '(?<=inet\\s)\\d+(\\.\\d+){3}' | head -1",
+    # NetBird IP (if available) - IPv4 address assigned to the NetBird interface (wt0)
+    'netbird_ip': "ip -4 -o addr show dev wt0 2>/dev/null | awk '{print $4}' | cut -d/ -f1 || echo ''",
+}
+SERVICES_COMMAND = "systemctl list-units --type=service --all --no-pager --output=json 2>/dev/null || systemctl list-units --type=service --all --no-pager"
+
+# Piped to `python3 -` on the host: runs every command above in parallel and prints
+# {name: [success, output]} as one JSON document. Python 3.5+, standard library only.
+_COLLECT_SCRIPT = r'''
+import json, subprocess, threading
+commands = json.loads(%s)
+out = {}
+def run(name, command):
+    try:
+        p = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = p.communicate(timeout=20)
+        ok = p.returncode == 0
+        out[name] = [ok, (stdout if ok else stderr).decode('utf-8', 'replace')]
+    except Exception as e:
+        out[name] = [False, str(e)]
+threads = [threading.Thread(target=run, args=item) for item in commands.items()]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+print(json.dumps(out))
+'''
+
+
+def _parse_system_info(results: Dict[str, Tuple[bool, str]]) -> Dict:
+    """Build the system info dict from {field: (success, output)} of SYSTEM_INFO_COMMANDS"""
     info = {}
-    
-    # OS/Kernel version
-    success, output = execute_remote_command(user, ip, "uname -a", ssh_key_path)
-    if success:
-        info['os_version'] = output.strip()
-    
-    # Hostname
-    success, output = execute_remote_command(user, ip, "hostname", ssh_key_path)
-    if success:
-        info['hostname'] = output.strip()
-    
-    # RAM info (in bytes)
-    success, output = execute_remote_command(user, ip, "free -b | grep Mem | awk '{print $2, $3}'", ssh_key_path)
-    if success:
-        try:
-            parts = output.strip().split()
-            info['ram_total'] = int(parts[0])
-            info['ram_used'] = int(parts[1])
-        except:
-            pass
-    
-    # Disk info (in bytes)
-    success, output = execute_remote_command(user, ip, "df -B1 / | tail -1 | awk '{print $2, $3}'", ssh_key_path)
-    if success:
-        try:
-            parts = output.strip().split()
-            info['disk_total'] = int(parts[0])
-            info['disk_used'] = int(parts[1])
-        except:
-            pass
-    
-    # CPU info
-    success, output = execute_remote_command(user, ip, "lscpu | grep 'Model name' | cut -d':' -f2", ssh_key_path)
-    if success:
-        info['cpu_type'] = output.strip()
-    
-    # CPU cores
-    success, output = execute_remote_command(user, ip, "nproc", ssh_key_path)
-    if success:
+
+    def output(name):
+        success, out = results.get(name) or (False, '')
+        return out if success else None
+
+    for key in ('os_version', 'hostname', 'cpu_type', 'main_ip'):
+        if output(key) is not None:
+            info[key] = output(key).strip()
+
+    for key in ('ram', 'disk'):
+        if output(key) is not None:
+            try:
+                parts = output(key).strip().split()
+                info[key + '_total'] = int(parts[0])
+                info[key + '_used'] = int(parts[1])
+            except:
+                pass
+
+    if output('cpu_cores') is not None:
         try:
-            info['cpu_cores'] = int(output.strip())
+            info['cpu_cores'] = int(output('cpu_cores').strip())
         except:
             pass
-    
-    # Main IP (try multiple methods)
-    success, output = execute_remote_command(user, ip, 
-        "hostname -I | awk '{print $1}' || ip -4 addr show scope global | grep -oP '(?<=inet\\s)\\d+(\\.\\d+){3}' | head -1", 
-        ssh_key_path)
-    if success:
-        info['main_ip'] = output.strip()
-    
-    # NetBird IP (if available) - capture from NetBird interface (wt0)
-    # Prefer IPv4 address assigned to wt0.
-    success, output = execute_remote_command(
-        user, ip,
-        "ip -4 -o addr show dev wt0 2>/dev/null | awk '{print $4}' | cut -d/ -f1 || echo ''",
-        ssh_key_path
-    )
-    if success and output.strip():
-        info['netbird_ip'] = output.strip()
-    
+
+    if output('netbird_ip') and output('netbird_ip').strip():
+        info['netbird_ip'] = output('netbird_ip').strip()
+
     return info
 
 
+def _parse_services(output: str) -> List[Dict]:
+    services = []
+    try:
+        # Try JSON output first
+        service_list = json.loads(output)
+        for svc in service_list:
+            services.append({
+                'service_name': svc.get('unit', svc.get('name', '')),
+                'status': svc.get('active', svc.get('state', 'unknown')),
+                'is_running': svc.get('active', svc.get('state', '')) in ['active', 'running']
+            })
+    except:
+        # Fallback to plain text parsing
+        for line in output.split('\n'):
+            if '.service' in line and len(line.strip()) > 0:
+                parts = line.split()
+                if len(parts) >= 3:
+                    service_name = parts[0]
+                    status = parts[2] if len(parts) > 2 else 'unknown'
+                    services.append({
+                        'service_name': service_name,
+                        'status': status,
+                        'is_running': status == 'active'
+                    })
+    return services
+
+
+def collect_system_info(user: str, ip: str, ssh_key_path: str = None) -> Dict:
+    """
+    Collect comprehensive system information from a host, one SSH command per field
+    Returns dict with collected info
+    """
+    return _parse_system_info({
+        name: execute_remote_command(user, ip, command, ssh_key_path)
+        for name, command in SYSTEM_INFO_COMMANDS.items()
+    })
+
+
 def collect_services(user: str, ip: str, ssh_key_path: str = None) -> List[Dict]:
     """
     Collect systemd service information from a host
     Returns list of service dicts with name, status, is_running
     """
-    services = []
-    
-    # Get all services with their status
-    success, output = execute_remote_command(
-        user, ip,
-        "systemctl list-units --type=service --all --no-pager --output=json 2>/dev/null || systemctl list-units --type=service --all --no-pager",
-        ssh_key_path
-    )
-    
-    if success:
-        try:
-            # Try JSON output first
-            service_list = json.loads(output)
-            for svc in service_list:
-                services.append({
-                    'service_name': svc.get('unit', svc.get('name', '')),
-                    'status': svc.get('active', svc.get('state', 'unknown')),
-                    'is_running': svc.get('active', svc.get('state', '')) in ['active', 'running']
-                })
-        except:
-            # Fallback to plain text parsing
-            for line in output.split('\n'):
-                if '.service' in line and len(line.strip()) > 0:
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        service_name = parts[0]
-                        status = parts[2] if len(parts) > 2 else 'unknown'
-                        services.append({
-                            'service_name': service_name,
-                            'status': status,
-                            'is_running': status == 'active'
-                        })
-    
-    return services
+    success, output = execute_remote_command(user, ip, SERVICES_COMMAND, ssh_key_path)
+    return _parse_services(output) if success else []
+
+
+def collect_system_info_and_services(user: str, ip: str, ssh_key_path: str = None, timeout: int = 40) -> Tuple[Dict, List[Dict]]:
+    """
+    Collect system info and services in a single SSH round trip
+    Runs _COLLECT_SCRIPT with the host's python3; hosts without it (or where the
+    script fails) fall back to collect_system_info + collect_services.
+    Returns (system_info, services)
+    """
+    commands = dict(SYSTEM_INFO_COMMANDS, services=SERVICES_COMMAND)
+    script = _COLLECT_SCRIPT % repr(json.dumps(commands))
+    try:
+        cmd = ssh_command_args(user, ip, ssh_key_path)
+        cmd.append("python3 -")
+        result = subprocess.run(cmd, input=script, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0:
+            results = {name: tuple(value) for name, value in json.loads(result.stdout).items()}
+            success, output = results.get('services') or (False, '')
+            return _parse_system_info(results), (_parse_services(output) if success else [])
+        if result.returncode == 255:
+            # ssh itself failed (unreachable, auth); the per-command path would fail the same way
+            return {}, []
+    except (subprocess.TimeoutExpired, ValueError, TypeError, OSError):
+        pass
+    return collect_system_info(user, ip, ssh_key_path), collect_services(user, ip, ssh_key_path)